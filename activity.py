@@ -0,0 +1,117 @@
+# سجل النشاطات المؤجل: تجميع الإدخالات في الذاكرة وكتابتها على دفعات
+import atexit
+import os
+import threading
+from datetime import datetime
+from database.db import db
+from database.models import ActivityLog
+from cache import invalidate, ACTIVITY
+
+class ActivityLogger:
+    """تجميع سجلات النشاط وكتابتها بإدراج واحد متعدد الصفوف
+
+    تُكتب الدفعة عند بلوغ ACTIVITY_LOG_BATCH_SIZE أو بعد مرور
+    ACTIVITY_LOG_FLUSH_INTERVAL ثانية، وعند إيقاف العملية. إذا امتلأ
+    الطابور (ACTIVITY_LOG_MAX_QUEUE) يكتبه المستدعي بنفسه بدل إسقاط السجلات.
+    في الوضع المتزامن (ACTIVITY_LOG_SYNC أو TESTING) يُكتب كل سجل فوراً.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config['ACTIVITY_LOG_BATCH_SIZE']
+        self.interval = app.config['ACTIVITY_LOG_FLUSH_INTERVAL']
+        self.max_queue = app.config['ACTIVITY_LOG_MAX_QUEUE']
+        app.extensions['activity_logger'] = self
+        atexit.register(self.stop)
+
+    @property
+    def sync(self):
+        return self.app.config['ACTIVITY_LOG_SYNC'] or self.app.testing
+
+    def log(self, user_id, action, details=None, ip_address=None):
+        """إضافة سجل إلى الطابور (أو كتابته فوراً في الوضع المتزامن)"""
+        row = {
+            'user_id': user_id,
+            'action': action,
+            'details': details,
+            'ip_address': ip_address,
+            'created_at': datetime.utcnow(),
+        }
+        if self.sync:
+            self._write([row])
+            return
+
+        with self._lock:
+            self._queue.append(row)
+            size = len(self._queue)
+
+        if size >= self.max_queue:
+            # الطابور ممتلئ (الكاتب متأخر): الكتابة من خيط الطلب
+            self.flush()
+            return
+        self._ensure_thread()
+        if size >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """كتابة كل السجلات المنتظرة"""
+        while True:
+            with self._lock:
+                rows = self._queue[:self.batch_size]
+                del self._queue[:self.batch_size]
+            if not rows:
+                return
+            self._write(rows)
+
+    def stop(self):
+        """إيقاف خيط الكتابة وكتابة ما تبقى (عند إيقاف العملية)"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.interval + 5)
+        self.flush()
+
+    def pending(self):
+        """عدد السجلات المنتظرة في الطابور"""
+        with self._lock:
+            return len(self._queue)
+
+    def _ensure_thread(self):
+        # الخيط لا ينتقل مع fork، لذا يُنشأ عند أول استخدام في كل عملية
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _write(self, rows):
+        """إدراج الدفعة في معاملة مستقلة عن جلسة الطلب"""
+        try:
+            with self._write_lock, self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(ActivityLog.__table__.insert().values(rows))
+                invalidate(ACTIVITY)
+        except Exception:
+            self.app.logger.exception(f"Error writing {len(rows)} activity log entries")
@@ -0,0 +1,28 @@
+from flask import Blueprint, render_template, redirect, url_for, flash, current_app
+from flask_login import login_required, current_user
+from utils import log_activity
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.before_request
+@login_required
+def require_admin():
+    """صفحات الإدارة للمدير فقط"""
+    if not current_user.is_admin():
+        flash('ليس لديك صلاحية للوصول إلى هذه الصفحة', 'danger')
+        return redirect(url_for('index'))
+
+@admin_bp.route('/slow-queries')
+def slow_queries():
+    """الاستعلامات البطيئة مجمعة حسب الاستعلام الموحد"""
+    slow_log = current_app.extensions['slow_query_log']
+    return render_template('admin/slow_queries.html', slow_log=slow_log,
+                           groups=slow_log.grouped() if slow_log.enabled else [])
+
+@admin_bp.route('/slow-queries/clear', methods=['POST'])
+def clear_slow_queries():
+    """حذف سجل الاستعلامات البطيئة"""
+    current_app.extensions['slow_query_log'].clear()
+    log_activity(current_user.id, 'حذف سجل الاستعلامات البطيئة', 'تم حذف سجل الاستعلامات البطيئة')
+    flash('تم حذف سجل الاستعلامات البطيئة', 'success')
+    return redirect(url_for('admin.slow_queries'))
@@ -2,6 +2,7 @@ from flask import Flask, render_template, request, redirect, url_for, flash, ses
 from flask_login import LoginManager, current_user, login_required
 from flask_bootstrap import Bootstrap5
 from flask_wtf.csrf import CSRFProtect
+from flask_migrate import Migrate
 from config.config import Config
 from database.db import db
 import os
@@ -15,16 +16,66 @@ def create_app():
     # إضافة CSRF حماية
     csrf = CSRFProtect(app)
     
-    # إعداد ترميز UTF-8 للاستجابات
+    # إعداد ترميز UTF-8 لصفحات HTML فقط (دون المساس بنوع الملفات و JSON)
     @app.after_request
     def add_charset(response):
-        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+        if response.mimetype == 'text/html':
+            response.headers['Content-Type'] = 'text/html; charset=utf-8'
         return response
     
-    # تهيئة الإضافات
+    # تهيئة الإضافات (مع ضبط محرك قاعدة البيانات: مجمع الاتصالات و PRAGMA لـ SQLite)
+    from database.engine import engine_options, configure_engine
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     db.init_app(app)
+    configure_engine(app, db)
+    Migrate(app, db, render_as_batch=True)
     Bootstrap5(app)
     
+    # تحديث عدادات الإحصائيات مع كل كتابة على المراسلات
+    from database.counters import register_counter_listeners
+    register_counter_listeners()
+    
+    # عدّاد مراجع الملفات المخزنة حسب المحتوى
+    from database.blobs import register_blob_listeners
+    register_blob_listeners()
+    
+    # مزامنة فهرس البحث النصي (SQLite FTS5)
+    from database.fts import register_fts_listeners
+    register_fts_listeners()
+    
+    # سجل النشاطات المؤجل
+    from activity import ActivityLogger
+    ActivityLogger(app)
+    
+    # توليد الصور المصغرة في الخلفية
+    from thumbnails import ThumbnailWorker
+    ThumbnailWorker(app)
+    
+    # استخراج نص المرفقات في الخلفية
+    from extraction import TextExtractor
+    TextExtractor(app)
+    
+    # عد استعلامات SQL وزمن الاستجابة لكل طلب
+    from metrics import RequestMetrics
+    RequestMetrics(app)
+    
+    # سجل الاستعلامات البطيئة (SLOW_QUERY_LOG)
+    from slowlog import SlowQueryLog
+    SlowQueryLog(app)
+    
+    # الذاكرة المؤقتة لواجهات لوحة التحكم وإبطالها عند الكتابة
+    from cache import ApiCache, register_cache_listeners
+    ApiCache(app)
+    register_cache_listeners()
+    
+    # بث تحديثات لوحة التحكم المباشرة (SSE)
+    from events import EventBroker
+    EventBroker(app)
+    
+    # أوامر سطر الأوامر
+    from commands import register_commands
+    register_commands(app)
+    
     # إعداد Flask-Login
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -43,6 +94,8 @@ def create_app():
     from letters import letters_bp
     from archive import archive_bp
     from search import search_bp
+    from uploads import uploads_bp
+    from admin import admin_bp
     
     # معالج قبل كل طلب
     @app.before_request
@@ -57,6 +110,8 @@ def create_app():
     app.register_blueprint(letters_bp, url_prefix='/letters')
     app.register_blueprint(archive_bp, url_prefix='/archive')
     app.register_blueprint(search_bp, url_prefix='/search')
+    app.register_blueprint(uploads_bp, url_prefix='/uploads')
+    app.register_blueprint(admin_bp, url_prefix='/admin')
     
     # الصفحة الرئيسية
     @app.route('/')
@@ -77,52 +132,11 @@ def create_app():
     @login_required
     def get_stats_api():
         """API للحصول على الإحصائيات"""
-        from database.models import Letter, User
+        from stats import compute_stats
+        from cache import cached_json, STATS
         
         try:
-            incoming_count = Letter.query.filter_by(
-                letter_type='incoming',
-                is_archived=False
-            ).count()
-            
-            outgoing_count = Letter.query.filter_by(
-                letter_type='outgoing',
-                is_archived=False
-            ).count()
-            
-            archived_count = Letter.query.filter_by(
-                is_archived=True
-            ).count()
-            
-            users_count = User.query.count()
-            total_letters = Letter.query.count()
-            
-            # الحصول على الإحصائيات الشهرية
-            current_month = datetime.now().month
-            current_year = datetime.now().year
-            
-            monthly_incoming = Letter.query.filter(
-                Letter.letter_type == 'incoming',
-                db.extract('year', Letter.created_at) == current_year,
-                db.extract('month', Letter.created_at) == current_month
-            ).count()
-            
-            monthly_outgoing = Letter.query.filter(
-                Letter.letter_type == 'outgoing',
-                db.extract('year', Letter.created_at) == current_year,
-                db.extract('month', Letter.created_at) == current_month
-            ).count()
-            
-            return jsonify({
-                'success': True,
-                'incoming_count': incoming_count,
-                'outgoing_count': outgoing_count,
-                'archived_count': archived_count,
-                'users_count': users_count,
-                'total_letters': total_letters,
-                'monthly_incoming': monthly_incoming,
-                'monthly_outgoing': monthly_outgoing
-            })
+            return cached_json(STATS, 'stats', lambda: {'success': True, **compute_stats()})
         except Exception as e:
             app.logger.error(f"Error in stats API: {str(e)}")
             return jsonify({
@@ -130,65 +144,60 @@ def create_app():
                 'error': str(e)
             }), 500
     
+    # بث مباشر للإحصائيات والنشاطات الجديدة (Server-Sent Events)
+    @app.route('/api/events')
+    @login_required
+    def dashboard_events():
+        """تدفق SSE: لقطة كاملة عند الاتصال ثم الفروق فقط"""
+        broker = app.extensions['event_broker']
+        subscriber, snapshot = broker.subscribe()
+        if subscriber is None:
+            # المتصفح يعود إلى الاستطلاع الدوري
+            return jsonify({
+                'success': False,
+                'error': 'عدد الاتصالات المباشرة بلغ الحد الأقصى'
+            }), 503
+        
+        response = app.response_class(broker.stream(subscriber, snapshot), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    
+    # مقاييس الطلبات بصيغة Prometheus
+    @app.route('/metrics')
+    def metrics():
+        """عدد الطلبات وزمنها واستعلامات SQL لكل مسار (للمدير فقط)"""
+        request_metrics = app.extensions['request_metrics']
+        if not request_metrics.authorized():
+            return jsonify({
+                'success': False,
+                'error': 'ليس لديك صلاحية لعرض المقاييس'
+            }), 403
+        return app.response_class(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+    
     # معالج context لجميع القوالب
     @app.context_processor
     def inject_functions():
         """حقن الدوال والإحصائيات في جميع القوالب"""
         from database.models import Letter, User, ActivityLog
+        from stats import get_request_stats, compute_stats, compute_yearly_stats, empty_stats
         
-        def get_stats():
-            """الحصول على الإحصائيات"""
-            stats = {
-                'incoming_count': 0,
-                'outgoing_count': 0,
-                'archived_count': 0,
-                'users_count': 0,
-                'total_letters': 0,
-                'monthly_incoming': 0,
-                'monthly_outgoing': 0
-            }
+        def load_stats():
+            """حساب الإحصائيات من قاعدة البيانات"""
+            stats = empty_stats()
             
             try:
                 if current_user.is_authenticated:
-                    # إحصائيات المراسلات
-                    stats['incoming_count'] = Letter.query.filter_by(
-                        letter_type='incoming',
-                        is_archived=False
-                    ).count()
-                    
-                    stats['outgoing_count'] = Letter.query.filter_by(
-                        letter_type='outgoing',
-                        is_archived=False
-                    ).count()
-                    
-                    stats['archived_count'] = Letter.query.filter_by(
-                        is_archived=True
-                    ).count()
-                    
-                    stats['users_count'] = User.query.count()
-                    stats['total_letters'] = Letter.query.count()
-                    
-                    # إحصائيات الشهر الحالي
-                    current_month = datetime.now().month
-                    current_year = datetime.now().year
-                    
-                    stats['monthly_incoming'] = Letter.query.filter(
-                        Letter.letter_type == 'incoming',
-                        db.extract('year', Letter.created_at) == current_year,
-                        db.extract('month', Letter.created_at) == current_month
-                    ).count()
-                    
-                    stats['monthly_outgoing'] = Letter.query.filter(
-                        Letter.letter_type == 'outgoing',
-                        db.extract('year', Letter.created_at) == current_year,
-                        db.extract('month', Letter.created_at) == current_month
-                    ).count()
-                    
+                    stats = compute_stats()
             except Exception as e:
                 app.logger.error(f"Error getting stats: {str(e)}")
             
             return stats
         
+        def get_stats():
+            """الحصول على الإحصائيات (تُحسب مرة واحدة لكل طلب)"""
+            return get_request_stats(load_stats)
+        
         def get_latest_letters(limit=5):
             """الحصول على أحدث المراسلات"""
             try:
@@ -219,22 +228,7 @@ def create_app():
                     if year is None:
                         year = datetime.now().year
                     
-                    incoming_yearly = Letter.query.filter(
-                        Letter.letter_type == 'incoming',
-                        db.extract('year', Letter.created_at) == year
-                    ).count()
-                    
-                    outgoing_yearly = Letter.query.filter(
-                        Letter.letter_type == 'outgoing',
-                        db.extract('year', Letter.created_at) == year
-                    ).count()
-                    
-                    return {
-                        'year': year,
-                        'incoming': incoming_yearly,
-                        'outgoing': outgoing_yearly,
-                        'total': incoming_yearly + outgoing_yearly
-                    }
+                    return compute_yearly_stats(year)
             except Exception as e:
                 app.logger.error(f"Error getting yearly stats: {str(e)}")
             return {'year': year or datetime.now().year, 'incoming': 0, 'outgoing': 0, 'total': 0}
@@ -308,61 +302,41 @@ def create_app():
     @login_required
     def get_chart_data():
         """API لبيانات المخططات"""
-        try:
-            from database.models import Letter
-            
-            # بيانات الأشهر الـ 6 الماضية
-            months = []
-            incoming_data = []
-            outgoing_data = []
-            
-            current_date = datetime.now()
-            for i in range(5, -1, -1):
-                month_date = current_date.replace(day=1)
-                for _ in range(i):
-                    # الذهاب للشهر السابق
-                    month_date = month_date.replace(day=1) - timedelta(days=1)
-                    month_date = month_date.replace(day=1)
-                
-                month_name = month_date.strftime('%Y-%m')
-                months.append(month_date.strftime('%b %Y'))
-                
-                year = month_date.year
-                month = month_date.month
-                
-                incoming = Letter.query.filter(
-                    Letter.letter_type == 'incoming',
-                    db.extract('year', Letter.created_at) == year,
-                    db.extract('month', Letter.created_at) == month
-                ).count()
-                
-                outgoing = Letter.query.filter(
-                    Letter.letter_type == 'outgoing',
-                    db.extract('year', Letter.created_at) == year,
-                    db.extract('month', Letter.created_at) == month
-                ).count()
-                
-                incoming_data.append(incoming)
-                outgoing_data.append(outgoing)
-            
+        from stats import compute_chart_series, CHART_WINDOWS, CHART_GRANULARITIES
+        from cache import cached_json, STATS
+        
+        months = request.args.get('months', 6, type=int)
+        granularity = request.args.get('granularity', 'month')
+        
+        if months not in CHART_WINDOWS or granularity not in CHART_GRANULARITIES:
             return jsonify({
+                'success': False,
+                'error': 'قيمة months أو granularity غير صالحة'
+            }), 400
+        
+        def load_chart():
+            series = compute_chart_series(months, granularity)
+            return {
                 'success': True,
-                'labels': months,
+                'labels': series['labels'],
                 'datasets': [
                     {
                         'label': 'المراسلات الواردة',
-                        'data': incoming_data,
+                        'data': series['incoming'],
                         'backgroundColor': 'rgba(13, 110, 253, 0.8)',
                         'borderColor': 'rgba(13, 110, 253, 1)'
                     },
                     {
                         'label': 'المراسلات الصادرة',
-                        'data': outgoing_data,
+                        'data': series['outgoing'],
                         'backgroundColor': 'rgba(25, 135, 84, 0.8)',
                         'borderColor': 'rgba(25, 135, 84, 1)'
                     }
                 ]
-            })
+            }
+        
+        try:
+            return cached_json(STATS, f'chart:{months}:{granularity}', load_chart)
             
         except Exception as e:
             app.logger.error(f"Error in chart data API: {str(e)}")
@@ -376,9 +350,10 @@ def create_app():
     @login_required
     def get_recent_activity_api():
         """API للنشاطات الأخيرة"""
-        try:
-            from database.models import ActivityLog, User
-            
+        from database.models import ActivityLog, User
+        from cache import cached_json, ACTIVITY
+        
+        def load_activities():
             activities = ActivityLog.query\
                 .join(User, ActivityLog.user_id == User.id)\
                 .add_columns(User.username, User.full_name)\
@@ -398,10 +373,13 @@ def create_app():
                     'time_ago': get_time_ago(activity.created_at)
                 })
             
-            return jsonify({
+            return {
                 'success': True,
                 'activities': activity_list
-            })
+            }
+        
+        try:
+            return cached_json(ACTIVITY, 'recent', load_activities)
             
         except Exception as e:
             app.logger.error(f"Error in activity API: {str(e)}")
@@ -454,41 +432,97 @@ def create_app():
             return ""
         return get_time_ago(value)
     
-    # إنشاء مجلدات الرفع إذا لم تكن موجودة
+    return app
+
+class SchemaNotCurrentError(RuntimeError):
+    """قاعدة البيانات ليست على آخر ترحيل (flask db upgrade)"""
+    pass
+
+def schema_state(app):
+    """حالة قاعدة البيانات بالنسبة للترحيلات
+
+    current: على آخر ترحيل، outdated: ترحيلات لم تُطبق، empty: بلا جداول،
+    legacy: جداول بدون سجل ترحيلات (قاعدة بيانات سابقة للترحيلات).
+    """
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    from sqlalchemy import inspect
+    
+    directory = app.extensions['migrate'].directory
+    if not os.path.isabs(directory):
+        directory = os.path.join(app.root_path, directory)
+    heads = set(ScriptDirectory(directory).get_heads())
+    
+    with app.app_context(), db.engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+        has_tables = inspect(connection).has_table('letters')
+    
+    if current == heads:
+        return 'current'
+    if current:
+        return 'outdated'
+    return 'legacy' if has_tables else 'empty'
+
+def init_instance(app):
+    """تهيئة لمرة واحدة قبل التشغيل: المجلدات والعدادات وفهرس البحث
+
+    تُنفذ بالأمر `flask init` (وعند تشغيل خادم التطوير) وليس في create_app:
+    مع عدة عمال (gunicorn) كان كل عامل يكرر هذا العمل ويتسابق على إنشاء
+    الجداول. الجداول نفسها من الترحيلات: يرفض العمل (SchemaNotCurrentError)
+    قبل `flask db upgrade`. يعيد ملخصاً بما تم.
+    """
+    state = schema_state(app)
+    if state == 'legacy':
+        raise SchemaNotCurrentError(
+            "قاعدة بيانات سابقة للترحيلات: شغّل 'flask db stamp 0001' ثم 'flask db upgrade' قبل 'flask init'"
+        )
+    if state != 'current':
+        raise SchemaNotCurrentError("قاعدة البيانات ليست على آخر ترحيل: شغّل 'flask db upgrade' قبل 'flask init'")
+    
+    summary = {'folders': [], 'counters_rebuilt': False, 'legacy_attachments': False, 'indexed': None}
+    
     with app.app_context():
-        # مجلدات الرفع
-        upload_folders = [
+        # مجلدات الرفع ومجلد instance (قاعدة بيانات SQLite وسجل الاستعلامات البطيئة)
+        folders = [
             app.config['UPLOAD_FOLDER'],
             os.path.join(app.config['UPLOAD_FOLDER'], 'letters'),
             os.path.join(app.config['UPLOAD_FOLDER'], 'attachments'),
+            app.config['BLOB_STORE_FOLDER'],
+            app.instance_path,
         ]
         
-        # مجلدات النظام
-        system_folders = [
-            'static/uploads',
-            'static/uploads/letters',
-            'static/uploads/attachments',
-            'templates/errors',
-            'database'
-        ]
-        
-        for folder in upload_folders + system_folders:
+        for folder in folders:
             full_path = os.path.join(app.root_path, folder)
             if not os.path.exists(full_path):
                 os.makedirs(full_path, exist_ok=True)
+                summary['folders'].append(full_path)
                 app.logger.info(f"Created folder: {full_path}")
         
-        # إنشاء جدول المستخدمين إذا لم يكن موجوداً
-        try:
-            db.create_all()
-            app.logger.info("Database tables created successfully")
-        except Exception as e:
-            app.logger.error(f"Error creating database tables: {str(e)}")
+        # بناء العدادات لأول مرة لقاعدة بيانات سابقة لجدول العدادات
+        from database.counters import counters_need_rebuild, rebuild_counters
+        if counters_need_rebuild():
+            rebuild_counters()
+            summary['counters_rebuilt'] = True
+            app.logger.info("Letter counters rebuilt")
+        
+        # مرفقات قاعدة بيانات سابقة لم تُنقل بعد إلى جدول attachments
+        from database.attachments import legacy_attachments_pending
+        if legacy_attachments_pending():
+            summary['legacy_attachments'] = True
+            app.logger.warning("Legacy letters.attachments data found, run 'flask db upgrade' to migrate it")
+        
+        # إنشاء فهرس البحث النصي لأول مرة
+        from database.fts import fts_needs_rebuild, rebuild_fts_index
+        if fts_needs_rebuild():
+            summary['indexed'] = rebuild_fts_index()
+            app.logger.info(f"Search index built ({summary['indexed']} letters)")
     
-    return app
+    return summary
 
 if __name__ == '__main__':
+    # خادم التطوير (للإنتاج: gunicorn، انظر gunicorn.conf.py)
     app = create_app()
+    init_instance(app)
     
     # إعدادات التطوير
     if app.config.get('DEBUG', True):
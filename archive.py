@@ -1,9 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 from database.models import Letter
+from database.attachments import attachment_counts
+from database.loading import letter_list_options
 from database.db import db
 from utils import log_activity
-import json
+from pagination import KeysetPage
+from stats import get_request_total
 
 archive_bp = Blueprint('archive', __name__)
 
@@ -11,25 +14,26 @@ archive_bp = Blueprint('archive', __name__)
 @login_required
 def archive_list():
     """عرض الأرشيف"""
-    page = request.args.get('page', 1, type=int)
     per_page = 20
     
-    # الحصول على المراسلات المؤرشفة
-    letters = Letter.query.filter_by(is_archived=True)\
-        .order_by(Letter.archive_date.desc())\
-        .paginate(page=page, per_page=per_page)
+    # الحصول على المراسلات المؤرشفة (ترقيم بالمؤشر على archive_date, id)
+    letters = KeysetPage(
+        Letter.query.filter_by(is_archived=True)
+            .options(*letter_list_options(strict=current_app.config['STRICT_LOADING'])),
+        Letter.archive_date,
+        Letter.id,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=per_page
+    )
     
-    # تحويل المرفقات من JSON لكل مراسلة
-    for letter in letters.items:
-        if letter.attachments:
-            try:
-                letter.attachments_list = json.loads(letter.attachments)
-            except:
-                letter.attachments_list = []
-        else:
-            letter.attachments_list = []
+    # العدد الإجمالي (اختياري) من عدادات الإحصائيات
+    total = None
+    if current_app.config.get('LIST_SHOW_TOTAL', True):
+        total = get_request_total('archived_count')
     
-    return render_template('archive/list.html', letters=letters)
+    return render_template('archive/list.html', letters=letters, total=total,
+                           attachment_counts=attachment_counts(letter.id for letter in letters.items))
 
 @archive_bp.route('/restore/<int:letter_id>')
 @login_required
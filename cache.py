@@ -0,0 +1,224 @@
+# ذاكرة مؤقتة لواجهات لوحة التحكم (الإحصائيات، المخططات، النشاطات الأخيرة)
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from blinker import Namespace
+from flask import current_app, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# مجموعات المفاتيح: كل مجموعة تُبطل دفعة واحدة برفع رقم جيلها
+STATS = 'stats'
+ACTIVITY = 'activity'
+
+# إشارة تُرسل عند كل إبطال (يستقبلها بث التحديثات المباشرة في events.py)
+signals = Namespace()
+data_changed = signals.signal('data-changed')
+
+class MemoryBackend:
+    """ذاكرة LRU داخل العملية مع مدة صلاحية لكل مدخل
+
+    العدادات (أرقام الأجيال) في قاموس منفصل لا يُحذف منه: لو أُخرج عداد مع
+    المدخلات لعاد جيله إلى الصفر وصارت المدخلات القديمة بذلك الجيل صالحة.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+class RedisBackend:
+    """ذاكرة مشتركة بين العمليات والخوادم (تتطلب حزمة redis)"""
+
+    def __init__(self, url, prefix='correspondence:cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("API_CACHE_BACKEND=redis يتطلب تثبيت حزمة redis")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl) if ttl else None)
+
+    def incr(self, key):
+        return self._client.incr(self.prefix + key)
+
+    def counter(self, key):
+        # INCR يخزن عدداً صحيحاً نصياً، لا قيمة pickle
+        return int(self._client.get(self.prefix + key) or 0)
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + '*'):
+            self._client.delete(key)
+
+class NullBackend:
+    """تعطيل الذاكرة المؤقتة (كل طلب يُحسب من جديد)"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def incr(self, key):
+        return 0
+
+    def counter(self, key):
+        return 0
+
+    def clear(self):
+        pass
+
+def create_backend(app):
+    """إنشاء الواجهة الخلفية حسب API_CACHE_BACKEND (memory أو redis أو null)"""
+    name = app.config['API_CACHE_BACKEND']
+    if name == 'memory':
+        return MemoryBackend(app.config['API_CACHE_MAX_ENTRIES'])
+    if name == 'redis':
+        return RedisBackend(app.config['API_CACHE_URL'])
+    if name == 'null':
+        return NullBackend()
+    raise ValueError(f"Unknown API_CACHE_BACKEND: {name}")
+
+class ApiCache:
+    """ذاكرة مؤقتة لاستجابات JSON العامة (نفس النتيجة لكل المستخدمين)
+
+    يُخزن جسم الاستجابة الجاهز مع ETag، فالاستطلاع الذي لم تتغير نتيجته
+    يحصل على 304 دون جسم ودون أي استعلام. تنتهي المدخلات بعد API_CACHE_TTL
+    ثانية، وتُبطل فوراً عند تثبيت معاملة تعدل المراسلات أو المستخدمين.
+
+    مع الذاكرة داخل العملية يقتصر الإبطال على العملية الحالية، وتبقى بقية
+    العمليات حتى انتهاء الصلاحية؛ الواجهة redis تشارك الإبطال بين الجميع.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config['API_CACHE_TTL']
+        self.backend = create_backend(app)
+        app.extensions['api_cache'] = self
+
+    def _generation(self, group):
+        return self.backend.counter(f"generation:{group}")
+
+    def get_or_set(self, group, key, loader):
+        """القيمة المخزنة للمفتاح، أو حسابها بـ loader وتخزينها"""
+        full_key = f"{group}:{self._generation(group)}:{key}"
+        value = self.backend.get(full_key)
+        if value is None:
+            value = loader()
+            self.backend.set(full_key, value, self.ttl)
+        return value
+
+    def invalidate(self, *groups):
+        """إبطال مجموعات المفاتيح (المدخلات القديمة تنتهي بانتهاء صلاحيتها)"""
+        for group in groups:
+            self.backend.incr(f"generation:{group}")
+
+    def clear(self):
+        self.backend.clear()
+
+def get_cache(app=None):
+    return (app or current_app).extensions['api_cache']
+
+def _encode(payload):
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return body, hashlib.md5(body).hexdigest()
+
+def cached_json(group, key, loader):
+    """استجابة JSON من الذاكرة المؤقتة مع ETag (304 إذا لم تتغير)
+
+    loader يعيد القاموس المطلوب إرساله؛ الأخطاء لا تُخزن.
+    """
+    body, etag = get_cache().get_or_set(group, key, lambda: _encode(loader()))
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def invalidate(*groups):
+    """إبطال مجموعات المفاتيح وإرسال إشارة data_changed بالمجموعات المتغيرة"""
+    if not has_app_context():
+        return
+    app = current_app._get_current_object()
+    if 'api_cache' in app.extensions:
+        get_cache(app).invalidate(*groups)
+    data_changed.send(app, groups=groups)
+
+# النماذج التي تؤثر كتابتها على الإحصائيات والمخططات
+def _watched_models():
+    from database.models import Letter, User
+    return (Letter, User)
+
+def _track_changes(session, flush_context):
+    watched = _watched_models()
+    if any(isinstance(obj, watched) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['api_cache_stale'] = True
+
+def _after_commit(session):
+    if session.info.pop('api_cache_stale', False):
+        invalidate(STATS)
+
+def _after_rollback(session):
+    session.info.pop('api_cache_stale', None)
+
+def register_cache_listeners():
+    """إبطال الإحصائيات بعد تثبيت أي معاملة تعدل المراسلات أو المستخدمين
+
+    يشمل ذلك الإضافة والتعديل والأرشفة والحذف في letters.py و archive.py
+    والاستيراد المجمع، دون الحاجة لاستدعاء الإبطال في كل مسار.
+    """
+    if event.contains(Session, 'after_flush', _track_changes):
+        return
+    event.listen(Session, 'after_flush', _track_changes)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
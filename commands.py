@@ -0,0 +1,238 @@
+# أوامر سطر الأوامر (flask ...)
+import os
+import click
+from flask.cli import AppGroup, with_appcontext
+
+@click.command('init')
+@with_appcontext
+def init_command():
+    """تهيئة لمرة واحدة بعد `flask db upgrade`: المجلدات والعدادات وفهرس البحث (قبل تشغيل الخادم)"""
+    from flask import current_app
+    from app import init_instance, SchemaNotCurrentError
+    
+    try:
+        summary = init_instance(current_app._get_current_object())
+    except SchemaNotCurrentError as e:
+        raise click.ClickException(str(e))
+    
+    for folder in summary['folders']:
+        click.echo(f"📁 {folder}")
+    click.echo("✅ قاعدة البيانات على آخر ترحيل")
+    if summary['counters_rebuilt']:
+        click.echo("✅ تم بناء عدادات الإحصائيات")
+    if summary['indexed'] is not None:
+        click.echo(f"✅ تمت فهرسة {summary['indexed']} مراسلة للبحث")
+    if summary['legacy_attachments']:
+        click.echo("⚠️ مرفقات بالصيغة القديمة: شغّل 'flask db upgrade' لنقلها")
+
+stats_cli = AppGroup('stats', help='أوامر الإحصائيات')
+
+@stats_cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """إعادة بناء جدول العدادات من جدول المراسلات والإبلاغ عن الفروقات"""
+    from database.counters import rebuild_counters
+    
+    drift = rebuild_counters()
+    
+    if not drift:
+        click.echo("✅ العدادات مطابقة لجدول المراسلات")
+        return
+    
+    click.echo(f"⚠️ تم العثور على {len(drift)} فرق في العدادات:")
+    for (letter_type, is_archived, year, month), stored, expected in drift:
+        state = 'archived' if is_archived else 'active'
+        click.echo(f"  {year}-{month:02d} {letter_type}/{state}: {stored} -> {expected}")
+    click.echo("✅ تمت إعادة بناء العدادات")
+
+search_cli = AppGroup('search', help='أوامر فهرس البحث')
+
+@search_cli.command('reindex')
+@click.option('--batch-size', default=1000, show_default=True, help='عدد المراسلات في كل دفعة')
+def reindex_command(batch_size):
+    """إعادة بناء فهرس البحث النصي (SQLite FTS5)"""
+    from database.fts import rebuild_fts_index
+    
+    indexed = rebuild_fts_index(batch_size=batch_size)
+    if indexed == 0:
+        click.echo("⚠️ لم تتم فهرسة أي مراسلة (قاعدة البيانات فارغة أو لا تدعم FTS5)")
+        return
+    click.echo(f"✅ تمت فهرسة {indexed} مراسلة")
+
+@search_cli.command('extract')
+@click.option('--all', 'extract_all', is_flag=True, help='إعادة استخراج نص كل المراسلات')
+@click.option('--retry-failed', is_flag=True, help='إعادة محاولة المراسلات التي فشل استخراجها')
+@click.option('--workers', default=4, show_default=True, help='عدد عمليات الاستخراج')
+@click.option('--batch-size', default=100, show_default=True, help='عدد المراسلات في كل معاملة')
+def extract_command(extract_all, retry_failed, workers, batch_size):
+    """استخراج نص ملفات PDF و TXT للمراسلات الحالية وفهرسته"""
+    import time
+    from flask import current_app
+    from sqlalchemy.orm import selectinload
+    from database.db import db
+    from database.models import Letter
+    from extraction import PENDING, FAILED, extractable_filter, letter_files
+    from storage import get_store
+    
+    # يجب ضبط عدد العمليات قبل أول استخدام لمجموعة العمليات
+    current_app.config['EXTRACTION_PROCESSES'] = workers
+    extractor = current_app.extensions['text_extractor']
+    store = get_store()
+    
+    query = Letter.query.options(selectinload(Letter.attachments)).filter(extractable_filter())
+    if not extract_all:
+        statuses = [PENDING, FAILED] if retry_failed else [PENDING]
+        query = query.filter(Letter.extraction_status.is_(None) | Letter.extraction_status.in_(statuses))
+    
+    started = time.monotonic()
+    done = failed = 0
+    last_id = 0
+    while True:
+        letters = query.filter(Letter.id > last_id).order_by(Letter.id).limit(batch_size).all()
+        if not letters:
+            break
+        # كل ملفات الدفعة في مجموعة العمليات معاً، ثم تُجمع النتائج بالترتيب
+        jobs = [(letter, extractor.start(store, letter_files(letter), inline_max=0)) for letter in letters]
+        for letter, letter_jobs in jobs:
+            if extractor.apply(letter, letter_jobs) == FAILED:
+                failed += 1
+            else:
+                done += 1
+        db.session.commit()
+        last_id = letters[-1].id
+        db.session.expunge_all()
+        click.echo(f"  ... {done + failed} مراسلة")
+    
+    elapsed = time.monotonic() - started
+    click.echo(f"✅ تم استخراج نص {done} مراسلة في {elapsed:.1f} ث")
+    if failed:
+        click.echo(f"⚠️ تعذر استخراج نص {failed} مراسلة (أعد المحاولة بـ --retry-failed)")
+
+letters_cli = AppGroup('letters', help='أوامر المراسلات')
+
+@letters_cli.command('import')
+@click.argument('input_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--scans', type=click.Path(exists=True, file_okay=False), help='مجلد الملفات الممسوحة')
+@click.option('--batch-size', default=500, show_default=True, help='عدد الصفوف في كل معاملة')
+@click.option('--workers', default=4, show_default=True, help='عدد خيوط نسخ الملفات')
+@click.option('--user', 'username', default='admin', show_default=True, help='المستخدم المسجلة باسمه المراسلات')
+@click.option('--restart', is_flag=True, help='تجاهل نقطة الاستئناف والبدء من أول الملف')
+def import_letters_command(input_file, scans, batch_size, workers, username, restart):
+    """استيراد سجلات المراسلات من ملف CSV أو XLSX"""
+    from database.models import User
+    from importer import LetterImporter, LetterImportError, rejected_path
+    from utils import log_activity
+    
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"المستخدم غير موجود: {username}")
+    
+    def progress(report):
+        click.echo(f"  ... {report.processed} صف، {report.imported} مستوردة "
+                   f"({report.rows_per_second:.0f} صف/ث)")
+    
+    importer = LetterImporter(
+        input_file, user,
+        scans_folder=scans,
+        batch_size=batch_size,
+        workers=workers,
+        restart=restart,
+        progress=progress
+    )
+    try:
+        report = importer.run()
+    except LetterImportError as e:
+        raise click.ClickException(str(e))
+    
+    click.echo(f"✅ تم استيراد {report.imported} مراسلة في {report.elapsed:.1f} ث "
+               f"({report.rows_per_second:.0f} صف/ث)")
+    click.echo(f"   الملفات المنسوخة: {report.files_copied}")
+    if report.skipped:
+        click.echo(f"   تم تخطي {report.skipped} مراسلة مستوردة سابقاً")
+    if report.rejected:
+        click.echo(f"⚠️ تم رفض {report.rejected} صف، التفاصيل في: {rejected_path(input_file)}")
+    if report.extraction_pending:
+        click.echo(f"ℹ️ {report.extraction_pending} مراسلة بانتظار استخراج النص: flask search extract")
+    
+    if report.imported:
+        log_activity(importer.user_id, 'استيراد مراسلات',
+                     f'تم استيراد {report.imported} مراسلة من {os.path.basename(input_file)}')
+
+files_cli = AppGroup('files', help='أوامر مخزن الملفات')
+
+@files_cli.command('gc')
+@click.option('--grace-hours', default=1.0, show_default=True, help='عدم حذف الملفات الأحدث من هذه المدة')
+def files_gc_command(grace_hours):
+    """حذف الملفات التي لم تعد أي مراسلة تشير إليها"""
+    from datetime import timedelta
+    from flask import current_app
+    from storage import collect_garbage
+    from uploads import expire_uploads
+    
+    expired = expire_uploads(current_app.config['UPLOAD_EXPIRY'])
+    if expired:
+        click.echo(f"🗑️ تم حذف {expired} رفع مجزأ منتهي الصلاحية")
+    removed, freed = collect_garbage(timedelta(hours=grace_hours))
+    click.echo(f"✅ تم حذف {removed} ملف ({freed / 1024 / 1024:.1f} MB)")
+
+@files_cli.command('verify')
+def files_verify_command():
+    """إعادة حساب بصمة كل ملف مخزن للتحقق من سلامته"""
+    from storage import verify_store
+    
+    problems = verify_store()
+    if not problems:
+        click.echo("✅ جميع الملفات سليمة")
+        return
+    for digest, problem in problems:
+        click.echo(f"❌ {digest}: {problem}")
+    raise click.ClickException(f"{len(problems)} ملف مفقود أو تالف")
+
+@files_cli.command('thumbnails')
+@click.option('--workers', default=4, show_default=True, help='عدد خيوط التوليد')
+@click.option('--force', is_flag=True, help='إعادة توليد الصور المصغرة الموجودة')
+def files_thumbnails_command(workers, force):
+    """توليد الصور المصغرة الناقصة لصور المراسلات الحالية"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from flask import current_app
+    from database.db import db
+    from database.models import Letter
+    from storage import get_store
+    from thumbnails import can_thumbnail, generate_thumbnails, thumbnail_format
+    
+    store = get_store()
+    fmt = thumbnail_format()
+    digests = {
+        digest for digest, filename in
+        db.session.query(Letter.image_digest, Letter.letter_image).filter(Letter.image_digest.isnot(None)).distinct()
+        if can_thumbnail(filename)
+    }
+    
+    # خيوط المجمع بلا سياق تطبيق: المسجل يؤخذ قبل بدئها
+    logger = current_app.logger
+    
+    def generate(digest):
+        try:
+            return generate_thumbnails(store, digest, fmt, force=force)
+        except Exception as e:
+            logger.error(f"Error generating thumbnails for {digest}: {e}")
+            return -1
+    
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(generate, sorted(digests)))
+    elapsed = time.monotonic() - started
+    
+    generated = sum(r for r in results if r > 0)
+    failed = sum(1 for r in results if r < 0)
+    click.echo(f"✅ {len(digests)} صورة، {generated} صورة مصغرة جديدة في {elapsed:.1f} ث")
+    if failed:
+        click.echo(f"⚠️ تعذر توليد الصور المصغرة لـ {failed} صورة")
+
+def register_commands(app):
+    """تسجيل أوامر سطر الأوامر"""
+    app.cli.add_command(init_command)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(letters_cli)
+    app.cli.add_command(files_cli)
@@ -8,14 +8,105 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///correspondence.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # ضبط محرك قاعدة البيانات (database/engine.py): tuned أو default (بلا ضبط)
+    DB_ENGINE_PROFILE = os.environ.get('DB_ENGINE_PROFILE', 'tuned')
+    # SQLite: PRAGMA على كل اتصال (القيمة الفارغة تترك افتراضي SQLite)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')  # بالمللي ثانية
+    SQLITE_CACHE_SIZE = os.environ.get('SQLITE_CACHE_SIZE', '-32768')  # سالب = بالكيلوبايت (32MB لكل اتصال)
+    SQLITE_MMAP_SIZE = os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))
+    SQLITE_TEMP_STORE = os.environ.get('SQLITE_TEMP_STORE', 'MEMORY')
+    # خوادم قواعد البيانات (PostgreSQL): مجمع الاتصالات لكل عملية
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ['true', 'on', '1']
+    
     # إعدادات رفع الملفات
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
+    # الرفع المجزأ للملفات الكبيرة (كل جزء طلب مستقل أصغر من MAX_CONTENT_LENGTH)
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+    UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 1024 * 1024 * 1024))  # 1GB
+    UPLOAD_EXPIRY = timedelta(hours=int(os.environ.get('UPLOAD_EXPIRY_HOURS', 24)))
+    
+    # مخزن الملفات حسب المحتوى (نسبة إلى مجلد التطبيق أو مسار مطلق)
+    BLOB_STORE_FOLDER = os.environ.get('BLOB_STORE_FOLDER') or os.path.join(UPLOAD_FOLDER, 'blobs')
+    
+    # الصور المصغرة لصور المراسلات (webp أو jpeg)
+    THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'webp')
+    THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+    
+    # استخراج نص ملفات PDF و TXT للبحث: الملفات الأكبر من EXTRACTION_INLINE_MAX تُعالج في عمليات منفصلة
+    EXTRACTION_PROCESSES = int(os.environ.get('EXTRACTION_PROCESSES', 2))
+    EXTRACTION_INLINE_MAX = int(os.environ.get('EXTRACTION_INLINE_MAX', 256 * 1024))
+    EXTRACTION_MAX_CHARS = int(os.environ.get('EXTRACTION_MAX_CHARS', 500000))
+    
     # الإعدادات المسموح بها
     ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
     ALLOWED_ATTACHMENT_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'txt'}
     
+    # قراءة الإحصائيات من جدول العدادات بدلاً من عد المراسلات
+    STATS_USE_COUNTERS = os.environ.get('STATS_USE_COUNTERS', 'true').lower() in ['true', 'on', '1']
+    
+    # عرض العدد الإجمالي في قوائم المراسلات والأرشيف
+    LIST_SHOW_TOTAL = os.environ.get('LIST_SHOW_TOTAL', 'true').lower() in ['true', 'on', '1']
+    
+    # رفع خطأ عند تحميل علاقة أو عمود غير محدد في استعلامات القوائم (كشف N+1 في القوالب)
+    # مفعل افتراضياً مع وضع التطوير (FLASK_DEBUG)
+    STRICT_LOADING = os.environ.get('STRICT_LOADING', os.environ.get('FLASK_DEBUG', 'false')).lower() in ['true', 'on', '1']
+    
+    # الذاكرة المؤقتة لواجهات لوحة التحكم: memory (داخل العملية) أو redis (مشتركة) أو null
+    API_CACHE_BACKEND = os.environ.get('API_CACHE_BACKEND', 'memory')
+    API_CACHE_URL = os.environ.get('API_CACHE_URL', 'redis://localhost:6379/0')
+    API_CACHE_TTL = int(os.environ.get('API_CACHE_TTL', 30))
+    API_CACHE_MAX_ENTRIES = int(os.environ.get('API_CACHE_MAX_ENTRIES', 256))
+    
+    # البث المباشر للوحة التحكم (SSE): فحص دوري للتغييرات من العمليات الأخرى ونبضات إبقاء الاتصال
+    SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 30))
+    SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', 20))
+    SSE_RETRY = int(os.environ.get('SSE_RETRY', 5000))
+    # أقصى عدد اتصالات بث لكل عملية (مع gunicorn يُشتق من عدد الخيوط، انظر gunicorn.conf.py)
+    SSE_MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', 500))
+    SSE_QUEUE_SIZE = int(os.environ.get('SSE_QUEUE_SIZE', 100))
+    
+    # قياس استعلامات SQL وزمن الاستجابة لكل طلب (ترويسة Server-Timing و /metrics)
+    REQUEST_METRICS = os.environ.get('REQUEST_METRICS', 'true').lower() in ['true', 'on', '1']
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'true').lower() in ['true', 'on', '1']
+    # رمز يسمح لجامع Prometheus بقراءة /metrics دون تسجيل دخول (Authorization: Bearer ...)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # أقصى عدد استعلامات متوقع لكل مسار: تحذير في السجل عند التجاوز (None لمسار = بلا حد)
+    QUERY_BUDGET_DEFAULT = int(os.environ.get('QUERY_BUDGET_DEFAULT', 20))
+    QUERY_BUDGETS = {
+        'index': 5,
+        'get_stats_api': 3,
+        'get_chart_data': 3,
+        'get_recent_activity_api': 3,
+        'dashboard_events': 5,
+        'letters.list_letters': 6,
+        'letters.view_letter': 6,
+        'archive.archive_list': 6,
+        'search.advanced_search': 6,
+    }
+    
+    # سجل الاستعلامات البطيئة مع خطة التنفيذ (اختياري، نسبة إلى مجلد instance أو مسار مطلق)
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'false').lower() in ['true', 'on', '1']
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() in ['true', 'on', '1']
+    SLOW_QUERY_LOG_PATH = os.environ.get('SLOW_QUERY_LOG_PATH', 'slow_queries.jsonl')
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024))
+    SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 3))
+    
+    # سجل النشاطات: الكتابة على دفعات (أو فوراً عند ACTIVITY_LOG_SYNC)
+    ACTIVITY_LOG_SYNC = os.environ.get('ACTIVITY_LOG_SYNC', 'false').lower() in ['true', 'on', '1']
+    ACTIVITY_LOG_BATCH_SIZE = int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE', 100))
+    ACTIVITY_LOG_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', 2.0))
+    ACTIVITY_LOG_MAX_QUEUE = int(os.environ.get('ACTIVITY_LOG_MAX_QUEUE', 10000))
+    
     # إعدادات الجلسة
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
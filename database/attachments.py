@@ -0,0 +1,28 @@
+# استعلامات المرفقات
+from sqlalchemy import func, inspect, text
+from .db import db
+from .models import Attachment
+
+def attachment_counts(letter_ids):
+    """عدد المرفقات لكل مراسلة في استعلام مجمع واحد {letter_id: count}"""
+    letter_ids = list(letter_ids)
+    if not letter_ids:
+        return {}
+    rows = db.session.query(Attachment.letter_id, func.count(Attachment.id))\
+        .filter(Attachment.letter_id.in_(letter_ids))\
+        .group_by(Attachment.letter_id).all()
+    return dict(rows)
+
+def legacy_attachments_pending():
+    """عمود letters.attachments (JSON) القديم ما زال موجوداً ويحوي بيانات
+
+    يحدث ذلك عند تشغيل قاعدة بيانات سابقة دون `flask db upgrade` الذي
+    ينقل المرفقات إلى جدول attachments.
+    """
+    connection = db.session.connection()
+    columns = {c['name'] for c in inspect(connection).get_columns('letters')}
+    if 'attachments' not in columns:
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM letters WHERE attachments IS NOT NULL AND attachments NOT IN ('', '[]') LIMIT 1"
+    )).first() is not None
@@ -0,0 +1,278 @@
+# قياس تزامن القراءة والكتابة على SQLite قبل ضبط المحرك وبعده (DB_ENGINE_PROFILE)
+#
+#   python database/bench_concurrency.py --letters 20000 --readers 8 --writers 2 --duration 10
+#   python database/bench_concurrency.py --database-url sqlite:////tmp/corpus.db --output concurrency.json
+#
+# لكل ملف ضبط تُنسخ قاعدة البيانات (بوضع rollback journal) ويُشغل القياس في
+# عملية مستقلة لأن إعدادات المحرك تُقرأ عند إنشاء التطبيق: خيوط قراءة تطلب
+# صفحات القائمة والعرض والبحث، وخيوط كتابة تعدل المراسلات وتسجل النشاط
+# (commit لكل عملية، كما في log_activity المتزامن).
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.bench_endpoints import PERCENTILES, SEARCH_KEYWORDS, git_revision, percentile
+
+PROFILES = ('default', 'tuned')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='قياس تزامن القراءة والكتابة حسب ضبط محرك قاعدة البيانات')
+    parser.add_argument('--letters', type=int, default=20000, help='عدد المراسلات المولدة (بدون --database-url)')
+    parser.add_argument('--users', type=int, default=20, help='عدد المستخدمين المولدين')
+    parser.add_argument('--readers', type=int, default=8, help='عدد خيوط القراءة')
+    parser.add_argument('--writers', type=int, default=2, help='عدد خيوط الكتابة')
+    parser.add_argument('--duration', type=float, default=10, help='مدة القياس لكل ملف ضبط بالثواني')
+    parser.add_argument('--write-delay', type=float, default=0.01, help='انتظار بين عمليات الكتابة في كل خيط (ثانية)')
+    parser.add_argument('--profile', action='append', choices=PROFILES, help='ملف ضبط محدد (يمكن تكراره، افتراضياً الكل)')
+    parser.add_argument('--output', default='bench_concurrency.json', help='ملف نتائج JSON')
+    parser.add_argument('--database-url', help='قاعدة بيانات SQLite مولدة مسبقاً (تُنسخ ولا تُعدل)')
+    # تُستخدم داخلياً لتشغيل ملف ضبط واحد في عملية فرعية
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return None
+    return {
+        'mean': round(sum(latencies) / len(latencies) * 1000, 3),
+        **{f'p{p}': round(percentile(latencies, p) * 1000, 3) for p in PERCENTILES},
+        'max': round(latencies[-1] * 1000, 3),
+    }
+
+def run_profile(args):
+    """تشغيل القياس بملف الضبط الحالي (في العملية الفرعية)"""
+    from app import create_app
+    from database.db import db
+    from database.models import Letter, User
+    from utils import log_activity
+
+    app = create_app()
+    app.config['ACTIVITY_LOG_SYNC'] = True
+
+    with app.app_context():
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+        max_id = db.session.query(db.func.max(Letter.id)).scalar() or 1
+        admin_id = User.query.filter_by(role='admin').order_by(User.id).first().id
+        db.session.remove()
+
+    stop = threading.Event()
+    barrier = threading.Barrier(args.readers + args.writers + 1)
+    lock = threading.Lock()
+    reads, writes, read_errors, write_errors = [], [], [], []
+
+    def reader(index):
+        rng = random.Random(index)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(admin_id)
+            sess['_fresh'] = True
+        pages = (
+            lambda: '/letters/list',
+            lambda: f'/letters/view/{rng.randint(1, max_id)}',
+            lambda: f'/search/advanced?search_type=all&letter_type=all&keyword={rng.choice(SEARCH_KEYWORDS)}',
+            lambda: '/api/stats',
+        )
+        latencies, errors = [], []
+        barrier.wait()
+        while not stop.is_set():
+            url = rng.choice(pages)()
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors.append(f'{url}: HTTP {response.status_code}')
+        with lock:
+            reads.extend(latencies)
+            read_errors.extend(errors)
+
+    def writer(index):
+        rng = random.Random(1000 + index)
+        latencies, errors = [], []
+        barrier.wait()
+        while not stop.is_set():
+            started = time.perf_counter()
+            with app.app_context():
+                try:
+                    letter = db.session.get(Letter, rng.randint(1, max_id))
+                    if letter is not None:
+                        letter.subject = f'{letter.subject.split(" #", 1)[0]} #{rng.randint(1, 9999)}'
+                        db.session.commit()
+                    log_activity(admin_id, 'تعديل مراسلة', f'قياس التزامن {index}')
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(str(e).splitlines()[0])
+                finally:
+                    db.session.remove()
+            latencies.append(time.perf_counter() - started)
+            if args.write_delay:
+                time.sleep(args.write_delay)
+        with lock:
+            writes.extend(latencies)
+            write_errors.extend(errors)
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'journal_mode': journal_mode,
+        'elapsed': round(elapsed, 2),
+        'reads': {
+            'count': len(reads),
+            'per_second': round(len(reads) / elapsed, 1),
+            'errors': len(read_errors),
+            'latency_ms': latency_summary(reads),
+        },
+        'writes': {
+            'count': len(writes),
+            'per_second': round(len(writes) / elapsed, 1),
+            'errors': len(write_errors),
+            'first_error': write_errors[0] if write_errors else None,
+            'latency_ms': latency_summary(writes),
+        },
+    }
+
+def prepare_database(args):
+    """مسار قاعدة بيانات المصدر: المعطاة، أو مجموعة مولدة في ملف مؤقت"""
+    from sqlalchemy.engine import make_url
+
+    if args.database_url:
+        url = make_url(args.database_url)
+        if url.get_backend_name() != 'sqlite' or not url.database:
+            print("❌ هذا القياس لملفات SQLite فقط (إعدادات مجمع PostgreSQL لا تغير قفل القراءة/الكتابة)")
+            return None
+        return url.database
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    # التوليد في عملية فرعية بلا ضبط، حتى يبقى الملف بوضع rollback journal
+    print(f"🌱 توليد {args.letters} مراسلة...")
+    result = subprocess.run(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seed_corpus.py'),
+         '--letters', str(args.letters), '--users', str(args.users), '--database-url', f'sqlite:///{path}'],
+        env={**os.environ, 'DB_ENGINE_PROFILE': 'default'}, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stdout + result.stderr)
+        return None
+    return path
+
+def copy_database(source, profile):
+    """نسخة من قاعدة البيانات بوضع rollback journal (backup يشمل محتوى ملف WAL)"""
+    handle, path = tempfile.mkstemp(suffix=f'-{profile}.db')
+    os.close(handle)
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(path)
+    try:
+        src.backup(dst)
+        dst.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        src.close()
+        dst.close()
+    return path
+
+def run_child(args, profile, path):
+    handle, output = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    command = [sys.executable, os.path.abspath(__file__), '--worker-output', output,
+               '--readers', str(args.readers), '--writers', str(args.writers),
+               '--duration', str(args.duration), '--write-delay', str(args.write_delay)]
+    env = {
+        **os.environ,
+        'DATABASE_URL': f'sqlite:///{path}',
+        'DB_ENGINE_PROFILE': profile,
+        'API_CACHE_BACKEND': 'null',
+    }
+    result = subprocess.run(command, env=env)
+    try:
+        if result.returncode != 0:
+            return None
+        with open(output, encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+def print_result(profile, result):
+    reads, writes = result['reads'], result['writes']
+    print(f"  {profile:<8} {result['journal_mode']:<8} "
+          f"{reads['per_second']:>8.1f} {reads['latency_ms']['p50']:>8.1f} {reads['latency_ms']['p95']:>8.1f} "
+          f"{reads['latency_ms']['p99']:>9.1f} {reads['latency_ms']['max']:>9.1f}  "
+          f"{writes['per_second']:>8.1f} {writes['latency_ms']['p95']:>8.1f}  "
+          f"{reads['errors'] + writes['errors']}")
+
+def run_benchmark(args):
+    source = prepare_database(args)
+    if source is None:
+        return False
+
+    profiles = args.profile or list(PROFILES)
+    print(f"📊 {args.readers} خيط قراءة، {args.writers} خيط كتابة، {args.duration:g} ث لكل ملف ضبط")
+    results = {}
+    for profile in profiles:
+        path = copy_database(source, profile)
+        try:
+            results[profile] = run_child(args, profile, path)
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        if results[profile] is None:
+            print(f"❌ فشل القياس بملف الضبط {profile}")
+            return False
+
+    print(f"  {'الضبط':<8} {'journal':<8} {'قراءة/ث':>8} {'p50':>8} {'p95':>8} {'p99':>9} {'max':>9}  "
+          f"{'كتابة/ث':>8} {'p95':>8}  أخطاء")
+    for profile, result in results.items():
+        print_result(profile, result)
+
+    if 'default' in results and 'tuned' in results:
+        before, after = results['default'], results['tuned']
+        for kind in ('reads', 'writes'):
+            old, new = before[kind]['per_second'], after[kind]['per_second']
+            p95_old, p95_new = before[kind]['latency_ms']['p95'], after[kind]['latency_ms']['p95']
+            label = 'القراءة' if kind == 'reads' else 'الكتابة'
+            print(f"🔁 {label}: {old}→{new}/ث ({(new - old) / old * 100 if old else 0:+.0f}%)، "
+                  f"p95 {p95_old:.1f}→{p95_new:.1f} مللي ثانية")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'readers': args.readers,
+            'writers': args.writers,
+            'duration': args.duration,
+            'write_delay': args.write_delay,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 النتائج في {args.output}")
+    return True
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.worker_output:
+        result = run_profile(args)
+        with open(args.worker_output, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        sys.exit(0)
+    sys.exit(0 if run_benchmark(args) else 1)
@@ -0,0 +1,200 @@
+# مقارنة حمل قاعدة البيانات للوحات تحكم مفتوحة: الاستطلاع الدوري مقابل البث المباشر (SSE)
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='حمل لوحات التحكم: الاستطلاع مقابل SSE')
+    parser.add_argument('--dashboards', type=int, default=200, help='عدد لوحات التحكم المفتوحة')
+    parser.add_argument('--minutes', type=int, default=5, help='عدد الدقائق المحاكاة')
+    parser.add_argument('--writes-per-minute', type=int, default=3, help='عدد المراسلات المضافة كل دقيقة')
+    parser.add_argument('--letters', type=int, default=2000, help='عدد المراسلات الأولية')
+    parser.add_argument('--database-url', help='قاعدة بيانات الاختبار (افتراضياً ملف SQLite مؤقت)')
+    return parser.parse_args()
+
+class StatementCounter:
+    """عد استعلامات SQL، اختيارياً لخيط محدد فقط"""
+
+    def __init__(self, engine, thread_name=None):
+        from sqlalchemy import event
+        self.count = 0
+        self.thread_name = thread_name
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.thread_name and threading.current_thread().name != self.thread_name:
+            return
+        with self._lock:
+            self.count += 1
+
+    def reset(self):
+        with self._lock:
+            value, self.count = self.count, 0
+        return value
+
+def seed(app, letters):
+    from datetime import date, datetime, timedelta
+    from database.db import db
+    from database.models import User, Letter
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', full_name='Bench', role='admin')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+        now = datetime.utcnow()
+        db.session.add_all(Letter(
+            letter_type='incoming' if i % 2 else 'outgoing',
+            reference_number=f'BENCH-{i}',
+            access_number=f'BENCH-{i}',
+            sender='bench',
+            receiver='bench',
+            subject='bench',
+            letter_date=date.today(),
+            access_date=date.today(),
+            created_at=now - timedelta(hours=i),
+            user_id=user.id
+        ) for i in range(letters))
+        db.session.commit()
+        return user.id
+
+def logged_in_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
+
+_sequence = itertools.count()
+
+def add_letter(client):
+    response = client.post('/letters/add/incoming', data={
+        'reference_number': f'LIVE-{next(_sequence)}', 'sender': 'bench', 'receiver': 'bench',
+        'subject': 'bench', 'content': 'bench',
+        'letter_date': '2025-01-01', 'access_date': '2025-01-02'
+    })
+    assert response.status_code == 302, response.status_code
+
+def bench_polling(app, clients, writer, counter, minutes, writes_per_minute):
+    """كل لوحة تطلب /api/stats مرة في الدقيقة (setInterval 60 ثانية)"""
+    statements = 0
+    started = time.perf_counter()
+    for minute in range(minutes):
+        for _ in range(writes_per_minute):
+            add_letter(writer)
+        counter.reset()
+        for client in clients:
+            assert client.get('/api/stats').status_code == 200
+        statements += counter.reset()
+    return statements / minutes, time.perf_counter() - started
+
+def bench_sse(app, clients, writer, publisher_counter, request_counter, minutes, writes_per_minute):
+    """كل لوحة تفتح /api/events مرة، والناشر يحسب الإحصائيات مرة لكل تغيير"""
+    broker = app.extensions['event_broker']
+    received = [0] * len(clients)
+    latest = [0.0] * len(clients)
+    streams = []
+
+    request_counter.reset()
+    for client in clients:
+        response = client.get('/api/events', buffered=False)
+        assert response.status_code == 200, response.status_code
+        streams.append(response)
+    connect_statements = request_counter.reset()
+
+    def reader(index, response):
+        for chunk in response.response:
+            if chunk.startswith(b'event: stats'):
+                received[index] += 1
+                latest[index] = time.perf_counter()
+
+    readers = [threading.Thread(target=reader, args=(i, r), daemon=True) for i, r in enumerate(streams)]
+    for thread in readers:
+        thread.start()
+    deadline = time.perf_counter() + 10
+    while min(received) < 1:
+        if time.perf_counter() > deadline:
+            raise RuntimeError('لم تصل اللقطة الأولى إلى كل الاتصالات')
+        time.sleep(0.01)
+
+    latencies = []
+    publisher_counter.reset()
+    for minute in range(minutes):
+        for _ in range(writes_per_minute):
+            expected = min(received) + 1
+            committed = time.perf_counter()
+            add_letter(writer)
+            deadline = time.perf_counter() + 10
+            while min(received) < expected and time.perf_counter() < deadline:
+                time.sleep(0.001)
+            latencies.append(max(latest) - committed)
+    publisher_statements = publisher_counter.reset()
+
+    # الفحص الدوري لتغييرات العمليات الأخرى (كل SSE_POLL_INTERVAL ثانية)
+    request_counter.reset()
+    broker._refresh({'stats', 'activity'})
+    periodic = request_counter.reset() * 60 / broker.poll_interval
+
+    broker.disconnect_all()
+    for thread in readers:
+        thread.join(timeout=5)
+    return {
+        'connect': connect_statements,
+        'per_minute': publisher_statements / minutes + periodic,
+        'latencies': sorted(latencies)
+    }
+
+def run_benchmark(dashboards, minutes, writes_per_minute, letters):
+    from app import create_app
+    from cache import NullBackend, MemoryBackend
+    from database.db import db
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['ACTIVITY_LOG_SYNC'] = True
+    user_id = seed(app, letters)
+
+    with app.app_context():
+        engine = db.engine
+    all_statements = StatementCounter(engine)
+    publisher_statements = StatementCounter(engine, thread_name='dashboard-events')
+
+    writer = logged_in_client(app, user_id)
+    clients = [logged_in_client(app, user_id) for _ in range(dashboards)]
+    cache = app.extensions['api_cache']
+
+    print(f"📊 {dashboards} لوحة تحكم، {minutes} دقيقة، {writes_per_minute} مراسلة/دقيقة، {letters} مراسلة أولية")
+
+    cache.backend = NullBackend()
+    per_minute, elapsed = bench_polling(app, clients, writer, all_statements, minutes, writes_per_minute)
+    print(f"🔁 استطلاع دون ذاكرة مؤقتة: {per_minute:.0f} استعلام/دقيقة ({elapsed:.2f} ثانية)")
+
+    cache.backend = MemoryBackend(app.config['API_CACHE_MAX_ENTRIES'])
+    per_minute, elapsed = bench_polling(app, clients, writer, all_statements, minutes, writes_per_minute)
+    print(f"🔁 استطلاع مع الذاكرة المؤقتة: {per_minute:.0f} استعلام/دقيقة ({elapsed:.2f} ثانية)")
+
+    result = bench_sse(app, clients, writer, publisher_statements, all_statements, minutes, writes_per_minute)
+    latencies = result['latencies']
+    print(f"📡 SSE: {result['connect']} استعلام عند فتح {dashboards} اتصال (مرة واحدة)، "
+          f"ثم {result['per_minute']:.0f} استعلام/دقيقة")
+    if latencies:
+        print(f"⏱️ وصول التحديث إلى كل اللوحات: الوسيط {latencies[len(latencies) // 2] * 1000:.1f} مللي ثانية، "
+              f"الأقصى {latencies[-1] * 1000:.1f} مللي ثانية")
+    return True
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    sys.exit(0 if run_benchmark(args.dashboards, args.minutes, args.writes_per_minute, args.letters) else 1)
@@ -0,0 +1,220 @@
+# قياس زمن الاستجابة وعدد الاستعلامات لأهم صفحات التطبيق على مجموعة بيانات اصطناعية
+#
+#   python database/bench_endpoints.py --letters 100000 --output bench.json
+#   python database/bench_endpoints.py --database-url sqlite:////tmp/corpus.db --compare bench.json
+#
+# بدون --database-url تُولد مجموعة بيانات مؤقتة (database/seed_corpus.py). النتائج
+# تُكتب بصيغة JSON مع رقم الإيداع (commit) لمقارنة التشغيلات عبر الإيداعات.
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PERCENTILES = (50, 90, 95, 99)
+
+SEARCH_KEYWORDS = ('الميزانية', 'التوظيف', 'وزارة المالية', 'recrutement', 'budget', 'Sonelgaz')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='قياس أداء صفحات التطبيق')
+    parser.add_argument('--letters', type=int, default=20000, help='عدد المراسلات المولدة (بدون --database-url)')
+    parser.add_argument('--users', type=int, default=20, help='عدد المستخدمين المولدين')
+    parser.add_argument('--requests', type=int, default=50, help='عدد الطلبات المقاسة لكل صفحة')
+    parser.add_argument('--warmup', type=int, default=3, help='طلبات تحمية غير محسوبة لكل صفحة')
+    parser.add_argument('--only', action='append', help='قياس صفحة محددة فقط (يمكن تكراره)')
+    parser.add_argument('--no-cache', action='store_true', help='تعطيل الذاكرة المؤقتة لواجهات لوحة التحكم')
+    parser.add_argument('--output', default='bench_endpoints.json', help='ملف نتائج JSON')
+    parser.add_argument('--compare', help='ملف نتائج سابق للمقارنة')
+    parser.add_argument('--database-url', help='قاعدة بيانات مولدة مسبقاً (افتراضياً ملف SQLite مؤقت جديد)')
+    return parser.parse_args()
+
+class StatementCounter:
+    """عد استعلامات SQL في خيط القياس"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        self._thread = threading.get_ident()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.count += 1
+
+    def reset(self):
+        value, self.count = self.count, 0
+        return value
+
+def percentile(values, p):
+    """النسبة المئوية بطريقة أقرب رتبة (values مرتبة)"""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * p // 100))
+    return values[rank - 1]
+
+def summarize(latencies, queries):
+    latencies = sorted(latencies)
+    return {
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3),
+            **{f'p{p}': round(percentile(latencies, p) * 1000, 3) for p in PERCENTILES},
+            'max': round(latencies[-1] * 1000, 3),
+        },
+        'queries': {
+            'mean': round(sum(queries) / len(queries), 2),
+            'max': max(queries),
+        },
+    }
+
+def git_revision():
+    """رقم الإيداع الحالي، مع علامة إذا كانت هناك تعديلات غير مودعة"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if dirty else commit
+
+def build_endpoints(rng):
+    """الصفحات المقاسة: الاسم ← دالة تعيد الرابط (بعض الروابط عشوائية في كل طلب)"""
+    from database.db import db
+    from database.models import Letter
+    from pagination import encode_cursor
+
+    active = db.session.query(db.func.count(Letter.id)).filter(Letter.is_archived.is_(False)).scalar()
+    # مؤشر صفحة عميقة (قرب نهاية القائمة) كما يصلها المستخدم بالضغط على "التالي"
+    deep = db.session.query(Letter.created_at, Letter.id)\
+        .filter(Letter.is_archived.is_(False))\
+        .order_by(Letter.created_at.desc(), Letter.id.desc())\
+        .offset(max(0, int(active * 0.9))).first()
+    deep_cursor = encode_cursor(*deep) if deep else ''
+    max_id = db.session.query(db.func.max(Letter.id)).scalar() or 1
+
+    return {
+        'index': lambda: '/',
+        'api_stats': lambda: '/api/stats',
+        'api_chart_data': lambda: '/api/chart-data?months=12',
+        'list_letters': lambda: '/letters/list',
+        'list_letters_deep': lambda: f'/letters/list?after={deep_cursor}',
+        'archive_list': lambda: '/archive/',
+        'advanced_search': lambda: f'/search/advanced?search_type=all&letter_type=all&keyword={rng.choice(SEARCH_KEYWORDS)}',
+        'view_letter': lambda: f'/letters/view/{rng.randint(1, max_id)}',
+    }
+
+def measure(client, counter, make_url, requests, warmup):
+    for _ in range(warmup):
+        client.get(make_url())
+    latencies = []
+    queries = []
+    for _ in range(requests):
+        url = make_url()
+        counter.reset()
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - started)
+        queries.append(counter.reset())
+        if response.status_code != 200:
+            raise RuntimeError(f'{url}: HTTP {response.status_code}')
+    return summarize(latencies, queries)
+
+def print_comparison(results, previous):
+    """الفرق مع تشغيل سابق (الوسيط و p95 وعدد الاستعلامات)"""
+    print(f"\n🔁 مقارنة مع {previous['meta'].get('git_revision')} ({previous['meta'].get('timestamp')})")
+    for name, current in results.items():
+        before = previous['results'].get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ('p50', 'p95'):
+            old, new = before['latency_ms'][key], current['latency_ms'][key]
+            changes.append(f"{key} {old:.1f}→{new:.1f} ({(new - old) / old * 100 if old else 0:+.0f}%)")
+        changes.append(f"استعلامات {before['queries']['mean']}→{current['queries']['mean']}")
+        print(f"  {name:<18} " + '، '.join(changes))
+
+def run_benchmark(args):
+    from app import create_app
+    from database.db import db
+    from database.models import Letter, User
+    from database.seed_corpus import seed_corpus
+
+    app = create_app()
+    app.config['ACTIVITY_LOG_SYNC'] = True
+
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Letter.id).first() is None:
+            print(f"🌱 توليد {args.letters} مراسلة...")
+            seed_corpus(users=args.users, letters=args.letters)
+        letters = db.session.query(db.func.count(Letter.id)).scalar()
+        admin = User.query.filter_by(role='admin').order_by(User.id).first()
+        if admin is None:
+            print("❌ لا يوجد مستخدم مدير في قاعدة البيانات")
+            return False
+        admin_id = admin.id
+        engine = db.engine
+        endpoints = build_endpoints(random.Random(1))
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(admin_id)
+        sess['_fresh'] = True
+    counter = StatementCounter(engine)
+
+    selected = args.only or list(endpoints)
+    unknown = set(selected) - set(endpoints)
+    if unknown:
+        print(f"❌ صفحات غير معروفة: {', '.join(sorted(unknown))} (المتاح: {', '.join(endpoints)})")
+        return False
+
+    print(f"📊 {letters} مراسلة، {args.requests} طلب لكل صفحة ({engine.dialect.name})")
+    print(f"  {'الصفحة':<18} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  استعلامات")
+    results = {}
+    for name in selected:
+        results[name] = measure(client, counter, endpoints[name], args.requests, args.warmup)
+        latency, queries = results[name]['latency_ms'], results[name]['queries']
+        print(f"  {name:<18} {latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f} "
+              f"{latency['max']:>8.1f}  {queries['mean']:g} (أقصى {queries['max']})")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'database': engine.dialect.name,
+            'letters': letters,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'api_cache': app.config['API_CACHE_BACKEND'],
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 النتائج في {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+    return True
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.no_cache:
+        os.environ['API_CACHE_BACKEND'] = 'null'
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    sys.exit(0 if run_benchmark(args) else 1)
@@ -0,0 +1,201 @@
+# قياس زمن إقلاع خادم الإنتاج: الزمن حتى أول طلب لكل عامل gunicorn
+#
+#   python database/bench_startup.py --workers 4 --runs 3
+#   python database/bench_startup.py --database-url sqlite:////tmp/corpus.db --output startup.json
+#
+# يُشغل gunicorn بإعدادات gunicorn.conf.py مع تحميل التطبيق مسبقاً (preload)
+# وبدونه، وتُرسل طلبات متزامنة حتى يخدم كل عامل طلبه الأول. الزمن لكل عامل
+# من سطر "first request" الذي يكتبه خطاف post_request في gunicorn.conf.py.
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from database.bench_endpoints import git_revision
+
+MODES = {'preload': 'true', 'no-preload': 'false'}
+
+FIRST_REQUEST = re.compile(r'Worker (\d+) first request after ([\d.]+) ms')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='قياس زمن إقلاع عمال gunicorn حتى أول طلب')
+    parser.add_argument('--workers', type=int, default=4, help='عدد عمال gunicorn')
+    parser.add_argument('--threads', type=int, default=8, help='عدد الخيوط لكل عامل')
+    parser.add_argument('--runs', type=int, default=3, help='عدد مرات التشغيل لكل وضع')
+    parser.add_argument('--timeout', type=float, default=60, help='أقصى انتظار لكل تشغيل بالثواني')
+    parser.add_argument('--mode', action='append', choices=list(MODES), help='وضع محدد (يمكن تكراره، افتراضياً الكل)')
+    parser.add_argument('--output', default='bench_startup.json', help='ملف نتائج JSON')
+    parser.add_argument('--database-url', help='قاعدة البيانات (افتراضياً ملف SQLite مؤقت تُهيئه flask init)')
+    return parser.parse_args()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def run_command(command, env):
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stdout + result.stderr)
+        return None
+    return result
+
+def measure_boot(env):
+    """زمن create_app وحده، وزمن init_instance (كان يتكرر عند إقلاع كل عامل)"""
+    script = (
+        "import json, time\n"
+        "started = time.perf_counter()\n"
+        "from app import create_app, init_instance\n"
+        "app = create_app()\n"
+        "created = time.perf_counter()\n"
+        "init_instance(app)\n"
+        "print(json.dumps({'create_app_ms': (created - started) * 1000,"
+        " 'init_instance_ms': (time.perf_counter() - created) * 1000}))\n"
+    )
+    result = run_command([sys.executable, '-c', script], env)
+    if result is None:
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def start_server(env, args, preload):
+    port = free_port()
+    env = {
+        **env,
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+        'GUNICORN_PRELOAD': preload,
+        'GUNICORN_MAX_REQUESTS': '0',
+    }
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return process, f'http://127.0.0.1:{port}/auth/login'
+
+def run_once(env, args, preload):
+    """تشغيل واحد: (زمن أول استجابة، {pid: زمن أول طلب منذ fork}، زمن خدمة كل العمال)"""
+    started = time.perf_counter()
+    process, url = start_server(env, args, preload)
+    workers = {}
+    first_response = []
+    done = threading.Event()
+
+    def read_log():
+        for line in process.stderr:
+            match = FIRST_REQUEST.search(line)
+            if match:
+                workers[int(match.group(1))] = float(match.group(2))
+                if len(workers) >= args.workers:
+                    done.set()
+
+    def request_loop():
+        while not done.is_set():
+            try:
+                with urllib.request.urlopen(url, timeout=2) as response:
+                    response.read()
+                if not first_response:
+                    first_response.append(time.perf_counter() - started)
+            except OSError:
+                time.sleep(0.01)
+
+    reader = threading.Thread(target=read_log, daemon=True)
+    reader.start()
+    clients = [threading.Thread(target=request_loop, daemon=True) for _ in range(args.workers * 2)]
+    for client in clients:
+        client.start()
+    all_served = (time.perf_counter() - started) if done.wait(args.timeout) else None
+    done.set()
+    for client in clients:
+        client.join()
+    process.terminate()
+    process.wait(timeout=30)
+    reader.join(timeout=5)
+
+    if all_served is None:
+        return None
+    return {
+        'first_response_ms': round(first_response[0] * 1000, 1) if first_response else None,
+        'all_workers_served_ms': round(all_served * 1000, 1),
+        'worker_first_request_ms': sorted(round(ms, 1) for ms in workers.values()),
+    }
+
+def summarize(runs):
+    per_worker = [ms for run in runs for ms in run['worker_first_request_ms']]
+    return {
+        'runs': runs,
+        'first_response_ms': round(statistics.median(run['first_response_ms'] for run in runs), 1),
+        'all_workers_served_ms': round(statistics.median(run['all_workers_served_ms'] for run in runs), 1),
+        'worker_first_request_ms': {
+            'min': min(per_worker),
+            'median': round(statistics.median(per_worker), 1),
+            'max': max(per_worker),
+        },
+    }
+
+def run_benchmark(args):
+    env = dict(os.environ)
+    if args.database_url:
+        env['DATABASE_URL'] = args.database_url
+    else:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        env['DATABASE_URL'] = f'sqlite:///{path}'
+
+    # التهيئة لمرة واحدة قبل تشغيل الخادم
+    for command in (['db', 'upgrade'], ['init']):
+        if run_command([sys.executable, '-m', 'flask', '--app', 'app:create_app', *command], env) is None:
+            print(f"❌ فشل flask {' '.join(command)}")
+            return False
+
+    boot = measure_boot(env)
+    if boot is None:
+        return False
+    print(f"⏱️ create_app: {boot['create_app_ms']:.0f} مللي ثانية (مع الاستيراد)، "
+          f"init_instance: {boot['init_instance_ms']:.0f} مللي ثانية (في flask init فقط)")
+
+    print(f"📊 {args.workers} عامل × {args.threads} خيط، {args.runs} تشغيل لكل وضع")
+    print(f"  {'الوضع':<11} {'أول استجابة':>12} {'كل العمال':>10}  أول طلب لكل عامل منذ fork (أدنى/وسيط/أقصى)")
+    results = {}
+    for mode in args.mode or list(MODES):
+        runs = []
+        for _ in range(args.runs):
+            run = run_once(env, args, MODES[mode])
+            if run is None:
+                print(f"❌ لم تخدم كل العمال طلباً خلال {args.timeout:g} ث ({mode})")
+                return False
+            runs.append(run)
+        results[mode] = summarize(runs)
+        result = results[mode]
+        per_worker = result['worker_first_request_ms']
+        print(f"  {mode:<11} {result['first_response_ms']:>12.0f} {result['all_workers_served_ms']:>10.0f}  "
+              f"{per_worker['min']:.0f} / {per_worker['median']:.0f} / {per_worker['max']:.0f}")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'workers': args.workers,
+            'threads': args.threads,
+            'runs': args.runs,
+            'cpu_count': os.cpu_count(),
+        },
+        'boot': boot,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 النتائج في {args.output}")
+    return True
+
+if __name__ == '__main__':
+    sys.exit(0 if run_benchmark(parse_args()) else 1)
@@ -0,0 +1,83 @@
+# سجلات الملفات المخزنة حسب المحتوى وعدّاد مراجعها
+from datetime import datetime
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .db import db
+from .models import Attachment, Blob, Letter, Upload
+
+# الأعمدة التي تشير إلى ملف مخزن (الرفع المجزأ المكتمل يحمي ملفه حتى يُربط بمراسلة)
+REFERENCES = ((Letter, 'image_digest'), (Attachment, 'checksum'), (Upload, 'digest'))
+
+def ensure_blob(digest, size):
+    """تسجيل الملف المخزن (إن لم يكن مسجلاً) ضمن معاملة الجلسة الحالية"""
+    connection = db.session.connection()
+    table = Blob.__table__
+    dialect = connection.dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else pg_insert
+        connection.execute(
+            insert(table)
+            .values(digest=digest, size=size, ref_count=0, created_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=['digest'])
+        )
+        return
+
+    if db.session.get(Blob, digest) is None:
+        db.session.add(Blob(digest=digest, size=size, ref_count=0))
+        db.session.flush()
+
+def _apply_delta(connection, digest, delta):
+    if not digest or not delta:
+        return
+    table = Blob.__table__
+    connection.execute(
+        table.update().where(table.c.digest == digest).values(ref_count=table.c.ref_count + delta)
+    )
+
+def _listeners(attribute):
+    def on_insert(mapper, connection, target):
+        _apply_delta(connection, getattr(target, attribute), 1)
+
+    def on_delete(mapper, connection, target):
+        _apply_delta(connection, getattr(target, attribute), -1)
+
+    def on_update(mapper, connection, target):
+        history = inspect(target).attrs[attribute].history
+        if not history.has_changes():
+            return
+        for old in history.deleted:
+            _apply_delta(connection, old, -1)
+        for new in history.added:
+            _apply_delta(connection, new, 1)
+
+    return on_insert, on_update, on_delete
+
+def _track_old_value(target, value, oldvalue, initiator):
+    pass
+
+def register_blob_listeners():
+    """تحديث ref_count مع كل إضافة أو تعديل أو حذف لمرجع إلى ملف مخزن"""
+    if getattr(register_blob_listeners, 'registered', False):
+        return
+    register_blob_listeners.registered = True
+
+    for model, attribute in REFERENCES:
+        # تحميل القيمة القديمة عند التعديل حتى لو كان الحقل منتهي الصلاحية
+        event.listen(getattr(model, attribute), 'set', _track_old_value, active_history=True)
+        on_insert, on_update, on_delete = _listeners(attribute)
+        event.listen(model, 'after_insert', on_insert)
+        event.listen(model, 'after_update', on_update)
+        event.listen(model, 'after_delete', on_delete)
+
+def recount_references():
+    """إعادة حساب ref_count من المراجع الفعلية (بعد العمليات المجمعة)"""
+    letter_refs = select(func.count(Letter.id))\
+        .where(Letter.image_digest == Blob.digest).scalar_subquery()
+    attachment_refs = select(func.count(Attachment.id))\
+        .where(Attachment.checksum == Blob.digest).scalar_subquery()
+    upload_refs = select(func.count(Upload.id))\
+        .where(Upload.digest == Blob.digest).scalar_subquery()
+    db.session.execute(Blob.__table__.update().values(ref_count=letter_refs + attachment_refs + upload_refs))
+    db.session.commit()
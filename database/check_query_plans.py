@@ -0,0 +1,110 @@
+# التحقق من خطط تنفيذ استعلامات المسارات الرئيسية
+import os
+import re
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import create_app, schema_state
+from database.db import db
+from database.models import User
+
+# المسارات التي تُفحص استعلاماتها
+ROUTES = [
+    '/',
+    '/letters/list',
+    '/archive/',
+    '/api/stats',
+    '/api/chart-data?months=24',
+    '/api/recent-activity',
+    # البحث بالنص الكامل (FTS5) في كل الحقول أو حقل واحد، مع فلاتر النوع والتاريخ
+    '/search/advanced?search_type=all&letter_type=all&keyword=الميزانية',
+    '/search/advanced?search_type=subject&letter_type=outgoing&keyword=التوظيف',
+    '/search/advanced?search_type=sender&letter_type=incoming&keyword=وزارة المالية'
+    '&start_date=2020-01-01&end_date=2030-12-31',
+]
+
+# جداول صغيرة بطبيعتها (بضعة صفوف) لا يُعد مسحها مشكلة
+SMALL_TABLES = {'letter_counters'}
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?!.*\bINDEX\b)')
+# استعلامات فرعية في الخطة (مثل العد المحدود في OffsetPage): مسحها ليس مسحاً لجدول
+SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+
+def capture_route_queries(app, user):
+    """تنفيذ المسارات وجمع استعلامات SELECT التي تصدرها"""
+    captured = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.setdefault(statement, (route, parameters))
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user.id)
+        sess['_fresh'] = True
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for route in ROUTES:
+            response = client.get(route)
+            if response.status_code >= 400:
+                print(f"⚠️ {route}: HTTP {response.status_code}")
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return captured
+
+def full_scans(plan):
+    """الجداول التي تُمسح بالكامل في خطة التنفيذ"""
+    subqueries = {match.group(1) for match in (SUBQUERY.match(row[-1]) for row in plan) if match}
+    tables = []
+    for row in plan:
+        match = FULL_SCAN.match(row[-1])
+        if match and match.group(1) not in SMALL_TABLES | subqueries:
+            tables.append(match.group(1))
+    return tables
+
+def check_query_plans():
+    """تشغيل EXPLAIN QUERY PLAN لكل استعلام والفشل عند وجود مسح كامل لجدول"""
+    app = create_app()
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            print("⚠️ هذا الفحص يدعم SQLite فقط (EXPLAIN QUERY PLAN)")
+            return True
+
+        state = schema_state(app)
+        if state != 'current':
+            print(f"❌ قاعدة البيانات ليست على آخر ترحيل ({state}): شغّل `flask db upgrade` أولاً "
+                  f"(قواعد البيانات السابقة للترحيلات: انظر migrations/README)")
+            return False
+
+        user = User.query.first()
+        if user is None:
+            print("⚠️ لا يوجد مستخدمون في قاعدة البيانات، شغّل database/init_db.py أولاً")
+            return False
+
+        captured = capture_route_queries(app, user)
+        failures = 0
+
+        with db.engine.connect() as conn:
+            for statement, (route, parameters) in captured.items():
+                plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                scanned = full_scans(plan)
+                status = '❌' if scanned else '✅'
+                print(f"{status} {route}: {' '.join(statement.split())[:100]}")
+                for row in plan:
+                    print(f"      {row[-1]}")
+                if scanned:
+                    failures += 1
+
+        if failures:
+            print(f"\n❌ {failures} استعلام يمسح الجدول بالكامل")
+            return False
+
+        print(f"\n✅ جميع الاستعلامات ({len(captured)}) تستخدم الفهارس")
+        return True
+
+if __name__ == '__main__':
+    sys.exit(0 if check_query_plans() else 1)
@@ -0,0 +1,134 @@
+# عدادات المراسلات المحدثة تزايدياً
+from datetime import datetime
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .db import db
+from .models import Letter, LetterCounter
+
+BUCKET_COLUMNS = ('letter_type', 'is_archived', 'year', 'month')
+
+def bucket_key(letter_type, is_archived, created_at):
+    """مفتاح الخانة: (النوع، مؤرشف، السنة، الشهر)"""
+    created_at = created_at or datetime.utcnow()
+    return (letter_type, bool(is_archived), created_at.year, created_at.month)
+
+def _apply_delta(connection, key, delta):
+    """إضافة delta إلى خانة العداد ضمن نفس المعاملة"""
+    if not delta:
+        return
+
+    table = LetterCounter.__table__
+    values = dict(zip(BUCKET_COLUMNS, key))
+    dialect = connection.dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else pg_insert
+        stmt = insert(table).values(count=delta, **values).on_conflict_do_update(
+            index_elements=list(BUCKET_COLUMNS),
+            set_={'count': table.c.count + delta}
+        )
+        connection.execute(stmt)
+        return
+
+    where = [table.c[name] == value for name, value in values.items()]
+    result = connection.execute(
+        table.update().where(*where).values(count=table.c.count + delta)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(count=delta, **values))
+
+def _previous_value(state, name):
+    """القيمة السابقة للحقل قبل التعديل"""
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), name)
+
+def _on_insert(mapper, connection, target):
+    _apply_delta(connection, bucket_key(target.letter_type, target.is_archived, target.created_at), 1)
+
+def _on_delete(mapper, connection, target):
+    _apply_delta(connection, bucket_key(target.letter_type, target.is_archived, target.created_at), -1)
+
+def _on_update(mapper, connection, target):
+    state = inspect(target)
+    old_key = bucket_key(
+        _previous_value(state, 'letter_type'),
+        _previous_value(state, 'is_archived'),
+        _previous_value(state, 'created_at')
+    )
+    new_key = bucket_key(target.letter_type, target.is_archived, target.created_at)
+    if old_key != new_key:
+        _apply_delta(connection, old_key, -1)
+        _apply_delta(connection, new_key, 1)
+
+def _track_old_value(target, value, oldvalue, initiator):
+    pass
+
+def register_counter_listeners():
+    """ربط تحديث العدادات بعمليات الإضافة والتعديل والحذف على المراسلات
+
+    ملاحظة: العمليات المجمعة (query.update / query.delete) لا تمر عبر هذه
+    الأحداث، ويجب بعدها إعادة بناء العدادات.
+    """
+    if event.contains(Letter, 'after_insert', _on_insert):
+        return
+
+    # تحميل القيمة القديمة عند التعديل حتى لو كان الحقل منتهي الصلاحية
+    for attribute in (Letter.letter_type, Letter.is_archived, Letter.created_at):
+        event.listen(attribute, 'set', _track_old_value, active_history=True)
+
+    event.listen(Letter, 'after_insert', _on_insert)
+    event.listen(Letter, 'after_update', _on_update)
+    event.listen(Letter, 'after_delete', _on_delete)
+
+def counts_from_letters():
+    """حساب العدادات من جدول المراسلات مباشرة"""
+    year = db.extract('year', Letter.created_at)
+    month = db.extract('month', Letter.created_at)
+    rows = db.session.query(
+        Letter.letter_type,
+        Letter.is_archived,
+        year,
+        month,
+        func.count(Letter.id)
+    ).group_by(Letter.letter_type, Letter.is_archived, year, month).all()
+
+    counts = {}
+    for letter_type, is_archived, row_year, row_month, count in rows:
+        key = (letter_type, bool(is_archived), int(row_year), int(row_month))
+        counts[key] = counts.get(key, 0) + count
+    return counts
+
+def stored_counts():
+    """العدادات المخزنة حالياً"""
+    return {
+        (c.letter_type, bool(c.is_archived), c.year, c.month): c.count
+        for c in LetterCounter.query.all()
+    }
+
+def rebuild_counters():
+    """إعادة بناء العدادات من الصفر وإرجاع الفروقات المكتشفة"""
+    expected = counts_from_letters()
+    stored = stored_counts()
+
+    drift = []
+    for key in sorted(set(expected) | set(stored), key=lambda k: (k[2], k[3], k[0], k[1])):
+        if expected.get(key, 0) != stored.get(key, 0):
+            drift.append((key, stored.get(key, 0), expected.get(key, 0)))
+
+    LetterCounter.query.delete()
+    db.session.add_all([
+        LetterCounter(**dict(zip(BUCKET_COLUMNS, key)), count=count)
+        for key, count in expected.items()
+    ])
+    db.session.commit()
+    return drift
+
+def counters_need_rebuild():
+    """العدادات فارغة بينما توجد مراسلات (قاعدة بيانات سابقة لجدول العدادات)"""
+    return (
+        db.session.query(LetterCounter.id).first() is None
+        and db.session.query(Letter.id).first() is not None
+    )
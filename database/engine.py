@@ -0,0 +1,83 @@
+# ضبط محرك قاعدة البيانات (DB_ENGINE_PROFILE)
+#
+# tuned: أوامر PRAGMA على كل اتصال SQLite جديد (WAL حتى لا ينتظر القراء
+# انتهاء كل commit)، وإعدادات مجمع الاتصالات لخوادم قواعد البيانات
+# (PostgreSQL). default: إعدادات SQLAlchemy و SQLite الافتراضية كما هي.
+#
+# ملاحظة: WAL لا يعمل على أنظمة الملفات الشبكية (NFS/SMB)، وفيها يُضبط
+# SQLITE_JOURNAL_MODE=DELETE.
+import re
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = ('tuned', 'default')
+
+# ترتيب التطبيق: journal_mode أولاً لأنه يحدد سلوك synchronous
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'SQLITE_JOURNAL_MODE'),
+    ('synchronous', 'SQLITE_SYNCHRONOUS'),
+    ('busy_timeout', 'SQLITE_BUSY_TIMEOUT'),
+    ('cache_size', 'SQLITE_CACHE_SIZE'),
+    ('mmap_size', 'SQLITE_MMAP_SIZE'),
+    ('temp_store', 'SQLITE_TEMP_STORE'),
+)
+
+_PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+def _profile(config):
+    profile = config['DB_ENGINE_PROFILE']
+    if profile not in PROFILES:
+        raise ValueError(f"DB_ENGINE_PROFILE غير معروف: {profile} (المتاح: {', '.join(PROFILES)})")
+    return profile
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS مع إعدادات مجمع الاتصالات (لغير SQLite)
+
+    القيم الموجودة مسبقاً في SQLALCHEMY_ENGINE_OPTIONS لها الأولوية.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if _profile(config) == 'default' or is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return options
+    options.setdefault('pool_size', config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+    options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+    return options
+
+def sqlite_pragmas(config):
+    """(الاسم، القيمة) لكل PRAGMA مضبوط (القيمة الفارغة تترك الافتراضي)"""
+    pragmas = []
+    for name, key in SQLITE_PRAGMAS:
+        value = str(config.get(key) or '').strip()
+        if not value:
+            continue
+        if not _PRAGMA_VALUE.match(value):
+            raise ValueError(f"قيمة غير صالحة لـ {key}: {value}")
+        pragmas.append((name, value))
+    return pragmas
+
+def register_sqlite_pragmas(engine, pragmas):
+    """تطبيق PRAGMA على كل اتصال جديد في مجمع الاتصالات"""
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', set_pragmas)
+    return set_pragmas
+
+def configure_engine(app, db):
+    """تطبيق ملف الضبط على محرك التطبيق (بعد db.init_app وقبل أول اتصال)"""
+    if _profile(app.config) == 'default' or not is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    pragmas = sqlite_pragmas(app.config)
+    if pragmas:
+        with app.app_context():
+            register_sqlite_pragmas(db.engine, pragmas)
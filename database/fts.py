@@ -0,0 +1,179 @@
+# فهرس البحث النصي الكامل (SQLite FTS5) مع توحيد النص العربي والفرنسي
+import re
+import sys
+import unicodedata
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.orm import load_only
+from .db import db
+from .models import Letter
+
+FTS_TABLE = 'letters_fts'
+
+# الأعمدة المفهرسة ووزن كل منها في ترتيب BM25
+FTS_COLUMNS = ('reference_number', 'access_number', 'sender', 'subject', 'content', 'extracted_text')
+FTS_WEIGHTS = (5.0, 5.0, 3.0, 3.0, 1.0, 0.5)
+
+# تحويلات الحروف العربية بعد إزالة التشكيل
+ARABIC_FOLDING = str.maketrans({
+    'ٱ': 'ا',  # ألف الوصل
+    'ى': 'ي',  # الألف المقصورة
+    'ة': 'ه',  # التاء المربوطة
+    'ـ': None,  # التطويل
+})
+
+# أداة التعريف وما يسبقها من حروف (تُحذف إذا بقي بعدها 3 أحرف على الأقل)
+ARABIC_ARTICLE = re.compile(r'\b(?:وال|فال|بال|كال|لل|ال)(?=\w{3})')
+
+_TOKEN_SPLIT = re.compile(r'[^\w]+')
+
+# حالة جدول FTS لكل محرك قاعدة بيانات
+_fts_ready = {}
+
+# جدول تحويل واحد: حذف علامات التشكيل والنبر مع تحويلات الحروف العربية (يُبنى عند أول استخدام)
+_normalize_table = None
+
+def _folding_table():
+    global _normalize_table
+    if _normalize_table is None:
+        table = {c: None for c in range(sys.maxunicode + 1) if unicodedata.combining(chr(c))}
+        table.update(ARABIC_FOLDING)
+        _normalize_table = table
+    return _normalize_table
+
+def normalize_text(value):
+    """توحيد النص للفهرسة والبحث
+
+    - إزالة التشكيل العربي وعلامات النبر الفرنسية
+    - توحيد أشكال الألف والهمزة (أ إ آ ٱ ← ا، ؤ ← و، ئ ← ي)
+    - التاء المربوطة ← هاء، الألف المقصورة ← ياء
+    - حذف أداة التعريف (ال، وال، بال، لل ...)
+    - تحويل الأحرف اللاتينية إلى صغيرة
+    """
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    folded = decomposed.translate(_folding_table()).casefold()
+    return ARABIC_ARTICLE.sub('', folded)
+
+def build_match_query(keyword, column=None):
+    """تحويل كلمة البحث إلى تعبير MATCH (عبارة مع مطابقة بادئة آخر كلمة)"""
+    tokens = [t for t in _TOKEN_SPLIT.split(normalize_text(keyword)) if t]
+    if not tokens:
+        return None
+    phrase = '"{}"*'.format(' '.join(tokens).replace('"', '""'))
+    if column:
+        return f'{{{column}}} : ({phrase})'
+    return phrase
+
+def _fts_columns(connection):
+    """أعمدة جدول FTS الموجود، أو None إذا لم يكن موجوداً"""
+    if not inspect(connection).has_table(FTS_TABLE):
+        return None
+    return tuple(row[1] for row in connection.execute(text(f"PRAGMA table_info({FTS_TABLE})")))
+
+def fts_available(connection=None):
+    """هل جدول FTS5 موجود بالأعمدة الحالية وقابل للاستخدام على قاعدة البيانات الحالية؟"""
+    connection = connection or db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        return False
+    key = str(connection.engine.url)
+    if key not in _fts_ready:
+        _fts_ready[key] = _fts_columns(connection) == FTS_COLUMNS
+    return _fts_ready[key]
+
+def create_fts_table(connection):
+    """إنشاء جدول FTS5 إذا لم يكن موجوداً"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    columns = ', '.join(FTS_COLUMNS)
+    try:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{columns}, tokenize='unicode61 remove_diacritics 2')"
+        ))
+    except Exception:
+        # SQLite مبني بدون FTS5
+        return False
+    _fts_ready.pop(str(connection.engine.url), None)
+    return True
+
+def _row_values(letter):
+    return {name: normalize_text(getattr(letter, name)) for name in FTS_COLUMNS}
+
+def _upsert(connection, *letters):
+    columns = ', '.join(FTS_COLUMNS)
+    placeholders = ', '.join(f':{name}' for name in FTS_COLUMNS)
+    connection.execute(
+        text(f"INSERT OR REPLACE INTO {FTS_TABLE}(rowid, {columns}) VALUES (:rowid, {placeholders})"),
+        [dict(_row_values(letter), rowid=letter.id) for letter in letters]
+    )
+
+def _on_insert(mapper, connection, target):
+    if fts_available(connection):
+        _upsert(connection, target)
+
+def _on_update(mapper, connection, target):
+    if not fts_available(connection):
+        return
+    state = inspect(target)
+    changed = [name for name in FTS_COLUMNS if state.attrs[name].history.has_changes()]
+    if changed:
+        # تحديث الأعمدة المتغيرة فقط: النص المستخرج عمود مؤجل ولا يُحمّل عند تعديل غيره
+        assignments = ', '.join(f'{name} = :{name}' for name in changed)
+        values = {name: normalize_text(getattr(target, name)) for name in changed}
+        connection.execute(
+            text(f"UPDATE {FTS_TABLE} SET {assignments} WHERE rowid = :rowid"),
+            dict(values, rowid=target.id)
+        )
+
+def _on_delete(mapper, connection, target):
+    if fts_available(connection):
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {'rowid': target.id})
+
+def register_fts_listeners():
+    """مزامنة جدول FTS مع جدول المراسلات عبر أحداث ORM"""
+    if event.contains(Letter, 'after_insert', _on_insert):
+        return
+    event.listen(Letter, 'after_insert', _on_insert)
+    event.listen(Letter, 'after_update', _on_update)
+    event.listen(Letter, 'after_delete', _on_delete)
+
+def fts_needs_rebuild():
+    """جدول FTS غير موجود على SQLite، أو أعمدته قديمة، أو عدد صفوفه لا يطابق المراسلات
+
+    مقارنة العدد تكشف فهرساً ناقصاً (مثلاً بعد توقف إعادة البناء في منتصفها).
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        return False
+    if _fts_columns(connection) != FTS_COLUMNS:
+        return True
+    indexed = connection.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+    return indexed != db.session.query(func.count(Letter.id)).scalar()
+
+def rebuild_fts_index(batch_size=1000):
+    """إعادة بناء فهرس البحث من جدول المراسلات على دفعات"""
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite' and _fts_columns(connection) not in (None, FTS_COLUMNS):
+        # تغيرت الأعمدة المفهرسة: يُعاد إنشاء الجدول
+        connection.execute(text(f"DROP TABLE {FTS_TABLE}"))
+    if not create_fts_table(connection):
+        return 0
+
+    connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    total = 0
+    last_id = 0
+    while True:
+        letters = Letter.query.options(load_only(Letter.id, *[getattr(Letter, n) for n in FTS_COLUMNS]))\
+            .filter(Letter.id > last_id)\
+            .order_by(Letter.id)\
+            .limit(batch_size).all()
+        if not letters:
+            break
+        _upsert(connection, *letters)
+        total += len(letters)
+        last_id = letters[-1].id
+        db.session.expunge_all()
+
+    db.session.commit()
+    return total
@@ -3,7 +3,8 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import create_app
+from flask_migrate import upgrade
+from app import create_app, init_instance, schema_state
 from database.db import db
 from database.models import User
 
@@ -11,10 +12,19 @@ def init_database():
     """تهيئة قاعدة البيانات"""
     app = create_app()
     
+    # إنشاء الجداول أو تحديثها بالترحيلات
+    state = schema_state(app)
+    if state == 'legacy':
+        print("❌ قاعدة بيانات سابقة للترحيلات: شغّل 'flask db stamp 0001' ثم 'flask db upgrade'")
+        return False
+    if state != 'current':
+        with app.app_context():
+            upgrade(directory=os.path.join(app.root_path, 'migrations'))
+    
+    # إنشاء المجلدات والعدادات وفهرس البحث
+    init_instance(app)
+    
     with app.app_context():
-        # إنشاء الجداول
-        db.create_all()
-        
         # إنشاء مستخدم مسؤول افتراضي
         admin = User.query.filter_by(username='admin').first()
         if not admin:
@@ -30,6 +40,7 @@ def init_database():
             print("✅ تم إنشاء مستخدم المسؤول بنجاح")
         
         print("✅ تم تهيئة قاعدة البيانات بنجاح")
+    return True
 
 if __name__ == '__main__':
-    init_database()
\ No newline at end of file
+    sys.exit(0 if init_database() else 1)
\ No newline at end of file
@@ -0,0 +1,33 @@
+# استراتيجيات تحميل العلاقات لاستعلامات القوائم وصفحة العرض
+#
+# العلاقات في النماذج lazy=True: الوصول إلى letter.creator داخل حلقة في قالب
+# يرسل استعلاماً لكل صف (N+1). لذلك تحدد استعلامات القوائم ما تحمله صراحة،
+# وفي وضع STRICT_LOADING يرفع الوصول إلى أي علاقة أخرى خطأً بدلاً من
+# استعلام صامت، فيظهر نمط N+1 الجديد في القالب أثناء التطوير والاختبار.
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+from .models import Letter, User
+
+# أعمدة منشئ المراسلة المعروضة (بدون كلمة المرور)
+CREATOR_COLUMNS = (User.id, User.username, User.full_name)
+
+def creator_option():
+    """منشئ المراسلة في نفس الاستعلام (علاقة متعدد-إلى-واحد: JOIN على المفتاح الأساسي)"""
+    return joinedload(Letter.creator).load_only(*CREATOR_COLUMNS)
+
+def letter_list_options(columns=None, strict=False):
+    """خيارات تحميل قوائم المراسلات (القائمة، الأرشيف، نتائج البحث)
+
+    columns: الأعمدة المحملة فقط (load_only)، والباقي مؤجل. في الوضع الصارم
+    يرفع الوصول إلى عمود مؤجل أو علاقة غير محملة الخطأ
+    sqlalchemy.exc.InvalidRequestError.
+    """
+    options = [creator_option()]
+    if columns:
+        options.append(load_only(*columns, raiseload=strict))
+    if strict:
+        options.append(raiseload('*'))
+    return options
+
+def letter_detail_options():
+    """خيارات تحميل صفحة عرض المراسلة: المنشئ والمرفقات"""
+    return [creator_option(), selectinload(Letter.attachments)]
@@ -39,6 +39,20 @@ class User(UserMixin, db.Model):
 class Letter(db.Model):
     """نموذج المراسلات"""
     __tablename__ = 'letters'
+    __table_args__ = (
+        # قائمة المراسلات وآخر المراسلات
+        db.Index('ix_letters_is_archived_created_at', 'is_archived', 'created_at'),
+        # قائمة الأرشيف (ترقيم بالمؤشر على archive_date، فلا مراسلة مؤرشفة بلا تاريخ)
+        db.Index('ix_letters_is_archived_archive_date', 'is_archived', 'archive_date'),
+        db.CheckConstraint('NOT is_archived OR archive_date IS NOT NULL',
+                           name='ck_letters_archived_archive_date'),
+        # الإحصائيات حسب النوع
+        db.Index('ix_letters_letter_type_created_at', 'letter_type', 'created_at'),
+        # بيانات المخططات (نطاق على created_at مع التجميع حسب النوع)
+        db.Index('ix_letters_created_at_letter_type', 'created_at', 'letter_type'),
+        # أكثر الباعثين تكراراً
+        db.Index('ix_letters_sender', 'sender'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     letter_type = db.Column(db.String(20), nullable=False)  # incoming/outgoing
@@ -56,8 +70,12 @@ class Letter(db.Model):
     response_number = db.Column(db.String(50))
     
     # الملفات
-    letter_image = db.Column(db.String(500))
-    attachments = db.Column(db.Text)  # JSON list of attachments
+    letter_image = db.Column(db.String(500))  # الاسم الأصلي لصورة المراسلة
+    image_digest = db.Column(db.String(64), db.ForeignKey('blobs.digest'), index=True)
+    
+    # النص المستخرج من ملفات PDF و TXT (للبحث فقط، لا يُحمّل مع القوائم)
+    extracted_text = db.deferred(db.Column(db.Text))
+    extraction_status = db.Column(db.String(20), index=True)  # pending/done/failed
     
     # حالة المراسلة
     status = db.Column(db.String(20), default='new')
@@ -66,6 +84,8 @@ class Letter(db.Model):
     
     # العلاقات
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    attachments = db.relationship('Attachment', backref='letter', lazy=True,
+                                  cascade='all, delete-orphan', order_by='Attachment.id')
     
     # التواريخ التلقائية
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -88,6 +108,9 @@ class Archive(db.Model):
 class ActivityLog(db.Model):
     """سجل النشاطات"""
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        db.Index('ix_activity_logs_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -97,4 +120,62 @@ class ActivityLog(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # العلاقات
-    user = db.relationship('User', backref='activities', lazy=True)
\ No newline at end of file
+    user = db.relationship('User', backref='activities', lazy=True)
+
+class LetterCounter(db.Model):
+    """عدادات المراسلات المجمعة حسب النوع وحالة الأرشفة والشهر"""
+    __tablename__ = 'letter_counters'
+    __table_args__ = (
+        db.UniqueConstraint('letter_type', 'is_archived', 'year', 'month', name='uq_letter_counters_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    letter_type = db.Column(db.String(20), nullable=False)
+    is_archived = db.Column(db.Boolean, nullable=False, default=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class AccessSequence(db.Model):
+    """تسلسل أرقام الوصول لكل (بادئة، سنة)"""
+    __tablename__ = 'access_sequences'
+    
+    prefix = db.Column(db.String(10), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+class Attachment(db.Model):
+    """مرفقات المراسلات"""
+    __tablename__ = 'attachments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    letter_id = db.Column(db.Integer, db.ForeignKey('letters.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)  # الاسم الآمن (secure_filename)
+    original_name = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.Integer)
+    mime_type = db.Column(db.String(100), index=True)
+    checksum = db.Column(db.String(64), db.ForeignKey('blobs.digest'), index=True)  # SHA-256
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Blob(db.Model):
+    """ملف مخزن مرة واحدة حسب بصمة محتواه (SHA-256)"""
+    __tablename__ = 'blobs'
+    
+    digest = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Upload(db.Model):
+    """رفع مجزأ قابل للاستئناف (الأجزاء على القرص حتى الإكمال)"""
+    __tablename__ = 'uploads'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)  # الاسم الأصلي
+    size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64))  # البصمة المتوقعة إن أرسلها العميل
+    digest = db.Column(db.String(64), db.ForeignKey('blobs.digest'), index=True)  # بعد الإكمال
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    completed_at = db.Column(db.DateTime)
\ No newline at end of file
@@ -0,0 +1,314 @@
+# توليد مجموعة بيانات اصطناعية واقعية (حتى مليون مراسلة) لقياس الأداء
+#
+#   python database/seed_corpus.py --letters 1000000 --database-url sqlite:////tmp/corpus.db
+#
+# الإدراج على دفعات كبيرة عبر SQLAlchemy Core (executemany) دون أحداث ORM،
+# ثم تُبنى العدادات وفهرس البحث وتسلسلات أرقام الوصول مرة واحدة في النهاية.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MAX_LETTERS = 1000000
+
+SEED_PASSWORD = 'seed'
+
+FIRST_NAMES = (
+    'محمد', 'أحمد', 'فاطمة', 'خديجة', 'عبد القادر', 'يوسف', 'أمينة', 'كريم', 'سعاد', 'نور الدين',
+    'Karim', 'Nadia', 'Sofiane', 'Leïla', 'Mehdi', 'Samira', 'Hocine', 'Amel', 'Rachid', 'Yasmine'
+)
+LAST_NAMES = (
+    'بن علي', 'بوزيد', 'حمادي', 'مزياني', 'بلقاسم', 'سعيدي', 'عمراني', 'بن يحيى',
+    'Benali', 'Boudiaf', 'Haddad', 'Mansouri', 'Cherif', 'Belkacem', 'Saadi', 'Khelifi'
+)
+
+SENDERS = (
+    'وزارة الداخلية والجماعات المحلية', 'وزارة المالية', 'وزارة التربية الوطنية', 'وزارة الصحة',
+    'ولاية الجزائر', 'ولاية وهران', 'ولاية قسنطينة', 'مديرية الضرائب', 'مديرية التشغيل',
+    'المديرية العامة للوظيفة العمومية', 'الصندوق الوطني للتأمينات الاجتماعية', 'بلدية باب الزوار',
+    'المجلس الشعبي الولائي', 'محكمة سيدي امحمد', 'الديوان الوطني للإحصائيات',
+    'Ministère des Finances', 'Direction des Ressources Humaines', 'Direction de l\'Administration Générale',
+    'Caisse Nationale des Retraites', 'Agence Nationale de l\'Emploi', 'Sonelgaz', 'Algérie Télécom',
+    'Banque Nationale d\'Algérie', 'Cour des Comptes', 'Inspection Générale des Finances'
+)
+RECEIVERS = (
+    'الأمانة العامة', 'مديرية الموارد البشرية', 'مديرية المالية والمحاسبة', 'مصلحة الأرشيف',
+    'مكتب التنظيم العام', 'مديرية الوسائل العامة', 'Secrétariat Général', 'Service du Personnel',
+    'Bureau d\'Ordre', 'Service Informatique'
+)
+SUBJECT_TEMPLATES = (
+    'طلب معلومات حول {topic}', 'إرسال وثائق {topic}', 'استدعاء لاجتماع بخصوص {topic}',
+    'تقرير شهري عن {topic}', 'رد على مراسلتكم بخصوص {topic}', 'تذكير بآجال {topic}',
+    'إعلام بتعديل {topic}', 'طلب موافقة على {topic}',
+    'Demande de renseignements relative à {sujet}', 'Transmission du dossier de {sujet}',
+    'Convocation à la réunion sur {sujet}', 'Rapport trimestriel sur {sujet}',
+    'Rappel concernant {sujet}', 'Réponse à votre courrier relatif à {sujet}'
+)
+TOPICS = (
+    'الميزانية السنوية', 'التوظيف', 'الترقية', 'العطل السنوية', 'الصفقات العمومية', 'الجرد',
+    'التكوين المستمر', 'المنح الدراسية', 'تجهيز المكاتب', 'الأمن الصناعي', 'التقاعد', 'النقل'
+)
+SUJETS = (
+    'budget annuel', 'recrutement', 'avancement', 'congés annuels', 'marchés publics', 'inventaire',
+    'formation continue', 'bourses d\'études', 'équipement des bureaux', 'sécurité', 'retraite'
+)
+CONTENT_SENTENCES = (
+    'نحيطكم علماً بأنه تم استلام ملفكم وهو قيد الدراسة.', 'يرجى موافاتنا بالوثائق المطلوبة في أقرب الآجال.',
+    'تجدون مرفقاً بهذه المراسلة نسخة من القرار.', 'وتقبلوا منا فائق عبارات التقدير والاحترام.',
+    'بناءً على التعليمة الوزارية المؤرخة في بداية السنة.', 'نطلب منكم اتخاذ الإجراءات اللازمة.',
+    'Nous vous prions de bien vouloir nous transmettre les pièces justificatives.',
+    'Veuillez trouver ci-joint le dossier complet.', 'Suite à notre réunion du mois dernier.',
+    'Nous restons à votre disposition pour tout complément d\'information.',
+    'Veuillez agréer l\'expression de nos salutations distinguées.'
+)
+ACTIVITY_ACTIONS = (
+    ('إضافة مراسلة واردة', 'تم إضافة مراسلة واردة برقم: {access_number}'),
+    ('إضافة مراسلة صادرة', 'تم إضافة مراسلة صادرة برقم: {access_number}'),
+    ('تعديل مراسلة', 'تم تعديل المراسلة برقم: {access_number}'),
+    ('أرشفة مراسلة', 'تم أرشفة المراسلة برقم: {access_number}'),
+    ('تسجيل الدخول', 'تسجيل دخول المستخدم {username}'),
+    ('تسجيل الخروج', 'تسجيل خروج المستخدم {username}'),
+)
+
+ACCESS_PREFIXES = {'incoming': 'IN', 'outgoing': 'OUT'}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='توليد مراسلات اصطناعية لقياس الأداء')
+    parser.add_argument('--users', type=int, default=50, help='عدد المستخدمين')
+    parser.add_argument('--letters', type=int, default=100000, help=f'عدد المراسلات (حتى {MAX_LETTERS})')
+    parser.add_argument('--activity', type=int, help='عدد سجلات النشاط (افتراضياً مثل عدد المراسلات)')
+    parser.add_argument('--years', type=int, default=5, help='عدد السنوات التي تغطيها المراسلات')
+    parser.add_argument('--archived-ratio', type=float, default=0.5, help='نسبة المراسلات الأقدم من سنة التي تُؤرشف')
+    parser.add_argument('--batch-size', type=int, default=10000, help='عدد الصفوف في كل إدراج')
+    parser.add_argument('--seed', type=int, default=42, help='بذرة التوليد العشوائي (نتائج قابلة للتكرار)')
+    parser.add_argument('--skip-search-index', action='store_true', help='عدم بناء فهرس البحث النصي')
+    parser.add_argument('--database-url', help='قاعدة البيانات المستهدفة (افتراضياً ملف SQLite مؤقت)')
+    args = parser.parse_args()
+    if not 0 < args.letters <= MAX_LETTERS:
+        parser.error(f'--letters يجب أن يكون بين 1 و {MAX_LETTERS}')
+    if args.users < 1:
+        parser.error('--users يجب أن يكون 1 على الأقل')
+    return args
+
+def working_day(day):
+    """تحويل أيام العطلة الأسبوعية (الجمعة والسبت) إلى أقرب يوم عمل"""
+    weekday = day.weekday()
+    if weekday == 4:
+        return day - timedelta(days=1)
+    if weekday == 5:
+        return day + timedelta(days=1)
+    return day
+
+def spread_days(rng, count, years, today):
+    """تواريخ مرتبة زمنياً، أكثف في السنوات الأخيرة (نمو حجم المراسلات)"""
+    span = years * 365
+    offsets = sorted(int(rng.triangular(0, span, span)) for _ in range(count))
+    start = today - timedelta(days=span)
+    return [working_day(start + timedelta(days=offset)) for offset in offsets]
+
+def office_time(rng, day):
+    """وقت عشوائي خلال ساعات العمل (8:00 - 16:00)"""
+    return datetime.combine(day, datetime.min.time()) + timedelta(seconds=8 * 3600 + int(rng.random() * 8 * 3600))
+
+def subject_line(rng):
+    template = rng.choice(SUBJECT_TEMPLATES)
+    return template.format(topic=rng.choice(TOPICS), sujet=rng.choice(SUJETS))
+
+def seed_users(users):
+    """إدراج المستخدمين (الأول مدير) وإرجاع (معرفات، أسماء المستخدمين)"""
+    from werkzeug.security import generate_password_hash
+    from database.db import db
+    from database.models import User
+
+    # تجزئة كلمة المرور مكلفة عمداً، لذا تُحسب مرة واحدة لكل المستخدمين
+    password_hash = generate_password_hash(SEED_PASSWORD)
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    rows = [{
+        'username': f'seed{i:04d}',
+        'email': f'seed{i:04d}@example.com',
+        'password_hash': password_hash,
+        'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'role': 'admin' if i == 0 else 'user',
+        'is_active': True,
+        'created_at': now,
+    } for i in range(users)]
+    db.session.execute(User.__table__.insert(), rows)
+    db.session.commit()
+    return [user_id for (user_id,) in db.session.query(User.id).filter(User.username.like('seed%')).order_by(User.id)], \
+        [row['username'] for row in rows]
+
+def letter_rows(rng, count, years, archived_ratio, user_ids, today, sequences):
+    """مولد صفوف المراسلات بالترتيب الزمني مع أرقام وصول متتالية لكل سنة
+
+    يحدّث sequences بآخر رقم وصول لكل (بادئة، سنة).
+    """
+    now = datetime.utcnow()
+    archive_before = today - timedelta(days=365)
+    for index, access_date in enumerate(spread_days(rng, count, years, today)):
+        letter_type = 'incoming' if rng.random() < 0.6 else 'outgoing'
+        prefix = ACCESS_PREFIXES[letter_type]
+        key = (prefix, access_date.year)
+        sequences[key] = sequences.get(key, 0) + 1
+        created_at = min(office_time(rng, access_date), now)
+        letter_date = working_day(access_date - timedelta(days=rng.randint(0, 10)))
+
+        response_date = response_number = None
+        if letter_type == 'incoming' and rng.random() < 0.4:
+            response_date = working_day(access_date + timedelta(days=rng.randint(3, 30)))
+            if response_date <= today:
+                response_number = f'R-{index + 1:07d}'
+            else:
+                response_date = None
+
+        is_archived = access_date < archive_before and rng.random() < archived_ratio
+        sender, receiver = rng.choice(SENDERS), rng.choice(RECEIVERS)
+        if letter_type == 'outgoing':
+            sender, receiver = receiver, sender
+
+        yield {
+            'letter_type': letter_type,
+            'reference_number': f'{index + 1:07d}/{prefix}/{letter_date.year}',
+            'access_number': f'{prefix}-{access_date.year}-{sequences[key]:05d}',
+            'sender': sender,
+            'receiver': receiver,
+            'subject': subject_line(rng),
+            'content': ' '.join(rng.sample(CONTENT_SENTENCES, rng.randint(2, 4))),
+            'letter_date': letter_date,
+            'access_date': access_date,
+            'response_date': response_date,
+            'response_number': response_number,
+            'letter_image': None,
+            'image_digest': None,
+            'extracted_text': None,
+            'extraction_status': None,
+            'status': 'new',
+            'is_archived': is_archived,
+            'archive_date': created_at + timedelta(days=rng.randint(30, 300)) if is_archived else None,
+            'user_id': rng.choice(user_ids),
+            'created_at': created_at,
+            'updated_at': min(created_at + timedelta(days=rng.randint(0, 5)), now),
+        }
+
+def activity_rows(rng, count, years, user_ids, usernames, access_numbers, today):
+    now = datetime.utcnow()
+    for day in spread_days(rng, count, years, today):
+        action, template = rng.choice(ACTIVITY_ACTIONS)
+        user_index = rng.randrange(len(user_ids))
+        yield {
+            'user_id': user_ids[user_index],
+            'action': action,
+            'details': template.format(access_number=rng.choice(access_numbers), username=usernames[user_index]),
+            'ip_address': f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+            'created_at': min(office_time(rng, day), now),
+        }
+
+def insert_batches(table, rows, batch_size, label):
+    """إدراج مولد صفوف على دفعات (معاملة لكل دفعة)"""
+    from database.db import db
+
+    started = time.monotonic()
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            total += len(batch)
+            batch = []
+            print(f"  ... {total} {label} ({total / (time.monotonic() - started):.0f} صف/ث)")
+    if batch:
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        total += len(batch)
+    return total, time.monotonic() - started
+
+def seed_corpus(users=50, letters=100000, activity=None, years=5, archived_ratio=0.5,
+                batch_size=10000, seed=42, build_search_index=True):
+    """توليد المستخدمين والمراسلات وسجل النشاط ثم بناء الجداول المشتقة (داخل سياق التطبيق)"""
+    from database.db import db
+    from database.models import ActivityLog, Letter
+    from database.counters import rebuild_counters
+    from database.fts import rebuild_fts_index
+    from database.sequences import raise_to
+
+    rng = random.Random(seed)
+    today = date.today()
+    activity = letters if activity is None else activity
+    timings = {}
+
+    started = time.monotonic()
+    user_ids, usernames = seed_users(users)
+    timings['users'] = time.monotonic() - started
+    print(f"👤 {len(user_ids)} مستخدم (كلمة المرور: {SEED_PASSWORD})")
+
+    sequences = {}
+    count, timings['letters'] = insert_batches(
+        Letter.__table__, letter_rows(rng, letters, years, archived_ratio, user_ids, today, sequences),
+        batch_size, 'مراسلة')
+    print(f"✉️ {count} مراسلة في {timings['letters']:.1f} ث ({count / timings['letters']:.0f} صف/ث)")
+
+    # عينة من أرقام الوصول لتفاصيل سجل النشاط
+    access_numbers = [number for (number,) in db.session.query(Letter.access_number).limit(10000)]
+    count, timings['activity'] = insert_batches(
+        ActivityLog.__table__, activity_rows(rng, activity, years, user_ids, usernames, access_numbers, today),
+        batch_size, 'نشاط')
+    print(f"📝 {count} سجل نشاط في {timings['activity']:.1f} ث")
+
+    # الجداول المشتقة التي تحدثها أحداث ORM عادة
+    started = time.monotonic()
+    for (prefix, year), value in sequences.items():
+        raise_to(prefix, year, value)
+    db.session.commit()
+    rebuild_counters()
+    timings['counters'] = time.monotonic() - started
+    print(f"🔢 العدادات والتسلسلات في {timings['counters']:.1f} ث")
+
+    if build_search_index:
+        started = time.monotonic()
+        indexed = rebuild_fts_index(batch_size=batch_size)
+        timings['search_index'] = time.monotonic() - started
+        if indexed:
+            print(f"🔎 فهرس البحث ({indexed} مراسلة) في {timings['search_index']:.1f} ث")
+
+    return {'users': len(user_ids), 'letters': letters, 'activity': activity, 'timings': timings}
+
+def run_seed(args):
+    from app import create_app
+    from database.db import db
+    from database.models import Letter
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Letter.id).first() is not None:
+            print("❌ قاعدة البيانات تحتوي على مراسلات، استخدم قاعدة بيانات فارغة")
+            return False
+        started = time.monotonic()
+        seed_corpus(
+            users=args.users,
+            letters=args.letters,
+            activity=args.activity,
+            years=args.years,
+            archived_ratio=args.archived_ratio,
+            batch_size=args.batch_size,
+            seed=args.seed,
+            build_search_index=not args.skip_search_index
+        )
+        print(f"✅ اكتمل التوليد في {time.monotonic() - started:.1f} ث: {db.engine.url.render_as_string(hide_password=True)}")
+    return True
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    sys.exit(0 if run_seed(args) else 1)
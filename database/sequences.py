@@ -0,0 +1,95 @@
+# تسلسلات أرقام الوصول الذرية
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .db import db
+from .models import AccessSequence, Letter
+
+def _begin_immediate(connection):
+    """بدء معاملة SQLite بقفل كتابة فوري (BEGIN IMMEDIATE)
+
+    يضمن أن قراءة التسلسل وتحديثه وإدراج المراسلة تتم كلها تحت نفس
+    القفل، بدل ترقية قفل قراءة مشترك قد يفشل عند التزامن.
+    """
+    dbapi_connection = connection.connection.dbapi_connection
+    if not dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def _existing_max(prefix, year):
+    """أكبر رقم مستخدم فعلاً لهذه البادئة والسنة (قواعد بيانات سابقة للتسلسلات)"""
+    pattern = f"{prefix}-{year}-"
+    numbers = db.session.query(Letter.access_number)\
+        .filter(Letter.access_number.like(f"{pattern}%")).all()
+    highest = 0
+    for (number,) in numbers:
+        try:
+            highest = max(highest, int(number[len(pattern):]))
+        except ValueError:
+            continue
+    return highest
+
+def _increment(connection, prefix, year, count):
+    """زيادة التسلسل الموجود وإرجاع القيمة الجديدة، أو None إذا لم يوجد"""
+    table = AccessSequence.__table__
+    return connection.execute(
+        table.update()
+        .where(table.c.prefix == prefix, table.c.year == year)
+        .values(last_value=table.c.last_value + count)
+        .returning(table.c.last_value)
+    ).scalar()
+
+def _create(connection, prefix, year, count):
+    """إنشاء التسلسل لأول مرة (آمن عند التزامن عبر ON CONFLICT)"""
+    table = AccessSequence.__table__
+    insert = sqlite_insert if connection.dialect.name == 'sqlite' else pg_insert
+    start = _existing_max(prefix, year)
+    return connection.execute(
+        insert(table)
+        .values(prefix=prefix, year=year, last_value=start + count)
+        .on_conflict_do_update(
+            index_elements=['prefix', 'year'],
+            set_={'last_value': table.c.last_value + count}
+        )
+        .returning(table.c.last_value)
+    ).scalar()
+
+def _allocate_locked(prefix, year, count):
+    """قواعد بيانات أخرى: SELECT ... FOR UPDATE ثم UPDATE"""
+    sequence = AccessSequence.query.filter_by(prefix=prefix, year=year)\
+        .with_for_update().first()
+    if sequence is None:
+        sequence = AccessSequence(prefix=prefix, year=year, last_value=_existing_max(prefix, year))
+        db.session.add(sequence)
+    sequence.last_value += count
+    db.session.flush()
+    return sequence.last_value
+
+def allocate(prefix, year, count=1):
+    """حجز count رقماً متتالياً داخل معاملة الجلسة الحالية
+
+    يعيد أول رقم محجوز. تبقى الأرقام محجوزة حتى commit، وتُلغى مع rollback
+    فلا تبقى فجوات في التسلسل.
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+
+    if dialect not in ('sqlite', 'postgresql'):
+        last_value = _allocate_locked(prefix, year, count)
+        return last_value - count + 1
+
+    if dialect == 'sqlite':
+        _begin_immediate(connection)
+
+    last_value = _increment(connection, prefix, year, count)
+    if last_value is None:
+        last_value = _create(connection, prefix, year, count)
+    return last_value - count + 1
+
+def raise_to(prefix, year, value):
+    """ضمان ألا يقل التسلسل عن value (أرقام وصول مستوردة صراحة)"""
+    allocate(prefix, year, 0)
+    table = AccessSequence.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.prefix == prefix, table.c.year == year, table.c.last_value < value)
+        .values(last_value=value)
+    )
@@ -0,0 +1,98 @@
+# اختبار ضغط لتوليد أرقام الوصول من عدة خيوط متزامنة
+import argparse
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='اختبار ضغط لتسلسل أرقام الوصول')
+    parser.add_argument('--threads', type=int, default=16, help='عدد الخيوط المتزامنة')
+    parser.add_argument('--per-thread', type=int, default=25, help='عدد المراسلات لكل خيط')
+    parser.add_argument('--database-url', help='قاعدة بيانات الاختبار (افتراضياً ملف SQLite مؤقت)')
+    return parser.parse_args()
+
+def run_stress(threads, per_thread):
+    """إدراج مراسلات من عدة خيوط والتحقق من أن الأرقام فريدة ومتتالية"""
+    from datetime import date, datetime
+    from app import create_app
+    from database.db import db
+    from database.models import User, Letter
+    from utils import generate_access_number
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(username='stress', email='stress@example.com', full_name='Stress Test')
+        user.set_password('stress')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        barrier.wait()
+        for i in range(per_thread):
+            with app.app_context():
+                try:
+                    access_number = generate_access_number('incoming')
+                    db.session.add(Letter(
+                        letter_type='incoming',
+                        reference_number=f'STRESS-{index}-{i}',
+                        access_number=access_number,
+                        sender='stress',
+                        subject='stress',
+                        letter_date=date.today(),
+                        access_date=date.today(),
+                        user_id=user_id
+                    ))
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(str(e))
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = datetime.now()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = (datetime.now() - started).total_seconds()
+
+    with app.app_context():
+        numbers = [n for (n,) in db.session.query(Letter.access_number)
+                   .filter(Letter.letter_type == 'incoming').all()]
+
+    expected = threads * per_thread
+    suffixes = sorted(int(n.rsplit('-', 1)[1]) for n in numbers)
+
+    print(f"⏱️ {expected} إدراج في {elapsed:.2f} ثانية ({expected / elapsed:.0f}/ثانية)")
+    ok = True
+    if errors:
+        ok = False
+        print(f"❌ {len(errors)} خطأ، أولها: {errors[0]}")
+    if len(set(numbers)) != len(numbers):
+        ok = False
+        print("❌ أرقام وصول مكررة")
+    if suffixes != list(range(1, len(suffixes) + 1)):
+        ok = False
+        print("❌ فجوات في التسلسل")
+    if len(numbers) != expected:
+        ok = False
+        print(f"❌ عدد المراسلات {len(numbers)} بدلاً من {expected}")
+    if ok:
+        print(f"✅ {len(numbers)} رقم وصول فريد ومتتالي")
+    return ok
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    sys.exit(0 if run_stress(args.threads, args.per_thread) else 1)
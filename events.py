@@ -0,0 +1,206 @@
+# بث تحديثات لوحة التحكم المباشرة عبر Server-Sent Events
+import json
+import os
+import queue
+import threading
+from database.db import db
+from cache import data_changed, STATS, ACTIVITY
+
+def format_event(event, data):
+    """رسالة SSE واحدة"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+def _activity_entries(after_id, limit=10):
+    """النشاطات الجديدة بعد after_id (الأقدم أولاً)"""
+    from database.models import ActivityLog, User
+
+    rows = db.session.query(ActivityLog, User.username, User.full_name)\
+        .join(User, ActivityLog.user_id == User.id)\
+        .filter(ActivityLog.id > after_id)\
+        .order_by(ActivityLog.id.desc())\
+        .limit(limit).all()
+    return [{
+        'id': activity.id,
+        'action': activity.action,
+        'details': activity.details,
+        'username': username,
+        'full_name': full_name,
+        'created_at': activity.created_at.strftime('%Y-%m-%d %H:%M')
+    } for activity, username, full_name in reversed(rows)]
+
+class EventBroker:
+    """ناشر واحد لكل عملية يوزع التحديثات على كل لوحات التحكم المفتوحة
+
+    عند تثبيت تغيير على المراسلات أو سجل النشاط (إشارة data_changed) يحسب
+    خيط النشر الإحصائيات مرة واحدة ويرسل للمشتركين القيم التي تغيرت فقط
+    والنشاطات الجديدة، بدل أن يستعلم كل متصفح مفتوح كل دقيقة. يعيد الخيط
+    الفحص كذلك كل SSE_POLL_INTERVAL ثانية لالتقاط تغييرات العمليات الأخرى.
+
+    المشترك البطيء الذي يمتلئ طابوره يُفصل، فيعيد المتصفح الاتصال ويحصل
+    على لقطة كاملة جديدة.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._reserved = 0
+        self._wakeup = threading.Event()
+        self._stats = None
+        self._last_activity_id = None
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config['SSE_POLL_INTERVAL']
+        self.heartbeat = app.config['SSE_HEARTBEAT']
+        self.max_clients = app.config['SSE_MAX_CLIENTS']
+        self.queue_size = app.config['SSE_QUEUE_SIZE']
+        app.extensions['event_broker'] = self
+        data_changed.connect(self._on_change, sender=app, weak=False)
+
+    @property
+    def clients(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """طابور مشترك جديد مع اللقطة الحالية، أو None إذا بلغ العدد الأقصى"""
+        # حجز المكان قبل حساب اللقطة حتى لا يتجاوز طلبان متزامنان الحد
+        with self._lock:
+            if len(self._subscribers) + self._reserved >= self.max_clients:
+                return None, None
+            self._reserved += 1
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        try:
+            snapshot = self.snapshot()
+        except Exception:
+            with self._lock:
+                self._reserved -= 1
+            raise
+        with self._lock:
+            self._reserved -= 1
+            self._subscribers.add(subscriber)
+        self._ensure_thread()
+        return subscriber, snapshot
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers:
+                # لا أحد يتابع: اللقطة القديمة لم تعد تُحدث
+                self._stats = None
+                self._last_activity_id = None
+
+    def snapshot(self):
+        """الإحصائيات الحالية (تُحسب مرة واحدة ثم تُحدث من خيط النشر)"""
+        with self._lock:
+            if self._stats is not None:
+                return dict(self._stats)
+        self._refresh({STATS, ACTIVITY}, publish=False)
+        with self._lock:
+            return dict(self._stats or {})
+
+    def stream(self, subscriber, snapshot):
+        """مولد رسائل SSE لمشترك واحد (لا يستخدم قاعدة البيانات)"""
+        try:
+            yield f"retry: {self.app.config['SSE_RETRY']}\n\n"
+            yield format_event('stats', snapshot)
+            while True:
+                try:
+                    message = subscriber.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # إبقاء الاتصال حياً عبر الوسطاء (proxies)
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    def publish(self, event, data):
+        """إرسال رسالة لكل المشتركين"""
+        message = format_event(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self._disconnect(subscriber)
+
+    def disconnect_all(self):
+        """إنهاء كل التدفقات المفتوحة (المتصفحات تعيد الاتصال تلقائياً)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            self._disconnect(subscriber)
+
+    def _disconnect(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        with subscriber.mutex:
+            subscriber.queue.clear()
+        subscriber.put_nowait(None)
+
+    def _on_change(self, sender, groups=()):
+        if not self._subscribers:
+            return
+        with self._lock:
+            self._pending.update(groups)
+        self._wakeup.set()
+
+    def _ensure_thread(self):
+        # الخيط لا ينتقل مع fork، لذا يُنشأ عند أول مشترك في كل عملية
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='dashboard-events', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            changed = self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                groups = self._pending if changed else {STATS, ACTIVITY}
+                self._pending = set()
+            if self._subscribers and groups:
+                self._refresh(groups)
+
+    def _refresh(self, groups, publish=True):
+        """إعادة حساب المجموعات المتغيرة ونشر الفروق"""
+        from stats import compute_stats
+
+        try:
+            with self.app.app_context():
+                try:
+                    if STATS in groups:
+                        stats = compute_stats()
+                        with self._lock:
+                            previous = self._stats or {}
+                            self._stats = stats
+                        delta = {key: value for key, value in stats.items() if previous.get(key) != value}
+                        if publish and delta:
+                            self.publish('stats', delta)
+
+                    if ACTIVITY in groups:
+                        if self._last_activity_id is None:
+                            from database.models import ActivityLog
+                            self._last_activity_id = db.session.query(db.func.max(ActivityLog.id)).scalar() or 0
+                        else:
+                            entries = _activity_entries(self._last_activity_id)
+                            if entries:
+                                self._last_activity_id = entries[-1]['id']
+                                if publish:
+                                    self.publish('activity', entries)
+                finally:
+                    db.session.remove()
+        except Exception:
+            self.app.logger.exception("Error publishing dashboard events")
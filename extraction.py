@@ -0,0 +1,231 @@
+# استخراج النص من ملفات PDF و TXT المرفقة لفهرسته في البحث
+#
+# يُستخرج النص في الخلفية بعد حفظ المراسلة: الملفات الصغيرة في خيط التنسيق
+# نفسه، والكبيرة في مجموعة عمليات منفصلة حتى لا يحجز تحليل PDF قفل
+# المفسر (GIL) عن خيوط الطلبات. الحالة في Letter.extraction_status:
+# pending ثم done أو failed.
+import codecs
+import os
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+# صيغ الملفات التي يُستخرج نصها (ملفات PDF الممسوحة بلا طبقة نص تعطي نصاً فارغاً)
+EXTRACTABLE = {'pdf', 'txt'}
+
+# ترميزات الملفات النصية بالترتيب (ملفات ويندوز العربية غالباً cp1256)
+TEXT_ENCODINGS = ('utf-8-sig', 'cp1256', 'latin-1')
+
+class ExtractionError(Exception):
+    """تعذر استخراج النص من الملف"""
+    pass
+
+def can_extract(filename):
+    """هل يمكن استخراج نص الملف؟"""
+    return bool(filename) and filename.rsplit('.', 1)[-1].lower() in EXTRACTABLE
+
+def _extract_txt(path, max_chars):
+    with open(path, 'rb') as f:
+        # 4 بايت كحد أقصى لكل حرف في UTF-8
+        data = f.read(max_chars * 4)
+        truncated = f.read(1) != b''
+    for encoding in TEXT_ENCODINGS:
+        # القراءة المقتطعة قد تنتهي وسط حرف متعدد البايتات: المفكك التدريجي
+        # يتجاهل البقية الناقصة بدل اعتبار الملف كله بترميز آخر
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            return decoder.decode(data, final=not truncated)[:max_chars]
+        except UnicodeDecodeError:
+            continue
+    return ''
+
+def _extract_pdf(path, max_chars):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ExtractionError('استخراج نص PDF يتطلب تثبيت حزمة pypdf')
+
+    reader = PdfReader(path)
+    if reader.is_encrypted:
+        try:
+            reader.decrypt('')
+        except Exception:
+            raise ExtractionError('ملف PDF محمي بكلمة مرور')
+    parts = []
+    length = 0
+    for page in reader.pages:
+        text = page.extract_text() or ''
+        parts.append(text)
+        length += len(text)
+        if length >= max_chars:
+            break
+    return '\n'.join(parts)[:max_chars]
+
+def extract_text(path, filename, max_chars):
+    """نص ملف مخزن (يعمل في عملية منفصلة، فلا يعتمد على سياق التطبيق)"""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension == 'txt':
+        return _extract_txt(path, max_chars)
+    if extension == 'pdf':
+        return _extract_pdf(path, max_chars)
+    raise ExtractionError(f'لا يمكن استخراج النص من ملفات {extension}')
+
+def letter_files(letter):
+    """(digest, اسم الملف) لكل ملف قابل لاستخراج النص في المراسلة"""
+    files = []
+    if letter.image_digest and can_extract(letter.letter_image):
+        files.append((letter.image_digest, letter.letter_image))
+    files.extend((attachment.checksum, attachment.original_name) for attachment in letter.attachments
+                 if attachment.checksum and can_extract(attachment.original_name))
+    return files
+
+def combine_texts(texts, max_chars):
+    """دمج نصوص ملفات المراسلة في نص واحد للفهرسة"""
+    combined = '\n\n'.join(text.strip() for text in texts if text and text.strip())
+    return combined[:max_chars] or None
+
+class TextExtractor:
+    """استخراج نص مرفقات المراسلات في الخلفية دون تأخير الطلب
+
+    خيط تنسيق واحد لكل عملية يعالج المراسلات بترتيب جدولتها (فلا يكتب
+    استخراج قديم فوق نتيجة تعديل أحدث)، ويرسل الملفات الأكبر من
+    EXTRACTION_INLINE_MAX إلى EXTRACTION_PROCESSES عملية.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._pool = None
+        self._processes = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.inline_max = app.config['EXTRACTION_INLINE_MAX']
+        self.max_chars = app.config['EXTRACTION_MAX_CHARS']
+        app.extensions['text_extractor'] = self
+
+    def _executors(self):
+        # الخيوط والعمليات لا تنتقل مع fork، لذا تُنشأ عند أول استخدام في كل عملية
+        if self._pool is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='text-extraction')
+            # spawn: العملية الفرعية لا ترث اتصالات قاعدة البيانات والخيوط
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.app.config['EXTRACTION_PROCESSES'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._pool, self._processes
+
+    def _submit_process(self, *args):
+        _, processes = self._executors()
+        try:
+            return processes.submit(extract_text, *args)
+        except BrokenProcessPool:
+            # توقفت عملية فرعية فجأة (نفاد الذاكرة مثلاً): مجموعة جديدة
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.app.config['EXTRACTION_PROCESSES'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            return self._processes.submit(extract_text, *args)
+
+    def submit(self, letter_id):
+        """جدولة استخراج نص مراسلة حالتها pending"""
+        pool, _ = self._executors()
+        return pool.submit(self._extract, letter_id)
+
+    def start(self, store, files, inline_max=None):
+        """بدء استخراج ملفات مراسلة: النتائج للصغيرة، ومهام في مجموعة العمليات للكبيرة"""
+        inline_max = self.inline_max if inline_max is None else inline_max
+        jobs = []
+        for digest, filename in files:
+            path = store.path(digest)
+            try:
+                if os.path.getsize(path) > inline_max:
+                    jobs.append((filename, self._submit_process(path, filename, self.max_chars)))
+                else:
+                    jobs.append((filename, extract_text(path, filename, self.max_chars)))
+            except Exception as e:
+                self.app.logger.warning(f"Text extraction failed for {filename}: {e}")
+                jobs.append((filename, None))
+        return jobs
+
+    def collect(self, jobs):
+        """انتظار المهام وإرجاع (النص المدمج، عدد الملفات التي تعذر استخراجها)"""
+        texts = []
+        failed = 0
+        for filename, result in jobs:
+            if isinstance(result, Future):
+                try:
+                    result = result.result()
+                except Exception as e:
+                    self.app.logger.warning(f"Text extraction failed for {filename}: {e}")
+                    result = None
+            if result is None:
+                failed += 1
+            else:
+                texts.append(result)
+        return combine_texts(texts, self.max_chars), failed
+
+    def apply(self, letter, jobs):
+        """حفظ نتيجة الاستخراج في المراسلة (يحدث فهرس البحث عند التثبيت)"""
+        letter.extracted_text, failed = self.collect(jobs)
+        letter.extraction_status = FAILED if failed else DONE
+        return letter.extraction_status
+
+    def _extract(self, letter_id):
+        from database.db import db
+        from database.models import Letter
+        from storage import get_store
+
+        with self.app.app_context():
+            try:
+                letter = db.session.get(Letter, letter_id)
+                if letter is None or letter.extraction_status != PENDING:
+                    return None
+                status = self.apply(letter, self.start(get_store(self.app), letter_files(letter)))
+                db.session.commit()
+                return status
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(f"Error extracting text for letter {letter_id}")
+                return None
+            finally:
+                db.session.remove()
+
+def extractable_filter():
+    """شرط SQL للمراسلات التي فيها ملف قابل لاستخراج النص"""
+    from sqlalchemy import or_
+    from database.models import Letter, Attachment
+
+    patterns = [f'%.{extension}' for extension in sorted(EXTRACTABLE)]
+    return or_(
+        *[Letter.letter_image.ilike(pattern) for pattern in patterns],
+        Letter.attachments.any(or_(*[Attachment.original_name.ilike(pattern) for pattern in patterns]))
+    )
+
+def mark_for_extraction(letter):
+    """تعليم المراسلة للاستخراج إذا كان فيها ملف PDF أو TXT (قبل الحفظ)
+
+    تُستدعى عند إضافة ملفات جديدة. إذا لم يبق في المراسلة ملف قابل
+    للاستخراج يُحذف النص المستخرج سابقاً.
+    """
+    if letter_files(letter):
+        letter.extraction_status = PENDING
+    elif letter.extraction_status is not None:
+        letter.extracted_text = None
+        letter.extraction_status = None
+    return letter.extraction_status == PENDING
+
+def schedule_extraction(letter):
+    """جدولة استخراج النص في الخلفية (تُستدعى بعد حفظ المراسلة)"""
+    from flask import current_app
+
+    if letter.extraction_status != PENDING:
+        return None
+    return current_app.extensions['text_extractor'].submit(letter.id)
@@ -45,7 +45,8 @@ class SearchForm(FlaskForm):
         ('access_number', 'رقم الوصول'),
         ('sender', 'الباعث'),
         ('subject', 'الموضوع'),
-        ('content', 'المحتوى')
+        ('content', 'المحتوى'),
+        ('extracted_text', 'نص المرفقات')
     ], default='all')
     
     keyword = StringField('كلمة البحث', validators=[DataRequired(message="كلمة البحث مطلوبة")])
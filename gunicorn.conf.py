@@ -0,0 +1,79 @@
+# إعدادات gunicorn للإنتاج (يقرأها gunicorn تلقائياً من مجلد التشغيل)
+#
+#   flask db upgrade    # الجداول (عند التثبيت وعند كل تحديث)
+#   flask init          # بعدها: المجلدات والعدادات وفهرس البحث (يرفض إن لم تكن الترحيلات مطبقة)
+#   gunicorn            # wsgi:app بالإعدادات أدناه
+#
+# التطبيق يُحمل مرة واحدة في العملية الرئيسية (preload_app) ثم تُنسخ العمال
+# بـ fork، فلا يكرر كل عامل الاستيراد وإنشاء التطبيق. الخيوط والاتصالات تُنشأ
+# عند أول استخدام في كل عامل (ActivityLogger و ThumbnailWorker و EventBroker)
+# ومجمع اتصالات قاعدة البيانات يُفرغ بعد fork.
+#
+# كل إعداد قابل للتغيير من متغيرات البيئة GUNICORN_*.
+import multiprocessing
+import os
+import time
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# عمال gthread: الطلبات تنتظر SQLite والملفات أكثر من المعالج، والخيوط أخف من
+# العمليات (لكل عامل ذاكرته المؤقتة ومجموعات الصور المصغرة واستخراج النص).
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ['true', 'on', '1']
+
+# كل اتصال بث مباشر للوحة التحكم (/api/events) يشغل خيطاً طوال مدته: حد
+# الاتصالات لكل عامل يُشتق من عدد الخيوط مع إبقاء SSE_RESERVED_THREADS للطلبات
+# العادية. بعد بلوغ الحد يحصل المتصفح على 503 ويعود إلى الاستطلاع الدوري.
+# لعدد أكبر من لوحات التحكم المفتوحة تُزاد GUNICORN_THREADS.
+SSE_RESERVED_THREADS = 2
+SSE_LIMIT = max(threads - SSE_RESERVED_THREADS, 0)
+os.environ.setdefault('SSE_MAX_CLIENTS', str(SSE_LIMIT))
+if int(os.environ['SSE_MAX_CLIENTS']) > SSE_LIMIT:
+    raise RuntimeError(
+        f"SSE_MAX_CLIENTS={os.environ['SSE_MAX_CLIENTS']} يشغل كل خيوط العامل ({threads}): "
+        f"يجب ألا يتجاوز {SSE_LIMIT} (GUNICORN_THREADS - {SSE_RESERVED_THREADS})"
+    )
+
+# الرفع المجزأ: كل جزء (UPLOAD_CHUNK_SIZE) طلب مستقل، فلا حاجة لمهلة طويلة
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# إعادة تشغيل العامل دورياً للحد من نمو الذاكرة (المقاييس في /metrics تبدأ من الصفر)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# ملف نبض العمال في الذاكرة بدلاً من القرص (مهم في الحاويات)
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+accesslog = os.environ.get('GUNICORN_ACCESSLOG')
+errorlog = '-'
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+    worker.first_request_logged = False
+    if server.cfg.preload_app:
+        # اتصالات مفتوحة في العملية الرئيسية (إن وجدت) لا تُستخدم في العامل
+        from database.db import db
+        with server.app.wsgi().app_context():
+            db.engine.dispose(close=False)
+
+def post_worker_init(worker):
+    # التحقق من الإعداد الفعلي للتطبيق (قد يُضبط بغير متغير البيئة)
+    max_clients = worker.wsgi.config['SSE_MAX_CLIENTS']
+    if max_clients > SSE_LIMIT:
+        raise RuntimeError(f"SSE_MAX_CLIENTS={max_clients} يتجاوز {SSE_LIMIT} لعامل بـ {threads} خيوط")
+
+def post_request(worker, req, environ, resp):
+    # زمن أول طلب منذ إنشاء العامل (database/bench_startup.py يقرأ هذا السطر)
+    if not worker.first_request_logged:
+        worker.first_request_logged = True
+        worker.log.info(
+            "Worker %s first request after %.1f ms",
+            worker.pid, (time.perf_counter() - worker.forked_at) * 1000
+        )
@@ -0,0 +1,399 @@
+# استيراد سجلات المراسلات التاريخية (CSV / XLSX) مع الملفات الممسوحة
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from flask import current_app
+from werkzeug.datastructures import MultiDict
+from database.db import db
+from database.models import Letter
+from database.blobs import ensure_blob
+from database.sequences import allocate, raise_to
+from forms_letters import LetterForm
+from extraction import mark_for_extraction
+from storage import attachment_from, get_store, store_local_file
+from thumbnails import can_thumbnail, generate_thumbnails, thumbnail_format
+from utils import allowed_file
+
+# أعمدة الملف المستورد (نفس أسماء حقول LetterForm)
+FORM_COLUMNS = (
+    'letter_type', 'reference_number', 'access_number', 'sender', 'receiver',
+    'subject', 'content', 'letter_date', 'access_date', 'response_date', 'response_number'
+)
+# أسماء ملفات ممسوحة نسبةً لمجلد الملفات (المرفقات مفصولة بـ ;)
+FILE_COLUMNS = ('letter_image', 'attachments')
+
+ACCESS_PREFIXES = {'incoming': 'IN', 'outgoing': 'OUT'}
+ACCESS_NUMBER = re.compile(r'^(IN|OUT)-(\d{4})-(\d+)$')
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d')
+
+class LetterImportError(Exception):
+    """خطأ يمنع بدء الاستيراد (ملف غير مدعوم، مستخدم غير موجود ...)"""
+
+class ImportReport:
+    """ملخص عملية الاستيراد"""
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.files_copied = 0
+        self.batches = 0
+        self.extraction_pending = 0
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def processed(self):
+        return self.imported + self.skipped + self.rejected
+
+    @property
+    def rows_per_second(self):
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+def state_path(input_path):
+    """ملف نقطة الاستئناف بجانب الملف المستورد"""
+    return f"{input_path}.import-state.json"
+
+def rejected_path(input_path):
+    """ملف الصفوف المرفوضة بجانب الملف المستورد"""
+    return f"{input_path}.rejected.csv"
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            yield {(k or '').strip(): _cell_text(v) for k, v in row.items()}
+
+def _read_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise LetterImportError('قراءة ملفات XLSX تتطلب الحزمة openpyxl (pip install openpyxl)')
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_cell_text(cell) for cell in next(rows, ())]
+        for values in rows:
+            if not any(cell is not None for cell in values):
+                continue
+            yield {name: _cell_text(cell) for name, cell in zip(header, values) if name}
+    finally:
+        workbook.close()
+
+def read_rows(path):
+    """قراءة صفوف الملف كقواميس نصية مع رقم السطر في الملف"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        reader = _read_csv(path)
+    elif extension in ('.xlsx', '.xlsm'):
+        reader = _read_xlsx(path)
+    else:
+        raise LetterImportError('صيغة الملف غير مدعومة. المسموح: csv, xlsx')
+
+    # السطر 1 هو العناوين
+    for line_number, row in enumerate(reader, start=2):
+        yield line_number, row
+
+def _normalize_date(value):
+    """قبول التواريخ بعدة صيغ وتحويلها إلى YYYY-MM-DD كما يتوقعها النموذج"""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return value
+
+def _split_files(value):
+    return [name.strip() for name in (value or '').split(';') if name.strip()]
+
+def validate_row(row, scans_folder=None):
+    """التحقق من الصف بنفس قواعد LetterForm
+
+    يعيد (قيم المراسلة، قائمة الأخطاء).
+    """
+    formdata = {name: row.get(name, '') for name in FORM_COLUMNS}
+    formdata['letter_type'] = formdata['letter_type'].lower()
+    for name in ('letter_date', 'access_date', 'response_date'):
+        if formdata[name]:
+            formdata[name] = _normalize_date(formdata[name])
+
+    form = LetterForm(formdata=MultiDict(formdata), meta={'csrf': False})
+    errors = []
+    if not form.validate():
+        for name, messages in form.errors.items():
+            errors.extend(f"{name}: {message}" for message in messages)
+
+    if formdata['letter_type'] == 'outgoing' and not formdata['receiver']:
+        errors.append('receiver: المستلم مطلوب للمراسلات الصادرة')
+
+    if formdata['access_number']:
+        match = ACCESS_NUMBER.match(formdata['access_number'])
+        if not match or match.group(1) != ACCESS_PREFIXES.get(formdata['letter_type']):
+            errors.append('access_number: صيغة رقم الوصول غير صالحة')
+
+    files = {}
+    for name, allowed_key in (('letter_image', 'ALLOWED_IMAGE_EXTENSIONS'),
+                              ('attachments', 'ALLOWED_ATTACHMENT_EXTENSIONS')):
+        files[name] = []
+        for filename in _split_files(row.get(name)):
+            source = os.path.join(scans_folder or '', filename)
+            if not scans_folder or not os.path.isfile(source):
+                errors.append(f"{name}: الملف غير موجود: {filename}")
+            elif not allowed_file(filename, current_app.config[allowed_key]):
+                errors.append(f"{name}: نوع الملف غير مسموح به: {filename}")
+            else:
+                files[name].append(source)
+    if len(files['letter_image']) > 1:
+        errors.append('letter_image: صورة واحدة فقط لكل مراسلة')
+
+    if errors:
+        return None, errors
+
+    values = {name: form[name].data or None for name in FORM_COLUMNS}
+    values['files'] = files
+    return values, []
+
+class LetterImporter:
+    """استيراد المراسلات على دفعات مع حجز أرقام الوصول ونسخ الملفات بالتوازي"""
+
+    def __init__(self, input_path, user, scans_folder=None, batch_size=500,
+                 workers=4, restart=False, progress=None):
+        self.input_path = input_path
+        self.user_id = user.id
+        self.scans_folder = scans_folder
+        self.batch_size = batch_size
+        self.workers = workers
+        self.restart = restart
+        self.progress = progress
+        self.report = ImportReport()
+        self.seen_references = set()
+        self.resume_after = 0
+        self._rejected_file = None
+        self._rejected_writer = None
+
+    # ---------- نقطة الاستئناف ----------
+
+    def _load_state(self):
+        if self.restart or not os.path.exists(state_path(self.input_path)):
+            return 0
+        with open(state_path(self.input_path), encoding='utf-8') as f:
+            return json.load(f).get('last_row', 0)
+
+    def _save_state(self, last_row):
+        with open(state_path(self.input_path), 'w', encoding='utf-8') as f:
+            json.dump({'last_row': last_row, 'updated_at': datetime.utcnow().isoformat()}, f)
+
+    # ---------- الصفوف المرفوضة ----------
+
+    def _reject(self, line_number, row, errors):
+        if self._rejected_writer is None:
+            path = rejected_path(self.input_path)
+            # عند الاستئناف تُضاف الصفوف المرفوضة إلى ملف التشغيل السابق
+            mode = 'a' if self.resume_after else 'w'
+            is_new = mode == 'w' or not os.path.exists(path) or os.path.getsize(path) == 0
+            self._rejected_file = open(path, mode, newline='', encoding='utf-8-sig' if is_new else 'utf-8')
+            self._rejected_writer = csv.writer(self._rejected_file)
+            if is_new:
+                self._rejected_writer.writerow(['row', *FORM_COLUMNS, *FILE_COLUMNS, 'errors'])
+        self._rejected_writer.writerow([
+            line_number,
+            *[row.get(name, '') for name in FORM_COLUMNS + FILE_COLUMNS],
+            ' | '.join(errors)
+        ])
+        self.report.rejected += 1
+
+    # ---------- الدفعات ----------
+
+    def _existing(self, column, values):
+        values = [v for v in values if v]
+        if not values:
+            return set()
+        return {v for (v,) in db.session.query(column).filter(column.in_(values)).all()}
+
+    def _assign_access_numbers(self, pending):
+        """رفع التسلسلات للأرقام الصريحة ثم حجز كتلة واحدة لكل (بادئة، سنة)"""
+        explicit = {}
+        for values in pending:
+            if values['access_number']:
+                prefix, year, number = ACCESS_NUMBER.match(values['access_number']).groups()
+                key = (prefix, int(year))
+                explicit[key] = max(explicit.get(key, 0), int(number))
+        for (prefix, year), number in explicit.items():
+            raise_to(prefix, year, number)
+
+        blocks = {}
+        for values in pending:
+            if not values['access_number']:
+                key = (ACCESS_PREFIXES[values['letter_type']], values['access_date'].year)
+                blocks.setdefault(key, []).append(values)
+        for (prefix, year), rows in blocks.items():
+            first = allocate(prefix, year, len(rows))
+            for offset, values in enumerate(rows):
+                values['access_number'] = f"{prefix}-{year}-{first + offset:04d}"
+
+    def _store_files(self, pending):
+        """تخزين الملفات الممسوحة بالتوازي في مخزن الملفات (دون قاعدة البيانات)
+
+        يعيد الملفات المخزنة، وتُسجل بـ _register_files داخل معاملة الإدراج.
+        """
+        config = current_app.config
+        store = get_store()
+        jobs = []
+        for values in pending:
+            for source in values['files']['letter_image']:
+                jobs.append((values, 'letter_image', source, config['ALLOWED_IMAGE_EXTENSIONS']))
+            for source in values['files']['attachments']:
+                jobs.append((values, 'attachments', source, config['ALLOWED_ATTACHMENT_EXTENSIONS']))
+        if not jobs:
+            return []
+
+        fmt = thumbnail_format()
+
+        def store_file(job):
+            _, name, source, allowed_extensions = job
+            stored_file = store_local_file(source, allowed_extensions, store)
+            if name == 'letter_image' and can_thumbnail(stored_file.original_name):
+                # الصور المصغرة في نفس الخيط بدل جدولتها لاحقاً
+                try:
+                    generate_thumbnails(store, stored_file.digest, fmt)
+                except Exception:
+                    # صورة لا يقرؤها Pillow: تُعرض بأيقونة، ويعاد المحاولة عند الطلب
+                    pass
+            return stored_file
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            stored = list(pool.map(store_file, jobs))
+
+        for (values, name, _, _), stored_file in zip(jobs, stored):
+            values.setdefault('stored', {}).setdefault(name, []).append(stored_file)
+        return stored
+
+    def _register_files(self, stored):
+        """تسجيل الملفات المخزنة من الخيط الرئيسي (جلسة قاعدة البيانات ليست آمنة بين الخيوط)"""
+        for stored_file in {f.digest: f for f in stored}.values():
+            ensure_blob(stored_file.digest, stored_file.size)
+
+    def _build_letter(self, values):
+        stored = values.get('stored', {})
+        images = stored.get('letter_image', [])
+        attachments = stored.get('attachments', [])
+        letter = Letter(
+            letter_type=values['letter_type'],
+            reference_number=values['reference_number'],
+            access_number=values['access_number'],
+            sender=values['sender'],
+            receiver=values['receiver'],
+            subject=values['subject'],
+            content=values['content'],
+            letter_date=values['letter_date'],
+            access_date=values['access_date'],
+            response_date=values['response_date'],
+            response_number=values['response_number'],
+            letter_image=images[0].original_name if images else None,
+            image_digest=images[0].digest if images else None,
+            attachments=[attachment_from(stored_file) for stored_file in attachments],
+            user_id=self.user_id,
+            # ترتيب المراسلات التاريخية وإحصائياتها حسب تاريخ وصولها الفعلي
+            created_at=datetime.combine(values['access_date'], datetime.min.time()),
+        )
+        # يُستخرج النص لاحقاً بـ `flask search extract` حتى لا يبطئ الاستيراد
+        if mark_for_extraction(letter):
+            self.report.extraction_pending += 1
+        return letter
+
+    def _flush_batch(self, batch):
+        """التحقق من التكرار وتخزين الملفات، ثم حجز الأرقام والإدراج في معاملة كتابة قصيرة"""
+        if not batch:
+            return
+        last_row = batch[-1][0]
+
+        existing_refs = self._existing(Letter.reference_number, [v['reference_number'] for _, _, v in batch])
+        existing_access = self._existing(Letter.access_number, [v['access_number'] for _, _, v in batch])
+        pending = []
+        batch_access = set()
+        for line_number, row, values in batch:
+            if values['reference_number'] in existing_refs:
+                # مستوردة سابقاً (استئناف بعد انقطاع)
+                self.report.skipped += 1
+            elif values['access_number'] and (values['access_number'] in existing_access
+                                              or values['access_number'] in batch_access):
+                self._reject(line_number, row, ['access_number: رقم الوصول مستخدم مسبقاً'])
+            else:
+                if values['access_number']:
+                    batch_access.add(values['access_number'])
+                pending.append(values)
+
+        # نسخ الملفات خارج أي معاملة، حتى لا يُحجز قفل الكتابة أثناء القراءة من القرص
+        db.session.commit()
+        stored = self._store_files(pending)
+
+        try:
+            self._assign_access_numbers(pending)
+            self._register_files(stored)
+            db.session.add_all([self._build_letter(values) for values in pending])
+            db.session.commit()
+        except Exception:
+            # لا تُحذف الملفات هنا: قد يكون رفع متزامن لنفس المحتوى وجدها فلم يكتبها
+            # ولم يسجلها بعد. الملفات المخزنة دون مراسلة يحذفها `flask files gc`
+            # بعد مهلة الأمان.
+            db.session.rollback()
+            raise
+        db.session.expunge_all()
+        self.report.files_copied += len(stored)
+
+        self._save_state(last_row)
+        self.report.imported += len(pending)
+        self.report.batches += 1
+        self.report.elapsed = time.monotonic() - self.report.started
+        if self.progress:
+            self.progress(self.report)
+
+    def run(self):
+        """تنفيذ الاستيراد وإرجاع ImportReport"""
+        self.resume_after = self._load_state()
+        batch = []
+        try:
+            for line_number, row in read_rows(self.input_path):
+                if line_number <= self.resume_after:
+                    continue
+
+                values, errors = validate_row(row, self.scans_folder)
+                if not errors and values['reference_number'] in self.seen_references:
+                    errors = ['reference_number: رقم الرسالة مكرر في الملف']
+                if errors:
+                    self._reject(line_number, row, errors)
+                    continue
+
+                self.seen_references.add(values['reference_number'])
+                batch.append((line_number, row, values))
+                if len(batch) >= self.batch_size:
+                    self._flush_batch(batch)
+                    batch = []
+
+            self._flush_batch(batch)
+        finally:
+            if self._rejected_file:
+                self._rejected_file.close()
+
+        # اكتمل الاستيراد: لا حاجة لنقطة الاستئناف
+        if os.path.exists(state_path(self.input_path)):
+            os.remove(state_path(self.input_path))
+
+        self.report.elapsed = time.monotonic() - self.report.started
+        return self.report
@@ -1,11 +1,19 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, abort, send_file
 from flask_login import login_required, current_user
 from datetime import datetime
 from database.db import db
-from database.models import Letter
+from database.models import Letter, Attachment
+from database.attachments import attachment_counts
+from database.loading import letter_list_options, letter_detail_options
 from forms_letters import LetterForm
-from utils import log_activity, save_uploaded_file, generate_access_number
-import json
+from utils import log_activity, generate_access_number
+from storage import attachment_from, send_blob, get_store
+from uploads import request_file
+from thumbnails import (THUMBNAIL_SIZES, DIGEST, FORMATS, thumbnail_format, thumbnail_path,
+                        generate_thumbnails, schedule_thumbnails)
+from extraction import mark_for_extraction, schedule_extraction
+from pagination import KeysetPage
+from stats import get_request_total
 import os
 
 letters_bp = Blueprint('letters', __name__)
@@ -35,42 +43,28 @@ def add_incoming():
                 flash(error, 'danger')
         else:
             try:
-                # إنشاء رقم وصول تلقائياً
-                access_number = generate_access_number('incoming')
-                
-                # حفظ الملفات
+                # حفظ الملفات في مخزن الملفات
                 letter_image = None
                 attachments_list = []
                 
-                # تحميل صورة المراسلة
-                if 'letter_image' in request.files:
-                    file = request.files['letter_image']
-                    if file and file.filename:
-                        try:
-                            letter_image = save_uploaded_file(
-                                file, 
-                                'letters', 
-                                current_app.config['ALLOWED_IMAGE_EXTENSIONS']
-                            )
-                        except ValueError as e:
-                            flash(f'خطأ في صورة المراسلة: {str(e)}', 'danger')
-                            return redirect(url_for('letters.add_incoming'))
+                # تحميل صورة المراسلة (ملف عادي أو رفع مجزأ مكتمل)
+                try:
+                    letter_image = request_file('letter_image', current_app.config['ALLOWED_IMAGE_EXTENSIONS'])
+                except ValueError as e:
+                    flash(f'خطأ في صورة المراسلة: {str(e)}', 'danger')
+                    return redirect(url_for('letters.add_incoming'))
                 
                 # تحميل المرفقات
-                if 'attachments' in request.files:
-                    file = request.files['attachments']
-                    if file and file.filename:
-                        try:
-                            attachment = save_uploaded_file(
-                                file, 
-                                'attachments',
-                                current_app.config['ALLOWED_ATTACHMENT_EXTENSIONS']
-                            )
-                            if attachment:
-                                attachments_list.append(attachment)
-                        except ValueError as e:
-                            flash(f'خطأ في المرفق: {str(e)}', 'danger')
-                            return redirect(url_for('letters.add_incoming'))
+                try:
+                    attachment = request_file('attachments', current_app.config['ALLOWED_ATTACHMENT_EXTENSIONS'])
+                    if attachment:
+                        attachments_list.append(attachment_from(attachment))
+                except ValueError as e:
+                    flash(f'خطأ في المرفق: {str(e)}', 'danger')
+                    return redirect(url_for('letters.add_incoming'))
+                
+                # إنشاء رقم وصول تلقائياً (يُحجز ذرياً داخل معاملة الإدراج)
+                access_number = generate_access_number('incoming')
                 
                 # إنشاء المراسلة
                 letter = Letter(
@@ -85,14 +79,20 @@ def add_incoming():
                     access_date=datetime.strptime(request.form.get('access_date'), '%Y-%m-%d'),
                     response_date=datetime.strptime(request.form.get('response_date'), '%Y-%m-%d') if request.form.get('response_date') else None,
                     response_number=request.form.get('response_number'),
-                    letter_image=letter_image,
-                    attachments=json.dumps(attachments_list) if attachments_list else None,
+                    letter_image=letter_image.original_name if letter_image else None,
+                    image_digest=letter_image.digest if letter_image else None,
+                    attachments=attachments_list,
                     user_id=current_user.id
                 )
                 
+                mark_for_extraction(letter)
                 db.session.add(letter)
                 db.session.commit()
                 
+                # الصور المصغرة واستخراج النص في الخلفية
+                schedule_thumbnails(letter.image_digest, letter.letter_image)
+                schedule_extraction(letter)
+                
                 # تسجيل النشاط
                 log_activity(
                     current_user.id, 
@@ -134,42 +134,28 @@ def add_outgoing():
                 flash(error, 'danger')
         else:
             try:
-                # إنشاء رقم وصول تلقائياً
-                access_number = generate_access_number('outgoing')
-                
-                # حفظ الملفات
+                # حفظ الملفات في مخزن الملفات
                 letter_image = None
                 attachments_list = []
                 
-                # تحميل صورة المراسلة
-                if 'letter_image' in request.files:
-                    file = request.files['letter_image']
-                    if file and file.filename:
-                        try:
-                            letter_image = save_uploaded_file(
-                                file, 
-                                'letters', 
-                                current_app.config['ALLOWED_IMAGE_EXTENSIONS']
-                            )
-                        except ValueError as e:
-                            flash(f'خطأ في صورة المراسلة: {str(e)}', 'danger')
-                            return redirect(url_for('letters.add_outgoing'))
+                # تحميل صورة المراسلة (ملف عادي أو رفع مجزأ مكتمل)
+                try:
+                    letter_image = request_file('letter_image', current_app.config['ALLOWED_IMAGE_EXTENSIONS'])
+                except ValueError as e:
+                    flash(f'خطأ في صورة المراسلة: {str(e)}', 'danger')
+                    return redirect(url_for('letters.add_outgoing'))
                 
                 # تحميل المرفقات
-                if 'attachments' in request.files:
-                    file = request.files['attachments']
-                    if file and file.filename:
-                        try:
-                            attachment = save_uploaded_file(
-                                file, 
-                                'attachments',
-                                current_app.config['ALLOWED_ATTACHMENT_EXTENSIONS']
-                            )
-                            if attachment:
-                                attachments_list.append(attachment)
-                        except ValueError as e:
-                            flash(f'خطأ في المرفق: {str(e)}', 'danger')
-                            return redirect(url_for('letters.add_outgoing'))
+                try:
+                    attachment = request_file('attachments', current_app.config['ALLOWED_ATTACHMENT_EXTENSIONS'])
+                    if attachment:
+                        attachments_list.append(attachment_from(attachment))
+                except ValueError as e:
+                    flash(f'خطأ في المرفق: {str(e)}', 'danger')
+                    return redirect(url_for('letters.add_outgoing'))
+                
+                # إنشاء رقم وصول تلقائياً (يُحجز ذرياً داخل معاملة الإدراج)
+                access_number = generate_access_number('outgoing')
                 
                 # إنشاء المراسلة
                 letter = Letter(
@@ -184,14 +170,20 @@ def add_outgoing():
                     access_date=datetime.strptime(request.form.get('access_date'), '%Y-%m-%d'),
                     response_date=datetime.strptime(request.form.get('response_date'), '%Y-%m-%d') if request.form.get('response_date') else None,
                     response_number=request.form.get('response_number'),
-                    letter_image=letter_image,
-                    attachments=json.dumps(attachments_list) if attachments_list else None,
+                    letter_image=letter_image.original_name if letter_image else None,
+                    image_digest=letter_image.digest if letter_image else None,
+                    attachments=attachments_list,
                     user_id=current_user.id
                 )
                 
+                mark_for_extraction(letter)
                 db.session.add(letter)
                 db.session.commit()
                 
+                # الصور المصغرة واستخراج النص في الخلفية
+                schedule_thumbnails(letter.image_digest, letter.letter_image)
+                schedule_extraction(letter)
+                
                 # تسجيل النشاط
                 log_activity(
                     current_user.id, 
@@ -212,31 +204,34 @@ def add_outgoing():
 @login_required
 def list_letters():
     """عرض قائمة المراسلات"""
-    page = request.args.get('page', 1, type=int)
     per_page = 20
     
-    # الحصول على المراسلات
-    letters = Letter.query.filter_by(is_archived=False)\
-        .order_by(Letter.created_at.desc())\
-        .paginate(page=page, per_page=per_page)
+    # الحصول على المراسلات (ترقيم بالمؤشر على created_at, id)
+    letters = KeysetPage(
+        Letter.query.filter_by(is_archived=False)
+            .options(*letter_list_options(strict=current_app.config['STRICT_LOADING'])),
+        Letter.created_at,
+        Letter.id,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        per_page=per_page
+    )
+    
+    # العدد الإجمالي (اختياري) من عدادات الإحصائيات
+    total = None
+    if current_app.config.get('LIST_SHOW_TOTAL', True):
+        total = get_request_total('incoming_count', 'outgoing_count')
     
-    return render_template('letters/list.html', letters=letters)
+    return render_template('letters/list.html', letters=letters, total=total,
+                           attachment_counts=attachment_counts(letter.id for letter in letters.items))
 
 @letters_bp.route('/view/<int:letter_id>')
 @login_required
 def view_letter(letter_id):
     """عرض تفاصيل المراسلة"""
-    letter = Letter.query.get_or_404(letter_id)
-    
-    # تحويل المرفقات من JSON
-    attachments = []
-    if letter.attachments:
-        try:
-            attachments = json.loads(letter.attachments)
-        except:
-            attachments = []
+    letter = Letter.query.options(*letter_detail_options()).get_or_404(letter_id)
     
-    return render_template('letters/view.html', letter=letter, attachments=attachments)
+    return render_template('letters/view.html', letter=letter, attachments=letter.attachments)
 
 @letters_bp.route('/edit/<int:letter_id>', methods=['GET', 'POST'])
 @login_required
@@ -263,17 +258,21 @@ def edit_letter(letter_id):
             letter.response_date = form.response_date.data
             letter.response_number = form.response_number.data
             
-            # تحديث المرفقات إذا تم رفع ملفات جديدة
-            if 'letter_image' in request.files:
-                file = request.files['letter_image']
-                if file and file.filename:
-                    letter.letter_image = save_uploaded_file(
-                        file, 
-                        'letters', 
-                        current_app.config['ALLOWED_IMAGE_EXTENSIONS']
-                    )
+            # تحديث المرفقات إذا تم رفع ملفات جديدة (ملف عادي أو رفع مجزأ مكتمل)
+            letter_image = request_file('letter_image', current_app.config['ALLOWED_IMAGE_EXTENSIONS'])
+            if letter_image:
+                letter.letter_image = letter_image.original_name
+                letter.image_digest = letter_image.digest
+            
+            attachment = request_file('attachments', current_app.config['ALLOWED_ATTACHMENT_EXTENSIONS'])
+            if attachment:
+                letter.attachments.append(attachment_from(attachment))
+            if letter_image or attachment:
+                mark_for_extraction(letter)
             
             db.session.commit()
+            schedule_thumbnails(letter.image_digest, letter.letter_image)
+            schedule_extraction(letter)
             
             log_activity(
                 current_user.id, 
@@ -288,7 +287,7 @@ def edit_letter(letter_id):
             db.session.rollback()
             flash(f'حدث خطأ أثناء التعديل: {str(e)}', 'danger')
     
-    return render_template('letters/edit.html', form=form, letter=letter)
+    return render_template('letters/edit.html', form=form, letter=letter, attachments=letter.attachments)
 
 @letters_bp.route('/delete/<int:letter_id>')
 @login_required
@@ -343,46 +342,64 @@ def archive_letter(letter_id):
     
     return redirect(url_for('letters.list_letters'))
 
-@letters_bp.route('/download/letter_image/<filename>')
+@letters_bp.route('/download/letter_image/<int:letter_id>')
 @login_required
-def download_letter_image(filename):
-    """تحميل صورة المراسلة"""
+def download_letter_image(letter_id):
+    """تحميل صورة المراسلة (أو عرضها في المتصفح مع ?inline=1)"""
+    letter = Letter.query.get_or_404(letter_id)
+    
+    if not letter.image_digest:
+        flash('الملف غير موجود', 'danger')
+        return redirect(url_for('letters.view_letter', letter_id=letter_id))
+    
     try:
-        # التحقق من أن الملف موجود
-        uploads_path = os.path.join(current_app.root_path, 'static', 'uploads', 'letters')
-        
-        # التحقق من أن المسار آمن
-        if not os.path.exists(uploads_path):
-            flash('مجلد التحميل غير موجود', 'danger')
-            return redirect(url_for('letters.list_letters'))
-        
-        return send_from_directory(uploads_path, filename, as_attachment=True)
-        
+        return send_blob(letter.image_digest, letter.letter_image, inline=request.args.get('inline') == '1')
     except FileNotFoundError:
         flash('الملف غير موجود', 'danger')
-        return redirect(url_for('letters.list_letters'))
-    except Exception as e:
-        flash(f'حدث خطأ أثناء التحميل: {str(e)}', 'danger')
-        return redirect(url_for('letters.list_letters'))
+        return redirect(url_for('letters.view_letter', letter_id=letter_id))
 
-@letters_bp.route('/download/attachment/<filename>')
+@letters_bp.route('/download/attachment/<int:attachment_id>')
 @login_required
-def download_attachment(filename):
-    """تحميل مرفق"""
+def download_attachment(attachment_id):
+    """تحميل مرفق (أو عرضه في المتصفح مع ?inline=1)"""
+    attachment = Attachment.query.get_or_404(attachment_id)
+    
+    if not attachment.checksum:
+        flash('الملف غير موجود', 'danger')
+        return redirect(url_for('letters.view_letter', letter_id=attachment.letter_id))
+    
     try:
-        # التحقق من أن الملف موجود
-        uploads_path = os.path.join(current_app.root_path, 'static', 'uploads', 'attachments')
-        
-        # التحقق من أن المسار آمن
-        if not os.path.exists(uploads_path):
-            flash('مجلد المرفقات غير موجود', 'danger')
-            return redirect(url_for('letters.list_letters'))
-        
-        return send_from_directory(uploads_path, filename, as_attachment=True)
-        
+        return send_blob(attachment.checksum, attachment.original_name, attachment.mime_type,
+                         inline=request.args.get('inline') == '1')
     except FileNotFoundError:
         flash('الملف غير موجود', 'danger')
-        return redirect(url_for('letters.list_letters'))
-    except Exception as e:
-        flash(f'حدث خطأ أثناء التحميل: {str(e)}', 'danger')
-        return redirect(url_for('letters.list_letters'))
\ No newline at end of file
+        return redirect(url_for('letters.view_letter', letter_id=attachment.letter_id))
+
+# الصور المصغرة عنوانها مبني على بصمة المحتوى فلا يتغير محتواها أبداً
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+
+@letters_bp.route('/thumbnail/<digest>/<size>')
+@login_required
+def letter_thumbnail(digest, size):
+    """الصورة المصغرة لصورة المراسلة"""
+    if size not in THUMBNAIL_SIZES or not DIGEST.match(digest):
+        abort(404)
+    
+    store = get_store()
+    fmt = thumbnail_format()
+    path = thumbnail_path(store, digest, size, fmt)
+    
+    if not os.path.exists(path):
+        # لم تُولد بعد في الخلفية: توليدها الآن
+        try:
+            generate_thumbnails(store, digest, fmt)
+        except Exception:
+            abort(404)
+        if not os.path.exists(path):
+            abort(404)
+    
+    response = send_file(path, mimetype=FORMATS[fmt][1], max_age=THUMBNAIL_MAX_AGE, etag=f"{digest}-{size}")
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
\ No newline at end of file
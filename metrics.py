@@ -0,0 +1,173 @@
+# قياس عدد استعلامات SQL وزمنها وزمن الاستجابة لكل طلب
+#
+# - ترويسة Server-Timing في كل استجابة (تظهر في أدوات المطور في المتصفح)
+# - مدرجات تكرارية لكل مسار بصيغة Prometheus على /metrics
+# - تحذير في السجل عند تجاوز المسار ميزانية الاستعلامات (QUERY_BUDGETS)
+#
+# المقاييس لكل عملية: مع عدة عمال (gunicorn) يُجمع كل عامل على حدة.
+import bisect
+import hmac
+import threading
+import time
+from flask import g, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# حدود فئات المدرجات التكرارية
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+class SqlStats:
+    """استعلامات الطلب الحالي (في g.sql_stats)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(الحد الأعلى، العدد التراكمي) لكل فئة بما فيها +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield ('+Inf' if bound == float('inf') else f'{bound:g}'), total
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_label_value(value)}"' for name, value in labels.items())
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_stats' in g:
+        context._metrics_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is not None and has_request_context() and 'sql_stats' in g:
+        g.sql_stats.count += 1
+        g.sql_stats.duration += time.perf_counter() - started
+
+class RequestMetrics:
+    """عد استعلامات SQL وزمنها لكل طلب ولكل مسار (endpoint)"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._latency = {}
+        self._queries = {}
+        self._sql_time = {}
+        self._over_budget = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.budgets = app.config['QUERY_BUDGETS']
+        self.default_budget = app.config['QUERY_BUDGET_DEFAULT']
+        self.server_timing = app.config['SERVER_TIMING']
+        app.extensions['request_metrics'] = self
+        if not app.config['REQUEST_METRICS']:
+            return
+
+        # الاستعلامات خارج الطلبات (الخيوط الخلفية، أوامر سطر الأوامر) لا تُحسب
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def budget_for(self, endpoint):
+        return self.budgets.get(endpoint, self.default_budget)
+
+    def _before_request(self):
+        g.sql_stats = SqlStats()
+
+    def _after_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unmatched'
+
+        if self.server_timing:
+            response.headers.add(
+                'Server-Timing',
+                f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.1f}, app;dur={elapsed * 1000:.1f}'
+            )
+
+        budget = self.budget_for(endpoint)
+        over_budget = budget is not None and stats.count > budget
+        if over_budget:
+            self.app.logger.warning(
+                f"Query budget exceeded for {endpoint}: {stats.count} queries (budget {budget}) "
+                f"on {request.method} {request.path}"
+            )
+
+        self.observe(endpoint, request.method, response.status_code, elapsed, stats, over_budget)
+        return response
+
+    def observe(self, endpoint, method, status, elapsed, stats, over_budget=False):
+        with self._lock:
+            key = (endpoint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for histograms, buckets, value in ((self._latency, LATENCY_BUCKETS, elapsed),
+                                               (self._queries, QUERY_BUCKETS, stats.count),
+                                               (self._sql_time, LATENCY_BUCKETS, stats.duration)):
+                if endpoint not in histograms:
+                    histograms[endpoint] = Histogram(buckets)
+                histograms[endpoint].observe(value)
+            if over_budget:
+                self._over_budget[endpoint] = self._over_budget.get(endpoint, 0) + 1
+
+    def authorized(self):
+        """المدير المسجل دخوله، أو طلب يحمل METRICS_TOKEN (لجامع Prometheus)"""
+        token = self.app.config.get('METRICS_TOKEN')
+        if token:
+            supplied = request.headers.get('Authorization', '')
+            if hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+                return True
+        return current_user.is_authenticated and current_user.is_admin()
+
+    def render(self):
+        """المقاييس بصيغة Prometheus النصية"""
+        with self._lock:
+            lines = [
+                '# HELP http_requests_total عدد الطلبات حسب المسار والطريقة والحالة',
+                '# TYPE http_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}')
+
+            for name, help_text, histograms in (
+                ('http_request_duration_seconds', 'زمن الاستجابة', self._latency),
+                ('db_queries_per_request', 'عدد استعلامات SQL في الطلب', self._queries),
+                ('db_query_duration_seconds', 'زمن استعلامات SQL في الطلب', self._sql_time),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for endpoint, histogram in sorted(histograms.items()):
+                    for bound, count in histogram.samples():
+                        lines.append(f'{name}_bucket{{{_labels(endpoint=endpoint, le=bound)}}} {count}')
+                    lines.append(f'{name}_sum{{{_labels(endpoint=endpoint)}}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{{_labels(endpoint=endpoint)}}} {histogram.count}')
+
+            lines.append('# HELP db_query_budget_exceeded_total الطلبات التي تجاوزت ميزانية الاستعلامات')
+            lines.append('# TYPE db_query_budget_exceeded_total counter')
+            for endpoint, count in sorted(self._over_budget.items()):
+                lines.append(f'db_query_budget_exceeded_total{{{_labels(endpoint=endpoint)}}} {count}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,85 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 10:29:06.836895
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=256), nullable=False),
+    sa.Column('full_name', sa.String(length=100), nullable=False),
+    sa.Column('role', sa.String(length=20), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('letters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('letter_type', sa.String(length=20), nullable=False),
+    sa.Column('reference_number', sa.String(length=50), nullable=False),
+    sa.Column('access_number', sa.String(length=50), nullable=False),
+    sa.Column('sender', sa.String(length=200), nullable=False),
+    sa.Column('receiver', sa.String(length=200), nullable=True),
+    sa.Column('subject', sa.String(length=500), nullable=False),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('letter_date', sa.Date(), nullable=False),
+    sa.Column('access_date', sa.Date(), nullable=False),
+    sa.Column('response_date', sa.Date(), nullable=True),
+    sa.Column('response_number', sa.String(length=50), nullable=True),
+    sa.Column('letter_image', sa.String(length=500), nullable=True),
+    sa.Column('attachments', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('is_archived', sa.Boolean(), nullable=True),
+    sa.Column('archive_date', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('access_number'),
+    sa.UniqueConstraint('reference_number')
+    )
+    op.create_table('archives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('letter_id', sa.Integer(), nullable=False),
+    sa.Column('archive_reason', sa.String(length=200), nullable=True),
+    sa.Column('archived_by', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['archived_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['letter_id'], ['letters.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('activity_logs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=100), nullable=False),
+    sa.Column('details', sa.Text(), nullable=True),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('activity_logs')
+    op.drop_table('archives')
+    op.drop_table('letters')
+    op.drop_table('users')
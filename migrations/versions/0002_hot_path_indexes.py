@@ -0,0 +1,39 @@
+"""indexes for the hot query paths
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:35:12.114203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+LETTER_INDEXES = [
+    ('ix_letters_is_archived_created_at', ['is_archived', 'created_at']),
+    ('ix_letters_is_archived_archive_date', ['is_archived', 'archive_date']),
+    ('ix_letters_letter_type_created_at', ['letter_type', 'created_at']),
+    ('ix_letters_created_at_letter_type', ['created_at', 'letter_type']),
+    ('ix_letters_sender', ['sender']),
+]
+
+
+def upgrade():
+    # if_not_exists: databases created by db.create_all() already have them
+    for name, columns in LETTER_INDEXES:
+        op.create_index(name, 'letters', columns, unique=False, if_not_exists=True)
+    op.create_index('ix_activity_logs_created_at', 'activity_logs', ['created_at'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_activity_logs_created_at', table_name='activity_logs', if_exists=True)
+    for name, columns in reversed(LETTER_INDEXES):
+        op.drop_index(name, table_name='letters', if_exists=True)
@@ -0,0 +1,32 @@
+"""access number sequences
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:02:41.530117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # قد يكون db.create_all() قد أنشأ الجدول عند تشغيل التطبيق قبل الترحيل
+    if sa.inspect(op.get_bind()).has_table('access_sequences'):
+        return
+    op.create_table('access_sequences',
+    sa.Column('prefix', sa.String(length=10), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('last_value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('prefix', 'year')
+    )
+
+
+def downgrade():
+    op.drop_table('access_sequences')
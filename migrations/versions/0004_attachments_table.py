@@ -0,0 +1,168 @@
+"""attachments table (replaces letters.attachments JSON)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:20:07.118402
+
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+# الاسم المخزن: <uuid hex>_<الاسم الأصلي>
+STORED_NAME = re.compile(r'^[0-9a-f]{32}_(.+)$')
+
+letters = sa.table(
+    'letters',
+    sa.column('id', sa.Integer),
+    sa.column('attachments', sa.Text),
+)
+
+attachments = sa.table(
+    'attachments',
+    sa.column('id', sa.Integer),
+    sa.column('letter_id', sa.Integer),
+    sa.column('filename', sa.String),
+    sa.column('original_name', sa.String),
+    sa.column('size', sa.Integer),
+    sa.column('mime_type', sa.String),
+    sa.column('checksum', sa.String),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def _describe(filename):
+    """الحجم والبصمة من الملف على القرص إن وُجد"""
+    path = os.path.join(current_app.root_path, 'static', 'uploads', 'attachments', filename)
+    if not os.path.isfile(path):
+        return None, None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return os.path.getsize(path), digest.hexdigest()
+
+
+def _attachment_rows(letter_id, value):
+    try:
+        filenames = json.loads(value) if value else []
+    except ValueError:
+        filenames = []
+    rows = []
+    for filename in filenames if isinstance(filenames, list) else []:
+        if not filename:
+            continue
+        match = STORED_NAME.match(filename)
+        original_name = match.group(1) if match else filename
+        size, checksum = _describe(filename)
+        rows.append({
+            'letter_id': letter_id,
+            'filename': filename,
+            'original_name': original_name,
+            'size': size,
+            'mime_type': mimetypes.guess_type(original_name)[0] or 'application/octet-stream',
+            'checksum': checksum,
+            'created_at': datetime.utcnow(),
+        })
+    return rows
+
+
+def upgrade():
+    connection = op.get_bind()
+
+    # قد يكون db.create_all() قد أنشأ الجدول عند تشغيل التطبيق قبل الترحيل
+    if not sa.inspect(connection).has_table('attachments'):
+        op.create_table('attachments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('letter_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('original_name', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=True),
+        sa.Column('mime_type', sa.String(length=100), nullable=True),
+        sa.Column('checksum', sa.String(length=64), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['letter_id'], ['letters.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('attachments', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_attachments_letter_id'), ['letter_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_attachments_mime_type'), ['mime_type'], unique=False)
+
+    columns = {c['name'] for c in sa.inspect(connection).get_columns('letters')}
+    if 'attachments' not in columns:
+        return
+
+    # نقل المرفقات من عمود JSON على دفعات (ترقيم بالمؤشر على id)
+    last_id = 0
+    while True:
+        batch = connection.execute(
+            sa.select(letters.c.id, letters.c.attachments)
+            .where(letters.c.id > last_id)
+            .where(letters.c.attachments.isnot(None))
+            .order_by(letters.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not batch:
+            break
+        rows = []
+        for letter_id, value in batch:
+            rows.extend(_attachment_rows(letter_id, value))
+        if rows:
+            connection.execute(attachments.insert(), rows)
+        last_id = batch[-1][0]
+
+    with op.batch_alter_table('letters', schema=None) as batch_op:
+        batch_op.drop_column('attachments')
+
+
+def downgrade():
+    connection = op.get_bind()
+
+    with op.batch_alter_table('letters', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('attachments', sa.Text(), nullable=True))
+
+    # إعادة بناء عمود JSON من جدول المرفقات على دفعات
+    last_id = 0
+    while True:
+        letter_ids = connection.execute(
+            sa.select(attachments.c.letter_id).distinct()
+            .where(attachments.c.letter_id > last_id)
+            .order_by(attachments.c.letter_id)
+            .limit(BATCH_SIZE)
+        ).scalars().all()
+        if not letter_ids:
+            break
+        filenames = {}
+        for letter_id, filename in connection.execute(
+            sa.select(attachments.c.letter_id, attachments.c.filename)
+            .where(attachments.c.letter_id.in_(letter_ids))
+            .order_by(attachments.c.id)
+        ):
+            filenames.setdefault(letter_id, []).append(filename)
+        for letter_id, names in filenames.items():
+            connection.execute(
+                letters.update().where(letters.c.id == letter_id).values(attachments=json.dumps(names))
+            )
+        last_id = letter_ids[-1]
+
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_attachments_mime_type'))
+        batch_op.drop_index(batch_op.f('ix_attachments_letter_id'))
+
+    op.drop_table('attachments')
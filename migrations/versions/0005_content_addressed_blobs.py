@@ -0,0 +1,201 @@
+"""content-addressed blob store
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:05:44.902317
+
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+# تسمية المفاتيح الأجنبية غير المسماة (التي أنشأها db.create_all) لحذفها في SQLite
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# الاسم المخزن سابقاً: <uuid hex>_<الاسم الأصلي>
+STORED_NAME = re.compile(r'^[0-9a-f]{32}_(.+)$')
+
+letters = sa.table(
+    'letters',
+    sa.column('id', sa.Integer),
+    sa.column('letter_image', sa.String),
+    sa.column('image_digest', sa.String),
+)
+
+attachments = sa.table(
+    'attachments',
+    sa.column('id', sa.Integer),
+    sa.column('filename', sa.String),
+    sa.column('checksum', sa.String),
+)
+
+blobs = sa.table(
+    'blobs',
+    sa.column('digest', sa.String),
+    sa.column('size', sa.Integer),
+    sa.column('ref_count', sa.Integer),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def _legacy_path(folder, filename):
+    return os.path.join(current_app.root_path, 'static', 'uploads', folder, filename)
+
+
+def _blob_path(digest):
+    root = os.path.join(current_app.root_path, current_app.config['BLOB_STORE_FOLDER'])
+    return os.path.join(root, digest[:2], digest[2:4], digest)
+
+
+def _store(connection, path, known):
+    """نسخ الملف القديم إلى المخزن باسم بصمته وتسجيله، أو None إذا كان مفقوداً"""
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    key = digest.hexdigest()
+
+    target = _blob_path(key)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        os.close(fd)
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, target)
+
+    if key not in known and connection.execute(
+        sa.select(blobs.c.digest).where(blobs.c.digest == key)
+    ).first() is None:
+        connection.execute(blobs.insert().values(
+            digest=key, size=os.path.getsize(path), ref_count=0, created_at=datetime.utcnow()
+        ))
+    known.add(key)
+    return key
+
+
+def _original_name(stored_name):
+    match = STORED_NAME.match(stored_name)
+    return match.group(1) if match else stored_name
+
+
+def _batches(connection, table, *where):
+    """صفوف الجدول على دفعات (ترقيم بالمؤشر على id)"""
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(table).where(table.c.id > last_id, *where).order_by(table.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade():
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    # قد يكون db.create_all() قد أنشأ الجدول عند تشغيل التطبيق قبل الترحيل
+    if not inspector.has_table('blobs'):
+        op.create_table('blobs',
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('digest')
+        )
+
+    with op.batch_alter_table('letters', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_digest', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_letters_image_digest'), ['image_digest'], unique=False)
+        batch_op.create_foreign_key('fk_letters_image_digest_blobs', 'blobs', ['image_digest'], ['digest'])
+
+    # نقل صور المراسلات وملفات المرفقات إلى المخزن (تبقى الملفات القديمة في مكانها)
+    known = set()
+    for rows in _batches(connection, letters, letters.c.letter_image.isnot(None)):
+        for row in rows:
+            digest = _store(connection, _legacy_path('letters', row.letter_image), known)
+            if digest:
+                connection.execute(letters.update().where(letters.c.id == row.id).values(
+                    image_digest=digest, letter_image=_original_name(row.letter_image)
+                ))
+
+    for rows in _batches(connection, attachments):
+        for row in rows:
+            digest = _store(connection, _legacy_path('attachments', row.filename), known)
+            values = {'checksum': digest}
+            if digest:
+                values['filename'] = secure_filename(_original_name(row.filename)) or row.filename
+            connection.execute(attachments.update().where(attachments.c.id == row.id).values(**values))
+
+    # جدول attachments الذي أنشأه db.create_all() يحوي الفهرس والمفتاح مسبقاً
+    inspector = sa.inspect(connection)
+    indexes = {index['name'] for index in inspector.get_indexes('attachments')}
+    foreign_keys = {tuple(fk['constrained_columns']) for fk in inspector.get_foreign_keys('attachments')}
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        if 'ix_attachments_checksum' not in indexes:
+            batch_op.create_index(batch_op.f('ix_attachments_checksum'), ['checksum'], unique=False)
+        if ('checksum',) not in foreign_keys:
+            batch_op.create_foreign_key('fk_attachments_checksum_blobs', 'blobs', ['checksum'], ['digest'])
+
+    letter_refs = sa.select(sa.func.count()).select_from(letters)\
+        .where(letters.c.image_digest == blobs.c.digest).scalar_subquery()
+    attachment_refs = sa.select(sa.func.count()).select_from(attachments)\
+        .where(attachments.c.checksum == blobs.c.digest).scalar_subquery()
+    connection.execute(blobs.update().values(ref_count=letter_refs + attachment_refs))
+
+
+def _restore(digest, folder, original_name):
+    """نسخ الملف من المخزن إلى المجلد القديم باسم فريد"""
+    stored_name = f"{uuid.uuid4().hex}_{secure_filename(original_name) or 'file'}"
+    target = _legacy_path(folder, stored_name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copyfile(_blob_path(digest), target)
+    return stored_name
+
+
+def downgrade():
+    connection = op.get_bind()
+
+    for rows in _batches(connection, letters, letters.c.image_digest.isnot(None)):
+        for row in rows:
+            connection.execute(letters.update().where(letters.c.id == row.id).values(
+                letter_image=_restore(row.image_digest, 'letters', row.letter_image or 'image')
+            ))
+
+    for rows in _batches(connection, attachments, attachments.c.checksum.isnot(None)):
+        for row in rows:
+            connection.execute(attachments.update().where(attachments.c.id == row.id).values(
+                filename=_restore(row.checksum, 'attachments', row.filename)
+            ))
+
+    with op.batch_alter_table('attachments', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint('fk_attachments_checksum_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_attachments_checksum'))
+
+    with op.batch_alter_table('letters', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint('fk_letters_image_digest_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_letters_image_digest'))
+        batch_op.drop_column('image_digest')
+
+    op.drop_table('blobs')
@@ -0,0 +1,49 @@
+"""chunked resumable uploads
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 19:12:27.604318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # قد يكون db.create_all() قد أنشأ الجدول عند تشغيل التطبيق قبل الترحيل
+    if sa.inspect(op.get_bind()).has_table('uploads'):
+        return
+    op.create_table('uploads',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=True),
+    sa.Column('digest', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['digest'], ['blobs.digest'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('uploads', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_uploads_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_uploads_digest'), ['digest'], unique=False)
+        batch_op.create_index(batch_op.f('ix_uploads_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('uploads', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_uploads_user_id'))
+        batch_op.drop_index(batch_op.f('ix_uploads_digest'))
+        batch_op.drop_index(batch_op.f('ix_uploads_created_at'))
+
+    op.drop_table('uploads')
@@ -0,0 +1,37 @@
+"""extracted attachment text for search
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 21:04:51.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # قد يكون db.create_all() قد أنشأ الأعمدة عند تشغيل التطبيق قبل الترحيل
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('letters')}
+    if 'extraction_status' in columns:
+        return
+    with op.batch_alter_table('letters', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('extracted_text', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('extraction_status', sa.String(length=20), nullable=True))
+        batch_op.create_index(batch_op.f('ix_letters_extraction_status'), ['extraction_status'], unique=False)
+
+    # جدول FTS يُعاد بناؤه بالعمود الجديد بـ `flask init` أو `flask search reindex`،
+    # ونص المراسلات الحالية يُستخرج بـ `flask search extract`
+
+
+def downgrade():
+    with op.batch_alter_table('letters', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_letters_extraction_status'))
+        batch_op.drop_column('extraction_status')
+        batch_op.drop_column('extracted_text')
@@ -0,0 +1,56 @@
+"""letter counters table for dashboard statistics
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 09:12:40.527316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # قواعد البيانات المنشأة بـ db.create_all() (أو بالنسخة الأولى من 0001) فيها الجدول
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('letter_counters'):
+        op.create_table('letter_counters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('letter_type', sa.String(length=20), nullable=False),
+        sa.Column('is_archived', sa.Boolean(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('letter_type', 'is_archived', 'year', 'month', name='uq_letter_counters_bucket')
+        )
+
+    counters = sa.table('letter_counters',
+        sa.column('letter_type', sa.String), sa.column('is_archived', sa.Boolean),
+        sa.column('year', sa.Integer), sa.column('month', sa.Integer), sa.column('count', sa.Integer))
+    if bind.execute(sa.select(sa.literal(1)).select_from(counters).limit(1)).first() is not None:
+        return
+
+    # تعبئة العدادات من جدول المراسلات (نفس خانات database/counters.py)
+    letters = sa.table('letters',
+        sa.column('letter_type', sa.String), sa.column('is_archived', sa.Boolean),
+        sa.column('created_at', sa.DateTime))
+    created_at = sa.func.coalesce(letters.c.created_at, sa.func.current_timestamp())
+    is_archived = sa.func.coalesce(letters.c.is_archived, sa.false())
+    year = sa.cast(sa.extract('year', created_at), sa.Integer)
+    month = sa.cast(sa.extract('month', created_at), sa.Integer)
+    buckets = sa.select(letters.c.letter_type, is_archived, year, month, sa.func.count())\
+        .group_by(letters.c.letter_type, is_archived, year, month)
+    bind.execute(counters.insert().from_select(
+        ['letter_type', 'is_archived', 'year', 'month', 'count'], buckets
+    ))
+
+
+def downgrade():
+    op.drop_table('letter_counters')
@@ -0,0 +1,43 @@
+"""archived letters always have an archive date
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-20 10:31:07.214583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+CONSTRAINT = 'ck_letters_archived_archive_date'
+
+
+def upgrade():
+    # قائمة الأرشيف تُرقّم بالمؤشر على (archive_date, id): مراسلة مؤرشفة بلا تاريخ
+    # لا تظهر في أي صفحة. التاريخ الأقرب المتاح لها هو آخر تعديل.
+    letters = sa.table('letters',
+        sa.column('is_archived', sa.Boolean), sa.column('archive_date', sa.DateTime),
+        sa.column('created_at', sa.DateTime), sa.column('updated_at', sa.DateTime))
+    op.get_bind().execute(
+        letters.update()
+        .where(letters.c.is_archived == sa.true(), letters.c.archive_date.is_(None))
+        .values(archive_date=sa.func.coalesce(letters.c.updated_at, letters.c.created_at,
+                                              sa.func.current_timestamp()))
+    )
+
+    constraints = {c['name'] for c in sa.inspect(op.get_bind()).get_check_constraints('letters')}
+    if CONSTRAINT in constraints:
+        return
+    with op.batch_alter_table('letters', schema=None) as batch_op:
+        batch_op.create_check_constraint(CONSTRAINT, 'NOT is_archived OR archive_date IS NOT NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('letters', schema=None) as batch_op:
+        batch_op.drop_constraint(CONSTRAINT, type_='check')
@@ -0,0 +1,117 @@
+import base64
+from datetime import datetime
+from math import ceil
+from sqlalchemy import func, literal, tuple_
+from database.db import db
+
+def capped_count(query, cap):
+    """عدد النتائج حتى حد أقصى، دون عد جميع الصفوف المطابقة
+
+    يعيد (العدد، هل تجاوز الحد)
+    """
+    limited = query.order_by(None).with_entities(literal(1)).limit(cap + 1).subquery()
+    count = db.session.query(func.count()).select_from(limited).scalar() or 0
+    if count > cap:
+        return cap, True
+    return count, False
+
+class OffsetPage:
+    """صفحة نتائج بالإزاحة مع عدد تقريبي محدود بدلاً من COUNT(*) كامل"""
+
+    def __init__(self, query, page=1, per_page=20, count_cap=1000):
+        self.page = max(page, 1)
+        self.per_page = per_page
+
+        rows = query.limit(per_page + 1).offset((self.page - 1) * per_page).all()
+        self.items = rows[:per_page]
+        self.has_next = len(rows) > per_page
+        self.has_prev = self.page > 1
+
+        if self.page == 1 and not self.has_next:
+            self.total, self.total_capped = len(self.items), False
+        else:
+            self.total, self.total_capped = capped_count(query, count_cap)
+
+    @property
+    def pages(self):
+        if self.total_capped:
+            return None
+        return max(ceil(self.total / self.per_page), 1)
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    @property
+    def first_index(self):
+        """ترتيب أول عنصر في الصفحة"""
+        return (self.page - 1) * self.per_page + 1
+
+def encode_cursor(sort_value, row_id):
+    """ترميز موضع الصف (قيمة الترتيب، المعرف) في نص صالح للرابط"""
+    raw = f"{sort_value.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """فك ترميز الموضع، أو None إذا كان غير صالح"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        sort_value, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+class KeysetPage:
+    """صفحة نتائج بالمؤشر (keyset) مرتبة تنازلياً حسب (عمود الترتيب، المعرف)
+
+    تكلفة أي صفحة ثابتة مهما كان عمقها: لا OFFSET ولا COUNT(*).
+    """
+
+    def __init__(self, query, sort_column, id_column, after=None, before=None, per_page=20):
+        self.per_page = per_page
+        self._sort_column = sort_column
+        self._id_column = id_column
+
+        after = decode_cursor(after)
+        before = decode_cursor(before) if after is None else None
+
+        if before is not None:
+            # الصفحة السابقة: نقرأ تصاعدياً ثم نعكس الترتيب
+            rows = query.filter(tuple_(sort_column, id_column) > tuple_(*before))\
+                .order_by(sort_column.asc(), id_column.asc())\
+                .limit(per_page + 1).all()
+            self.has_prev = len(rows) > per_page
+            self.has_next = True
+            self.items = list(reversed(rows[:per_page]))
+        else:
+            if after is not None:
+                query = query.filter(tuple_(sort_column, id_column) < tuple_(*after))
+            rows = query.order_by(sort_column.desc(), id_column.desc())\
+                .limit(per_page + 1).all()
+            self.has_next = len(rows) > per_page
+            self.has_prev = after is not None
+            self.items = rows[:per_page]
+
+    def _cursor_for(self, item):
+        value = getattr(item, self._sort_column.key)
+        if value is None:
+            return None
+        return encode_cursor(value, getattr(item, self._id_column.key))
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.items:
+            return self._cursor_for(self.items[-1])
+        return None
+
+    @property
+    def prev_cursor(self):
+        if self.has_prev and self.items:
+            return self._cursor_for(self.items[0])
+        return None
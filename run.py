@@ -1,9 +1,11 @@
 # ????? ???????
-from app import create_app
+from app import create_app, init_instance
 
 app = create_app()
 
 if __name__ == '__main__':
+    # خادم التطوير (للإنتاج: gunicorn، انظر gunicorn.conf.py)
+    init_instance(app)
     app.run(debug=True, host='0.0.0.0', port=5000)
 
     
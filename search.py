@@ -1,23 +1,79 @@
-from flask import Blueprint, render_template, request, flash  # أضف flash هنا
+from flask import Blueprint, render_template, request, flash, current_app  # أضف flash هنا
 from flask_login import login_required
 from database.models import Letter
+from database.attachments import attachment_counts
+from database.loading import letter_list_options
+from database.fts import FTS_TABLE, FTS_COLUMNS, FTS_WEIGHTS, fts_available, build_match_query
+from sqlalchemy import column, false, func, literal_column, select, table
 from forms import SearchForm
+from pagination import OffsetPage
 from datetime import datetime
-import json
 
 search_bp = Blueprint('search', __name__)
 
-@search_bp.route('/advanced', methods=['GET', 'POST'])
+SEARCH_PER_PAGE = 20
+
+# الأعمدة المعروضة في قائمة النتائج
+RESULT_COLUMNS = (
+    Letter.id,
+    Letter.letter_type,
+    Letter.reference_number,
+    Letter.access_number,
+    Letter.sender,
+    Letter.subject,
+    Letter.letter_date,
+    Letter.letter_image,
+    Letter.image_digest,
+    Letter.created_at,
+)
+
+def apply_ilike_search(query, search_type, keyword):
+    """البحث بـ ilike (قواعد البيانات بدون FTS5 مثل PostgreSQL)"""
+    if search_type == 'all':
+        return query.filter(
+            (Letter.reference_number.ilike(f'%{keyword}%')) |
+            (Letter.access_number.ilike(f'%{keyword}%')) |
+            (Letter.sender.ilike(f'%{keyword}%')) |
+            (Letter.subject.ilike(f'%{keyword}%')) |
+            (Letter.content.ilike(f'%{keyword}%')) |
+            (Letter.extracted_text.ilike(f'%{keyword}%'))
+        )
+    if search_type in FTS_COLUMNS:
+        return query.filter(getattr(Letter, search_type).ilike(f'%{keyword}%'))
+    return query
+
+def apply_fts_search(query, search_type, keyword):
+    """البحث في فهرس FTS5 مع ترتيب النتائج حسب BM25"""
+    fts_column = search_type if search_type in FTS_COLUMNS else None
+    match = build_match_query(keyword, fts_column)
+    if match is None:
+        return query.filter(false())
+    
+    fts = table(FTS_TABLE, column('rowid'))
+    rank = func.bm25(literal_column(FTS_TABLE), *FTS_WEIGHTS)
+    matches = select(fts.c.rowid.label('letter_id'), rank.label('rank'))\
+        .where(literal_column(FTS_TABLE).op('MATCH')(match))\
+        .subquery()
+    
+    return query.join(matches, matches.c.letter_id == Letter.id)\
+        .order_by(matches.c.rank)
+
+@search_bp.route('/advanced')
 @login_required
 def advanced_search():
     """البحث المتقدم"""
-    form = SearchForm()
-    results = []
+    # معايير البحث في الرابط (GET) لتكون النتائج قابلة للحفظ والتخزين المؤقت
+    form = SearchForm(request.args, meta={'csrf': False})
+    results = None
+    search_args = {}
+    counts = {}
     
-    if form.validate_on_submit():
+    if 'keyword' in request.args and form.validate():
         try:
-            # بناء الاستعلام
-            query = Letter.query
+            # بناء الاستعلام (الأعمدة المعروضة فقط، بدون المحتوى والمرفقات)
+            query = Letter.query.options(*letter_list_options(
+                RESULT_COLUMNS, strict=current_app.config['STRICT_LOADING']
+            ))
             
             # تطبيق فلتر نوع المراسلة
             if form.letter_type.data != 'all':
@@ -33,40 +89,23 @@ def advanced_search():
             
             # تطبيق البحث حسب النوع
             keyword = form.keyword.data
-            if keyword:
-                if form.search_type.data == 'all':
-                    query = query.filter(
-                        (Letter.reference_number.ilike(f'%{keyword}%')) |
-                        (Letter.access_number.ilike(f'%{keyword}%')) |
-                        (Letter.sender.ilike(f'%{keyword}%')) |
-                        (Letter.subject.ilike(f'%{keyword}%')) |
-                        (Letter.content.ilike(f'%{keyword}%'))
-                    )
-                elif form.search_type.data == 'reference_number':
-                    query = query.filter(Letter.reference_number.ilike(f'%{keyword}%'))
-                elif form.search_type.data == 'access_number':
-                    query = query.filter(Letter.access_number.ilike(f'%{keyword}%'))
-                elif form.search_type.data == 'sender':
-                    query = query.filter(Letter.sender.ilike(f'%{keyword}%'))
-                elif form.search_type.data == 'subject':
-                    query = query.filter(Letter.subject.ilike(f'%{keyword}%'))
-                elif form.search_type.data == 'content':
-                    query = query.filter(Letter.content.ilike(f'%{keyword}%'))
-            
-            # تنفيذ البحث
-            results = query.order_by(Letter.created_at.desc()).all()
+            if keyword and fts_available():
+                query = apply_fts_search(query, form.search_type.data, keyword)
+            elif keyword:
+                query = apply_ilike_search(query, form.search_type.data, keyword)
             
-            # تحويل المرفقات من JSON
-            for letter in results:
-                if letter.attachments:
-                    try:
-                        letter.attachments_list = json.loads(letter.attachments)
-                    except:
-                        letter.attachments_list = []
-                else:
-                    letter.attachments_list = []
+            # تنفيذ البحث (صفحة واحدة فقط)
+            page = request.args.get('page', 1, type=int)
+            results = OffsetPage(
+                query.order_by(Letter.created_at.desc(), Letter.id.desc()),
+                page=page,
+                per_page=SEARCH_PER_PAGE
+            )
+            search_args = {k: v for k, v in request.args.items() if k != 'page'}
+            counts = attachment_counts(letter.id for letter in results.items)
             
-            flash(f'تم العثور على {len(results)} نتيجة', 'info')
+            total = f'{results.total}+' if results.total_capped else results.total
+            flash(f'تم العثور على {total} نتيجة', 'info')
             
         except Exception as e:
             flash(f'حدث خطأ أثناء البحث: {str(e)}', 'danger')
@@ -74,4 +113,6 @@ def advanced_search():
     return render_template('search/advanced.html', 
                           form=form, 
                           results=results,
+                          search_args=search_args,
+                          attachment_counts=counts,
                           now=datetime.now())
\ No newline at end of file
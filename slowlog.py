@@ -0,0 +1,243 @@
+# سجل الاستعلامات البطيئة مع خطة التنفيذ (EXPLAIN) لكل استعلام
+#
+# عند تفعيل SLOW_QUERY_LOG يُسجل كل استعلام يتجاوز SLOW_QUERY_THRESHOLD_MS مع:
+# نص SQL، والقيم المربوطة بعد إخفاء النصوص، والمسار (endpoint) الذي نفذه،
+# وأول سطر من كود التطبيق في مكدس الاستدعاء، وخطة التنفيذ:
+# EXPLAIN QUERY PLAN على SQLite و EXPLAIN على PostgreSQL.
+#
+# السجلات أسطر JSON في ملف يُدوَّر عند SLOW_QUERY_LOG_MAX_BYTES، وتُعرض
+# مجمعة حسب الاستعلام الموحد في /admin/slow-queries.
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from datetime import date, datetime
+from logging.handlers import RotatingFileHandler
+from flask import has_request_context, request
+from sqlalchemy import event
+
+# الاستعلامات التي يمكن عرض خطتها دون تنفيذها
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'\?|%\(\w+\)s|%s|:\w+')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_statement(statement):
+    """توحيد الاستعلام للتجميع: القيم والعناصر المتغيرة ← ?"""
+    normalized = _STRING_LITERAL.sub('?', statement)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _IN_LIST.sub('(...)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+def redact_value(value):
+    """إخفاء القيم النصية (قد تحوي بيانات شخصية) مع إبقاء نوعها وطولها"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return f'<str:{len(value)}>'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'<bytes:{len(value)}>'
+    return f'<{type(value).__name__}>'
+
+def redact_parameters(parameters, executemany=False):
+    if executemany:
+        return f'<{len(parameters)} rows>'
+    if isinstance(parameters, dict):
+        return {key: redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_value(value) for value in parameters]
+    return redact_value(parameters)
+
+def statement_origin(root_path):
+    """أعمق إطار من كود التطبيق في مكدس الاستدعاء (الملف:السطر في الدالة)"""
+    this_file = os.path.abspath(__file__)
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith('<'):
+            # كود مولد (مثل دوال SQLAlchemy المخزنة)
+            continue
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(root_path) and filename != this_file and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, root_path)}:{frame.lineno} in {frame.name}'
+    return None
+
+def _sqlite_plan(rows):
+    """أسطر EXPLAIN QUERY PLAN مع إزاحة حسب العقدة الأب"""
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+def explain(cursor, dialect, statement, parameters):
+    """خطة تنفيذ الاستعلام عبر مؤشر DBAPI منفصل على نفس الاتصال، أو None"""
+    if not EXPLAINABLE.match(statement):
+        return None
+    explain_cursor = cursor.connection.cursor()
+    try:
+        if dialect == 'sqlite':
+            explain_cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+            return _sqlite_plan(explain_cursor.fetchall())
+        if dialect == 'postgresql':
+            explain_cursor.execute(f'EXPLAIN {statement}', parameters)
+            return '\n'.join(row[0] for row in explain_cursor.fetchall())
+        return None
+    finally:
+        explain_cursor.close()
+
+class SlowQueryLog:
+    """تسجيل الاستعلامات الأبطأ من العتبة في ملف JSON دوار"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._logger = None
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config['SLOW_QUERY_LOG']
+        self.threshold = app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000
+        self.capture_plan = app.config['SLOW_QUERY_EXPLAIN']
+        self.path = app.config['SLOW_QUERY_LOG_PATH']
+        if not os.path.isabs(self.path):
+            self.path = os.path.join(app.instance_path, self.path)
+        app.extensions['slow_query_log'] = self
+        if not self.enabled:
+            return
+
+        from database.db import db
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _get_logger(self):
+        if self._logger is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            handler = RotatingFileHandler(
+                self.path,
+                maxBytes=self.app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                backupCount=self.app.config['SLOW_QUERY_LOG_BACKUPS'],
+                encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger = logging.getLogger(f'slow_queries.{id(self)}')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._slowlog_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_slowlog_started', None)
+        if started is None or getattr(self._local, 'recording', False):
+            return
+        duration = time.perf_counter() - started
+        if duration < self.threshold:
+            return
+
+        # لا يُسجل ما ينفذه التسجيل نفسه (EXPLAIN)
+        self._local.recording = True
+        try:
+            self.record(conn, cursor, statement, parameters, executemany, duration)
+        except Exception:
+            self.app.logger.exception("Error recording slow query")
+        finally:
+            self._local.recording = False
+
+    def record(self, conn, cursor, statement, parameters, executemany, duration):
+        plan = None
+        if self.capture_plan and not executemany:
+            try:
+                plan = explain(cursor, conn.dialect.name, statement, parameters)
+            except Exception as e:
+                plan = f'EXPLAIN failed: {e}'
+
+        if has_request_context():
+            endpoint = request.endpoint or request.path
+        else:
+            endpoint = f'thread:{threading.current_thread().name}'
+
+        entry = {
+            'time': datetime.utcnow().isoformat(timespec='seconds'),
+            'duration_ms': round(duration * 1000, 2),
+            'statement': statement,
+            'parameters': redact_parameters(parameters, executemany),
+            'endpoint': endpoint,
+            'origin': statement_origin(self.app.root_path),
+            'plan': plan,
+        }
+        self._get_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def log_files(self):
+        """الملف الحالي ثم النسخ المدوَّرة (الأقدم أخيراً)"""
+        files = [self.path] + [f'{self.path}.{n}' for n in range(1, self.app.config['SLOW_QUERY_LOG_BACKUPS'] + 1)]
+        return [path for path in files if os.path.exists(path)]
+
+    def entries(self):
+        for path in self.log_files():
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def grouped(self):
+        """السجلات مجمعة حسب الاستعلام الموحد، الأكثر استهلاكاً للوقت أولاً"""
+        groups = {}
+        for entry in self.entries():
+            key = normalize_statement(entry['statement'])
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    'statement': key,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'last_seen': entry['time'],
+                    'endpoints': {},
+                    'origins': {},
+                    'slowest': entry,
+                }
+            group['count'] += 1
+            group['total_ms'] += entry['duration_ms']
+            group['last_seen'] = max(group['last_seen'], entry['time'])
+            group['endpoints'][entry['endpoint']] = group['endpoints'].get(entry['endpoint'], 0) + 1
+            if entry.get('origin'):
+                group['origins'][entry['origin']] = group['origins'].get(entry['origin'], 0) + 1
+            if entry['duration_ms'] >= group['max_ms']:
+                group['max_ms'] = entry['duration_ms']
+                group['slowest'] = entry
+
+        for group in groups.values():
+            group['mean_ms'] = group['total_ms'] / group['count']
+        return sorted(groups.values(), key=lambda g: g['total_ms'], reverse=True)
+
+    def clear(self):
+        """حذف كل السجلات"""
+        if self._logger is not None:
+            for handler in self._logger.handlers:
+                handler.acquire()
+        try:
+            for path in self.log_files():
+                with open(path, 'w', encoding='utf-8'):
+                    pass
+        finally:
+            if self._logger is not None:
+                for handler in self._logger.handlers:
+                    handler.release()
@@ -0,0 +1,115 @@
+// رفع الملفات الكبيرة على أجزاء قابلة للاستئناف (انظر uploads.py)
+//
+// حقول الملفات التي تحمل data-chunked-upload: إذا تجاوز الملف المختار
+// CHUNKED_UPLOAD_THRESHOLD يُرفع على أجزاء قبل إرسال النموذج، ثم يُرسل
+// رقم الرفع في الحقل المخفي <name>_upload بدل الملف نفسه.
+
+const CHUNKED_UPLOAD_THRESHOLD = 4 * 1024 * 1024;
+const CHUNK_RETRIES = 3;
+
+async function sha256Hex(buffer) {
+    if (!window.crypto || !window.crypto.subtle) {
+        return '';
+    }
+    const digest = await crypto.subtle.digest('SHA-256', buffer);
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadRequest(url, options = {}) {
+    options.headers = Object.assign({'X-CSRFToken': CSRF_TOKEN}, options.headers || {});
+    const response = await fetch(url, options);
+    const data = await response.json().catch(() => ({}));
+    if (!response.ok) {
+        throw new Error(data.error || `HTTP ${response.status}`);
+    }
+    return data;
+}
+
+async function chunkedUpload(file, onProgress) {
+    // استئناف رفع سابق لنفس الملف (بعد انقطاع الاتصال أو إعادة تحميل الصفحة)
+    const key = `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+    let status = null;
+    const previous = localStorage.getItem(key);
+    if (previous) {
+        status = await uploadRequest(`/uploads/${previous}`).catch(() => null);
+    }
+    if (!status) {
+        status = await uploadRequest('/uploads/', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size})
+        });
+        localStorage.setItem(key, status.upload_id);
+    }
+
+    const received = new Set(status.received);
+    for (let index = 0; index < status.chunks; index++) {
+        if (!received.has(index)) {
+            const start = index * status.chunk_size;
+            const buffer = await file.slice(start, Math.min(file.size, start + status.chunk_size)).arrayBuffer();
+            const checksum = await sha256Hex(buffer);
+
+            for (let attempt = 1; ; attempt++) {
+                try {
+                    await uploadRequest(`/uploads/${status.upload_id}/chunks/${index}`, {
+                        method: 'PUT',
+                        headers: {'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': checksum},
+                        body: buffer
+                    });
+                    break;
+                } catch (error) {
+                    if (attempt >= CHUNK_RETRIES) {
+                        throw error;
+                    }
+                }
+            }
+        }
+        onProgress((index + 1) / status.chunks);
+    }
+
+    if (!status.complete) {
+        status = await uploadRequest(`/uploads/${status.upload_id}/complete`, {method: 'POST'});
+    }
+    localStorage.removeItem(key);
+    return status.upload_id;
+}
+
+function enableChunkedUpload(input) {
+    const form = input.form;
+    const hidden = document.createElement('input');
+    hidden.type = 'hidden';
+    hidden.name = `${input.name}_upload`;
+    input.after(hidden);
+
+    const progress = document.createElement('div');
+    progress.className = 'form-text';
+    hidden.after(progress);
+
+    input.addEventListener('change', async function() {
+        const file = input.files[0];
+        hidden.value = '';
+        progress.textContent = '';
+        if (!file || file.size < CHUNKED_UPLOAD_THRESHOLD) {
+            return;
+        }
+
+        const buttons = form.querySelectorAll('[type="submit"]');
+        buttons.forEach(button => button.disabled = true);
+        try {
+            hidden.value = await chunkedUpload(file, ratio => {
+                progress.textContent = `جاري رفع ${file.name}: ${Math.round(ratio * 100)}%`;
+            });
+            // الملف مرفوع مسبقاً، فلا يُرسل مرة أخرى مع النموذج
+            input.value = '';
+            progress.textContent = `تم رفع ${file.name}`;
+        } catch (error) {
+            progress.textContent = `فشل رفع ${file.name}: ${error.message}`;
+        } finally {
+            buttons.forEach(button => button.disabled = false);
+        }
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[type="file"][data-chunked-upload]').forEach(enableChunkedUpload);
+});
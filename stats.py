@@ -0,0 +1,255 @@
+from datetime import date, datetime, timedelta
+from flask import g, current_app
+from sqlalchemy import Date, func, case, cast, select
+from database.db import db
+
+STATS_KEYS = (
+    'incoming_count',
+    'outgoing_count',
+    'archived_count',
+    'users_count',
+    'total_letters',
+    'monthly_incoming',
+    'monthly_outgoing',
+)
+
+def empty_stats():
+    """إحصائيات فارغة (قيم صفرية)"""
+    return dict.fromkeys(STATS_KEYS, 0)
+
+def month_bounds(dt):
+    """بداية الشهر وبداية الشهر التالي (نطاق قابل للفهرسة بدلاً من extract)"""
+    start = dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+CHART_WINDOWS = (6, 12, 24)
+CHART_GRANULARITIES = ('day', 'week', 'month')
+
+def add_months(dt, months):
+    """إزاحة تاريخ (أول الشهر) بعدد من الأشهر"""
+    index = dt.year * 12 + (dt.month - 1) + months
+    return dt.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+def _bucket_start(day, granularity):
+    """بداية الخانة الزمنية التي ينتمي إليها اليوم"""
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+def _iter_buckets(start, end, granularity):
+    """جميع الخانات الزمنية بين start و end (لملء الفراغات بأصفار)"""
+    bucket = _bucket_start(start, granularity)
+    while bucket <= end:
+        yield bucket
+        if granularity == 'month':
+            bucket = add_months(bucket, 1)
+        elif granularity == 'week':
+            bucket += timedelta(days=7)
+        else:
+            bucket += timedelta(days=1)
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+def _day_expression(column, dialect):
+    """تعبير اليوم (أو أول الشهر) المستخدم في التجميع"""
+    if dialect == 'sqlite':
+        return func.date(column)
+    return cast(column, Date)
+
+def _month_expression(column, dialect):
+    if dialect == 'sqlite':
+        return func.date(column, 'start of month')
+    return cast(func.date_trunc('month', column), Date)
+
+def compute_chart_series(months=6, granularity='month', now=None):
+    """سلاسل المخطط (وارد/صادر) لآخر عدد من الأشهر في استعلام تجميعي واحد"""
+    from database.models import Letter
+
+    today = (now or datetime.now()).date()
+    start = add_months(today.replace(day=1), -(months - 1))
+
+    dialect = db.session.get_bind().dialect.name
+    if granularity == 'month':
+        bucket = _month_expression(Letter.created_at, dialect)
+    else:
+        # الأسابيع تُجمع من الأيام في بايثون
+        bucket = _day_expression(Letter.created_at, dialect)
+
+    rows = db.session.query(
+        bucket.label('bucket'),
+        Letter.letter_type,
+        func.count(Letter.id)
+    ).filter(Letter.created_at >= datetime.combine(start, datetime.min.time()))\
+     .group_by(bucket, Letter.letter_type).all()
+
+    labels_format = '%b %Y' if granularity == 'month' else '%Y-%m-%d'
+    buckets = list(_iter_buckets(start, today, granularity))
+    series = {
+        'incoming': dict.fromkeys(buckets, 0),
+        'outgoing': dict.fromkeys(buckets, 0)
+    }
+
+    for value, letter_type, count in rows:
+        if value is None or letter_type not in series:
+            continue
+        key = _bucket_start(_to_date(value), granularity)
+        if key in series[letter_type]:
+            series[letter_type][key] += count
+
+    return {
+        'labels': [b.strftime(labels_format) for b in buckets],
+        'incoming': list(series['incoming'].values()),
+        'outgoing': list(series['outgoing'].values())
+    }
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def compute_stats(now=None):
+    """حساب الإحصائيات من جدول العدادات أو من جدول المراسلات حسب الإعدادات"""
+    if current_app.config.get('STATS_USE_COUNTERS', True):
+        return compute_stats_from_counters(now)
+    return compute_stats_from_letters(now)
+
+def compute_stats_from_counters(now=None):
+    """حساب الإحصائيات من جدول letter_counters (بضعة صفوف فقط)"""
+    from database.models import LetterCounter, User
+
+    now = now or datetime.now()
+    this_month = (LetterCounter.year == now.year) & (LetterCounter.month == now.month)
+    users_count = select(func.count(User.id)).scalar_subquery()
+
+    rows = db.session.query(
+        LetterCounter.letter_type,
+        LetterCounter.is_archived,
+        func.sum(LetterCounter.count),
+        func.sum(case((this_month, LetterCounter.count), else_=0)),
+        users_count
+    ).group_by(LetterCounter.letter_type, LetterCounter.is_archived).all()
+
+    stats = empty_stats()
+    if not rows:
+        stats['users_count'] = db.session.query(func.count(User.id)).scalar() or 0
+        return stats
+
+    for letter_type, is_archived, total, monthly, users in rows:
+        total = int(total or 0)
+        stats['users_count'] = int(users or 0)
+        stats['total_letters'] += total
+        if is_archived:
+            stats['archived_count'] += total
+        elif letter_type in ('incoming', 'outgoing'):
+            stats[f'{letter_type}_count'] += total
+        if letter_type in ('incoming', 'outgoing'):
+            stats[f'monthly_{letter_type}'] += int(monthly or 0)
+    return stats
+
+def compute_stats_from_letters(now=None):
+    """حساب جميع الإحصائيات في استعلام تجميعي واحد على جدول المراسلات"""
+    from database.models import Letter, User
+
+    month_start, month_end = month_bounds(now or datetime.now())
+    active = Letter.is_archived == False
+    this_month = (Letter.created_at >= month_start) & (Letter.created_at < month_end)
+    users_count = select(func.count(User.id)).scalar_subquery()
+
+    row = db.session.query(
+        _count_if((Letter.letter_type == 'incoming') & active).label('incoming_count'),
+        _count_if((Letter.letter_type == 'outgoing') & active).label('outgoing_count'),
+        _count_if(Letter.is_archived == True).label('archived_count'),
+        users_count.label('users_count'),
+        func.count(Letter.id).label('total_letters'),
+        _count_if((Letter.letter_type == 'incoming') & this_month).label('monthly_incoming'),
+        _count_if((Letter.letter_type == 'outgoing') & this_month).label('monthly_outgoing'),
+    ).one()
+
+    return {key: int(row._mapping[key] or 0) for key in STATS_KEYS}
+
+def compute_yearly_stats(year):
+    """إحصائيات سنة كاملة من جدول العدادات"""
+    from database.models import Letter, LetterCounter
+
+    if current_app.config.get('STATS_USE_COUNTERS', True):
+        rows = db.session.query(
+            LetterCounter.letter_type,
+            func.sum(LetterCounter.count)
+        ).filter(LetterCounter.year == year)\
+         .group_by(LetterCounter.letter_type).all()
+    else:
+        start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+        rows = db.session.query(
+            Letter.letter_type,
+            func.count(Letter.id)
+        ).filter(Letter.created_at >= start, Letter.created_at < end)\
+         .group_by(Letter.letter_type).all()
+
+    counts = {letter_type: int(count or 0) for letter_type, count in rows}
+    incoming = counts.get('incoming', 0)
+    outgoing = counts.get('outgoing', 0)
+    return {
+        'year': year,
+        'incoming': incoming,
+        'outgoing': outgoing,
+        'total': incoming + outgoing
+    }
+
+class StatsSnapshot:
+    """لقطة إحصائيات كسولة: تُحسب عند أول قراءة فقط ثم تُعاد نفس القيم"""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            self._data = self._loader()
+        return self._data
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._load()[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def get(self, key, default=None):
+        return self._load().get(key, default)
+
+    def to_dict(self):
+        """نسخة من الإحصائيات كقاموس"""
+        return dict(self._load())
+
+def get_request_stats(loader=compute_stats):
+    """إحصائيات الطلب الحالي، محفوظة على g لتُحسب مرة واحدة لكل طلب"""
+    snapshot = g.get('_stats_snapshot')
+    if snapshot is None:
+        snapshot = StatsSnapshot(loader)
+        g._stats_snapshot = snapshot
+    return snapshot
+
+def get_request_total(*keys):
+    """مجموع قيم من إحصائيات الطلب، أو None إذا تعذر حسابها (يُحذف الإجمالي من الصفحة)"""
+    try:
+        stats = get_request_stats()
+        return sum(stats[key] for key in keys)
+    except Exception as e:
+        current_app.logger.error(f"Error getting stats: {str(e)}")
+        return None
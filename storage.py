@@ -0,0 +1,238 @@
+# مخزن الملفات حسب المحتوى: كل ملف يُخزن مرة واحدة باسم بصمته SHA-256
+import hashlib
+import mimetypes
+import os
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app, send_file
+from werkzeug.utils import secure_filename
+from database.db import db
+from database.blobs import ensure_blob, recount_references
+from database.models import Attachment, Blob
+from utils import allowed_file
+
+CHUNK_SIZE = 1024 * 1024
+
+# الملفات الجديدة التي لم تُربط بعد بمراسلة لا تُحذف قبل هذه المهلة
+GC_GRACE_PERIOD = timedelta(hours=1)
+
+StoredFile = namedtuple('StoredFile', 'digest size original_name filename mime_type')
+
+class BlobStore:
+    """ملفات مخزنة باسم بصمتها: <root>/ab/cd/<digest>"""
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp = os.path.join(root, 'tmp')
+        self.uploads = os.path.join(root, 'uploads')
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.isfile(self.path(digest))
+
+    def put_stream(self, stream, expected_digest=None):
+        """كتابة المحتوى إلى ملف مؤقت مع حساب البصمة، ثم نقله إلى مكانه
+
+        إذا كان المحتوى مخزناً مسبقاً يُحذف الملف المؤقت ولا يُستهلك أي
+        مساحة إضافية. إذا أُعطيت expected_digest ولم تطابق البصمة يُحذف
+        الملف المؤقت ويُرفع ValueError. يعيد (البصمة، الحجم).
+        """
+        os.makedirs(self.tmp, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+
+            key = digest.hexdigest()
+            if expected_digest and key != expected_digest:
+                raise ValueError(f'بصمة الملف {key} لا تطابق البصمة المتوقعة {expected_digest}')
+            target = self.path(key)
+            if os.path.exists(target):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key, size
+
+    def put_file(self, path):
+        with open(path, 'rb') as f:
+            return self.put_stream(f)
+
+    def hash(self, digest):
+        """إعادة حساب بصمة الملف المخزن"""
+        checksum = hashlib.sha256()
+        with open(self.path(digest), 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                checksum.update(chunk)
+        return checksum.hexdigest()
+
+    def derived_path(self, digest, suffix):
+        """ملف مشتق من الملف المخزن (مثل الصور المصغرة) بجانبه: <digest>.<suffix>"""
+        return f"{self.path(digest)}.{suffix}"
+
+    def remove(self, digest):
+        """حذف الملف المخزن وكل الملفات المشتقة منه"""
+        directory = os.path.dirname(self.path(digest))
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            if name == digest or name.startswith(f"{digest}."):
+                os.remove(os.path.join(directory, name))
+
+    def upload_dir(self, upload_id):
+        """مجلد أجزاء الرفع المجزأ: <root>/uploads/<upload_id>/<رقم الجزء>"""
+        return os.path.join(self.uploads, upload_id)
+
+    def iter_files(self):
+        """(البصمة، المسار) لكل ملف مخزن، دون الملفات المشتقة"""
+        for directory, subdirs, files in os.walk(self.root):
+            if directory == self.root:
+                subdirs[:] = [d for d in subdirs if d not in ('tmp', 'uploads')]
+            for name in files:
+                if '.' not in name:
+                    yield name, os.path.join(directory, name)
+
+def get_store(app=None):
+    """مخزن الملفات الخاص بالتطبيق"""
+    app = app or current_app
+    store = app.extensions.get('blob_store')
+    if store is None:
+        store = BlobStore(os.path.join(app.root_path, app.config['BLOB_STORE_FOLDER']))
+        app.extensions['blob_store'] = store
+    return store
+
+def stored_file(original_name, digest, size):
+    """وصف ملف مخزن: الاسم الآمن ونوع MIME من الاسم الأصلي"""
+    filename = secure_filename(original_name)
+    if '.' not in filename:
+        # secure_filename يحذف الحروف العربية، فيبقى الامتداد على الأقل
+        filename = f"file.{original_name.rsplit('.', 1)[-1].lower()}"
+    return StoredFile(
+        digest=digest,
+        size=size,
+        original_name=original_name,
+        filename=filename,
+        mime_type=mimetypes.guess_type(original_name)[0] or 'application/octet-stream'
+    )
+
+def check_extension(filename, allowed_extensions):
+    """رفع ValueError إذا لم يكن امتداد الملف مسموحاً به"""
+    if not allowed_file(filename, allowed_extensions):
+        raise ValueError(f'نوع الملف غير مسموح به. المسموح: {", ".join(allowed_extensions)}')
+
+def store_upload(file, allowed_extensions):
+    """تخزين ملف مرفوع وتسجيله ضمن معاملة الجلسة، أو None إذا لم يُرفع ملف"""
+    if not file or not file.filename:
+        return None
+    check_extension(file.filename, allowed_extensions)
+    digest, size = get_store().put_stream(file.stream)
+    ensure_blob(digest, size)
+    return stored_file(file.filename, digest, size)
+
+def store_local_file(path, allowed_extensions, store):
+    """تخزين ملف محلي (آمن للاستدعاء من خيوط متعددة، دون تسجيل في قاعدة البيانات)
+
+    يجب على المستدعي تسجيل الملف بـ ensure_blob قبل ربطه بمراسلة.
+    """
+    original_name = os.path.basename(path)
+    check_extension(original_name, allowed_extensions)
+    digest, size = store.put_file(path)
+    return stored_file(original_name, digest, size)
+
+def attachment_from(stored):
+    """إنشاء سجل Attachment يشير إلى الملف المخزن"""
+    return Attachment(
+        filename=stored.filename,
+        original_name=stored.original_name,
+        size=stored.size,
+        mime_type=stored.mime_type,
+        checksum=stored.digest
+    )
+
+def send_blob(digest, download_name, mimetype=None, inline=False):
+    """إرسال ملف مخزن باسمه الأصلي
+
+    يدعم طلبات Range (استئناف التحميل وقراءة صفحات PDF عند الحاجة) و
+    If-None-Match / If-Modified-Since (استجابة 304). البصمة تُستخدم كـ ETag،
+    ويُطلب من المتصفح إعادة التحقق لأن الرابط قد يشير لاحقاً إلى ملف آخر.
+    """
+    response = send_file(
+        get_store().path(digest),
+        mimetype=mimetype or mimetypes.guess_type(download_name)[0],
+        as_attachment=not inline,
+        download_name=download_name,
+        etag=digest,
+        conditional=True
+    )
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+def collect_garbage(grace_period=GC_GRACE_PERIOD):
+    """حذف الملفات التي لم تعد أي مراسلة تشير إليها
+
+    يعيد (عدد الملفات المحذوفة، المساحة المحررة بالبايت).
+    """
+    store = get_store()
+    recount_references()
+
+    cutoff = datetime.utcnow() - grace_period
+    orphans = Blob.query.filter(Blob.ref_count <= 0, Blob.created_at < cutoff).all()
+    digests = [blob.digest for blob in orphans]
+    for blob in orphans:
+        db.session.delete(blob)
+    db.session.commit()
+
+    removed = 0
+    freed = 0
+    for digest in digests:
+        if store.exists(digest):
+            freed += os.path.getsize(store.path(digest))
+            store.remove(digest)
+            removed += 1
+
+    # ملفات بلا سجل (معاملة ألغيت بعد التخزين) وملفات مؤقتة متروكة
+    known = {digest for (digest,) in db.session.query(Blob.digest)}
+    cutoff_ts = time.time() - grace_period.total_seconds()
+    candidates = list(store.iter_files())
+    if os.path.isdir(store.tmp):
+        candidates += [(None, os.path.join(store.tmp, name)) for name in os.listdir(store.tmp)]
+    for digest, path in candidates:
+        if digest not in known and os.path.getmtime(path) < cutoff_ts:
+            freed += os.path.getsize(path)
+            if digest:
+                store.remove(digest)
+            else:
+                os.remove(path)
+            removed += 1
+
+    return removed, freed
+
+def verify_store():
+    """إعادة حساب بصمة كل ملف مسجل والإبلاغ عن الملفات المفقودة أو التالفة
+
+    يعيد قائمة (البصمة، 'missing' أو 'corrupt').
+    """
+    store = get_store()
+    problems = []
+    for (digest,) in db.session.query(Blob.digest).order_by(Blob.digest):
+        if not store.exists(digest):
+            problems.append((digest, 'missing'))
+        elif store.hash(digest) != digest:
+            problems.append((digest, 'corrupt'))
+    return problems
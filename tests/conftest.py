@@ -0,0 +1,78 @@
+# إعداد الاختبارات: قاعدة بيانات SQLite مؤقتة تُنشأ بالترحيلات
+#
+#   python -m pytest
+#
+# Config يقرأ متغيرات البيئة عند استيراده، فتُضبط هنا قبل استيراد التطبيق.
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_handle, DATABASE_PATH = tempfile.mkstemp(suffix='.db')
+os.close(_handle)
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+# بدون التخزين المؤقت لنتائج API: كل طلب يصل إلى قاعدة البيانات
+os.environ['API_CACHE_BACKEND'] = 'null'
+os.environ['ACTIVITY_LOG_SYNC'] = 'true'
+
+@pytest.fixture(scope='session')
+def app():
+    from flask_migrate import upgrade
+    from app import create_app, init_instance
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        upgrade(directory=os.path.join(app.root_path, 'migrations'))
+        init_instance(app)
+    yield app
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(DATABASE_PATH + suffix):
+            os.remove(DATABASE_PATH + suffix)
+
+@pytest.fixture(scope='session')
+def user_id(app):
+    """مستخدم مدير ومراسلات ونشاطات للصفحات"""
+    from database.db import db
+    from database.models import ActivityLog, Letter, User
+
+    with app.app_context():
+        user = User(username='tester', email='tester@example.com', full_name='Test User', role='admin')
+        user.set_password('tester')
+        db.session.add(user)
+        db.session.flush()
+
+        today = date.today()
+        for i in range(50):
+            letter_type = 'incoming' if i % 2 == 0 else 'outgoing'
+            access_date = today - timedelta(days=i * 7)
+            archived = i % 5 == 0
+            db.session.add(Letter(
+                letter_type=letter_type,
+                reference_number=f'TEST-{i}',
+                access_number=f"{'IN' if letter_type == 'incoming' else 'OUT'}-{access_date.year}-{i + 1:04d}",
+                sender='مرسل',
+                receiver='مستلم',
+                subject=f'موضوع {i}',
+                letter_date=access_date,
+                access_date=access_date,
+                is_archived=archived,
+                archive_date=datetime.utcnow() if archived else None,
+                user_id=user.id,
+                created_at=datetime.combine(access_date, datetime.min.time()),
+            ))
+            db.session.add(ActivityLog(user_id=user.id, action='إضافة مراسلة', details=f'TEST-{i}'))
+        db.session.commit()
+        return user.id
+
+@pytest.fixture
+def client(app, user_id):
+    """عميل اختبار بجلسة المستخدم المدير"""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
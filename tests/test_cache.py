@@ -0,0 +1,21 @@
+# أرقام أجيال الذاكرة المؤقتة لا تُخرج مع المدخلات
+from cache import ApiCache, MemoryBackend
+
+def make_cache(max_entries):
+    cache = ApiCache()
+    cache.backend = MemoryBackend(max_entries)
+    cache.ttl = None
+    return cache
+
+def test_generation_survives_eviction():
+    cache = make_cache(max_entries=2)
+    # مدخل بالجيل 0 يبقى في الذاكرة بعد إبطاله
+    cache.backend.set('stats:0:totals', 'stale')
+    cache.invalidate('stats')
+    assert cache.get_or_set('stats', 'totals', lambda: 'fresh') == 'fresh'
+
+    # امتلاء الذاكرة يُخرج كل المدخلات، لكن الجيل يبقى 1
+    for i in range(5):
+        cache.get_or_set('activity', str(i), lambda: i)
+    cache.backend.set('stats:0:totals', 'stale')
+    assert cache.get_or_set('stats', 'totals', lambda: 'fresh') == 'fresh'
@@ -0,0 +1,45 @@
+# عدد استعلامات SQL لكل مسار: الصفحة الرئيسية تقرأ الإحصائيات مرات عدة في
+# index.html، وبدون حفظها لكل طلب (get_request_stats) تتكرر استعلاماتها مع كل قراءة.
+import threading
+import pytest
+from sqlalchemy import event
+
+# (المسار، نقطة النهاية في QUERY_BUDGETS)
+ROUTES = [
+    ('/', 'index'),
+    ('/api/stats', 'get_stats_api'),
+    ('/api/chart-data?months=24', 'get_chart_data'),
+]
+
+@pytest.fixture
+def statements(app):
+    """الاستعلامات التي يصدرها خيط الاختبار (دون الخيوط الخلفية)"""
+    from database.db import db
+
+    captured = []
+    thread = threading.get_ident()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            captured.append(' '.join(statement.split()))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield captured
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+@pytest.mark.parametrize('route, endpoint', ROUTES)
+def test_route_within_query_budget(app, client, statements, route, endpoint):
+    response = client.get(route)
+    assert response.status_code == 200
+
+    budget = app.config['QUERY_BUDGETS'][endpoint]
+    assert len(statements) <= budget, '\n'.join(statements)
+
+def test_index_reads_stats_once(client, statements):
+    response = client.get('/')
+    assert response.status_code == 200
+
+    counters = [s for s in statements if 'FROM letter_counters' in s]
+    assert len(counters) == 1, '\n'.join(statements)
@@ -0,0 +1,126 @@
+# الصور المصغرة لصور المراسلات (تُولد في الخلفية وتُخزن بجانب الملف الأصلي)
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for
+from PIL import Image, ImageOps, features
+
+# المقاسات المتاحة (أقصى عرض، أقصى ارتفاع)
+THUMBNAIL_SIZES = {
+    'small': (160, 160),
+    'medium': (800, 800),
+}
+
+# صيغ الصور التي يمكن تصغيرها (ملفات PDF تبقى بأيقونة)
+THUMBNAIL_SOURCES = {'jpg', 'jpeg', 'png', 'gif'}
+
+DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+def thumbnail_format(app=None):
+    """صيغة الصور المصغرة: WebP إذا كان Pillow يدعمها وإلا JPEG"""
+    app = app or current_app
+    fmt = app.config['THUMBNAIL_FORMAT']
+    if fmt == 'webp' and not features.check('webp'):
+        return 'jpeg'
+    return fmt
+
+def can_thumbnail(filename):
+    """هل الملف صورة يمكن تصغيرها؟"""
+    return bool(filename) and filename.rsplit('.', 1)[-1].lower() in THUMBNAIL_SOURCES
+
+def thumbnail_path(store, digest, size, fmt):
+    return store.derived_path(digest, f"{size}.{fmt}")
+
+def _render(image, size, fmt, target):
+    pil_format, _, options = FORMATS[fmt]
+    thumbnail = image.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZES[size], Image.LANCZOS)
+    if fmt == 'jpeg' and thumbnail.mode not in ('RGB', 'L'):
+        thumbnail = thumbnail.convert('RGB')
+
+    # كتابة ذرية: ملف مؤقت ثم إعادة تسمية
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            thumbnail.save(out, pil_format, **options)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def generate_thumbnails(store, digest, fmt, force=False):
+    """توليد كل المقاسات الناقصة لملف مخزن، ويعيد عدد الصور المولدة"""
+    targets = {
+        size: thumbnail_path(store, digest, size, fmt)
+        for size in THUMBNAIL_SIZES
+        if force or not os.path.exists(thumbnail_path(store, digest, size, fmt))
+    }
+    if not targets or not store.exists(digest):
+        return 0
+
+    with Image.open(store.path(digest)) as image:
+        # فك ترميز JPEG بدقة مخفضة مباشرة (أسرع بكثير للصور الممسوحة الكبيرة)
+        largest = max(THUMBNAIL_SIZES[size] for size in targets)
+        image.draft('RGB', largest)
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('P', 'CMYK', 'I;16'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        for size, target in targets.items():
+            _render(image, size, fmt, target)
+    return len(targets)
+
+class ThumbnailWorker:
+    """مجموعة خيوط لتوليد الصور المصغرة بعد تخزين الصورة دون تأخير الطلب"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._pool = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['thumbnail_worker'] = self
+        app.add_template_global(thumbnail_url)
+
+    def _executor(self):
+        # الخيوط لا تنتقل مع fork، لذا تُنشأ المجموعة عند أول استخدام في كل عملية
+        if self._pool is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.app.config['THUMBNAIL_WORKERS'],
+                thread_name_prefix='thumbnail'
+            )
+        return self._pool
+
+    def submit(self, digest, filename):
+        """جدولة توليد الصور المصغرة لصورة مخزنة"""
+        if not digest or not can_thumbnail(filename):
+            return None
+        from storage import get_store
+        return self._executor().submit(self._generate, get_store(self.app), digest, thumbnail_format(self.app))
+
+    def _generate(self, store, digest, fmt):
+        try:
+            return generate_thumbnails(store, digest, fmt)
+        except Exception:
+            self.app.logger.exception(f"Error generating thumbnails for {digest}")
+            return 0
+
+def schedule_thumbnails(digest, filename):
+    """جدولة الصور المصغرة في الخلفية (تُستدعى بعد حفظ صورة المراسلة)"""
+    return current_app.extensions['thumbnail_worker'].submit(digest, filename)
+
+def thumbnail_url(letter, size='small'):
+    """رابط الصورة المصغرة لصورة المراسلة، أو None إذا لم تكن صورة"""
+    if not letter.image_digest or not can_thumbnail(letter.letter_image):
+        return None
+    return url_for('letters.letter_thumbnail', digest=letter.image_digest, size=size)
@@ -0,0 +1,282 @@
+# رفع الملفات الكبيرة على أجزاء قابلة للاستئناف (ملفات المسح الضوئي متعددة الصفحات)
+#
+# 1. POST   /uploads/                      {filename, size, sha256?} -> upload_id, chunk_size
+# 2. PUT    /uploads/<id>/chunks/<n>       جسم الطلب = الجزء n (X-Chunk-SHA256 اختياري)
+# 3. POST   /uploads/<id>/complete         {sha256?} -> digest
+#    GET    /uploads/<id>                  الأجزاء المستلمة (للاستئناف بعد الانقطاع)
+#    DELETE /uploads/<id>                  إلغاء الرفع
+#
+# بعد الإكمال ترسل النماذج upload_id في الحقل <field>_upload بدل الملف نفسه.
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import login_required, current_user
+from database.db import db
+from database.blobs import ensure_blob
+from database.models import Upload
+from storage import CHUNK_SIZE, check_extension, get_store, store_upload, stored_file
+
+uploads_bp = Blueprint('uploads', __name__)
+
+UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+def chunk_count(upload):
+    return max(1, -(-upload.size // upload.chunk_size))
+
+def chunk_length(upload, index):
+    """الطول المتوقع للجزء (الأخير قد يكون أقصر)"""
+    last = chunk_count(upload) - 1
+    if index < last:
+        return upload.chunk_size
+    return upload.size - upload.chunk_size * last
+
+def received_chunks(store, upload):
+    """أرقام الأجزاء المكتملة على القرص"""
+    directory = store.upload_dir(upload.id)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name) for name in os.listdir(directory) if name.isdigit())
+
+class ChunkReader:
+    """قراءة الأجزاء بالترتيب كتدفق واحد دون تحميلها في الذاكرة"""
+
+    def __init__(self, paths):
+        self._paths = list(paths)
+        self._current = None
+
+    def read(self, size=-1):
+        while True:
+            if self._current is None:
+                if not self._paths:
+                    return b''
+                self._current = open(self._paths.pop(0), 'rb')
+            data = self._current.read(size)
+            if data:
+                return data
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+def _error(message, status=400, **extra):
+    return jsonify({'success': False, 'error': message, **extra}), status
+
+def _get_upload(upload_id):
+    upload = db.session.get(Upload, upload_id) if UPLOAD_ID.match(upload_id) else None
+    if upload is None or upload.user_id != current_user.id:
+        return None
+    return upload
+
+def _status(store, upload):
+    return {
+        'success': True,
+        'upload_id': upload.id,
+        'filename': upload.filename,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'chunks': chunk_count(upload),
+        'received': received_chunks(store, upload) if upload.digest is None else list(range(chunk_count(upload))),
+        'complete': upload.digest is not None,
+        'digest': upload.digest
+    }
+
+@uploads_bp.route('/', methods=['POST'])
+@login_required
+def init_upload():
+    """بدء رفع مجزأ"""
+    data = request.get_json(silent=True) or {}
+    filename = os.path.basename((data.get('filename') or '').strip())
+    size = data.get('size')
+    sha256 = (data.get('sha256') or '').lower() or None
+    allowed = current_app.config['ALLOWED_IMAGE_EXTENSIONS'] | current_app.config['ALLOWED_ATTACHMENT_EXTENSIONS']
+
+    try:
+        check_extension(filename, allowed)
+    except ValueError as e:
+        return _error(str(e))
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return _error('حجم الملف غير صالح')
+    if size > current_app.config['UPLOAD_MAX_SIZE']:
+        return _error('حجم الملف أكبر من الحد المسموح به', 413)
+    if sha256 and not SHA256.match(sha256):
+        return _error('بصمة SHA-256 غير صالحة')
+
+    upload = Upload(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        filename=filename,
+        size=size,
+        chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'],
+        sha256=sha256
+    )
+    db.session.add(upload)
+    db.session.commit()
+
+    store = get_store()
+    os.makedirs(store.upload_dir(upload.id), exist_ok=True)
+    return jsonify(_status(store, upload)), 201
+
+@uploads_bp.route('/<upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    """حالة الرفع: الأجزاء المستلمة لاستئناف رفع منقطع"""
+    upload = _get_upload(upload_id)
+    if upload is None:
+        return _error('الرفع غير موجود', 404)
+    return jsonify(_status(get_store(), upload))
+
+@uploads_bp.route('/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id, index):
+    """استلام جزء واحد وكتابته على القرص تدريجياً (ذاكرة محدودة)"""
+    upload = _get_upload(upload_id)
+    if upload is None:
+        return _error('الرفع غير موجود', 404)
+    if upload.digest is not None:
+        return _error('الرفع مكتمل مسبقاً', 409)
+    if index >= chunk_count(upload):
+        return _error('رقم الجزء خارج النطاق')
+
+    expected = chunk_length(upload, index)
+    if request.content_length is not None and request.content_length != expected:
+        return _error(f'طول الجزء يجب أن يكون {expected} بايت')
+
+    store = get_store()
+    directory = store.upload_dir(upload.id)
+    os.makedirs(directory, exist_ok=True)
+    checksum = hashlib.sha256()
+    length = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.chunk-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for data in iter(lambda: request.stream.read(CHUNK_SIZE), b''):
+                length += len(data)
+                if length > expected:
+                    break
+                checksum.update(data)
+                out.write(data)
+
+        chunk_sha256 = request.headers.get('X-Chunk-SHA256', '').lower()
+        if length != expected:
+            os.remove(tmp_path)
+            return _error(f'طول الجزء يجب أن يكون {expected} بايت')
+        if chunk_sha256 and chunk_sha256 != checksum.hexdigest():
+            os.remove(tmp_path)
+            return _error('بصمة الجزء لا تطابق المحتوى المستلم', 422)
+        os.replace(tmp_path, os.path.join(directory, str(index)))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return jsonify({
+        'success': True,
+        'index': index,
+        'received': len(received_chunks(store, upload)),
+        'chunks': chunk_count(upload)
+    })
+
+@uploads_bp.route('/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(upload_id):
+    """تجميع الأجزاء في مخزن الملفات والتحقق من البصمة"""
+    upload = _get_upload(upload_id)
+    if upload is None:
+        return _error('الرفع غير موجود', 404)
+
+    store = get_store()
+    if upload.digest is not None:
+        return jsonify(_status(store, upload))
+
+    data = request.get_json(silent=True) or {}
+    expected = (data.get('sha256') or upload.sha256 or '').lower() or None
+    if expected and not SHA256.match(expected):
+        return _error('بصمة SHA-256 غير صالحة')
+
+    missing = sorted(set(range(chunk_count(upload))) - set(received_chunks(store, upload)))
+    if missing:
+        return _error('أجزاء ناقصة', 409, missing=missing[:100])
+
+    directory = store.upload_dir(upload.id)
+    reader = ChunkReader(os.path.join(directory, str(i)) for i in range(chunk_count(upload)))
+    try:
+        digest, size = store.put_stream(reader, expected_digest=expected)
+    except ValueError as e:
+        # محتوى تالف: يجب إعادة الرفع من البداية
+        shutil.rmtree(directory, ignore_errors=True)
+        return _error(str(e), 422)
+    finally:
+        reader.close()
+
+    ensure_blob(digest, size)
+    upload.digest = digest
+    upload.completed_at = datetime.utcnow()
+    db.session.commit()
+    shutil.rmtree(directory, ignore_errors=True)
+    return jsonify(_status(store, upload))
+
+@uploads_bp.route('/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel_upload(upload_id):
+    """إلغاء الرفع وحذف أجزائه"""
+    upload = _get_upload(upload_id)
+    if upload is None:
+        return _error('الرفع غير موجود', 404)
+    shutil.rmtree(get_store().upload_dir(upload.id), ignore_errors=True)
+    db.session.delete(upload)
+    db.session.commit()
+    return jsonify({'success': True})
+
+def claim_upload(upload_id, allowed_extensions):
+    """ملف رفع مجزأ مكتمل للمستخدم الحالي، يُستهلك ضمن معاملة المراسلة"""
+    upload = _get_upload(upload_id)
+    if upload is None or upload.digest is None:
+        raise ValueError('الملف المرفوع غير موجود أو لم يكتمل رفعه')
+    check_extension(upload.filename, allowed_extensions)
+    stored = stored_file(upload.filename, upload.digest, upload.size)
+    db.session.delete(upload)
+    return stored
+
+def request_file(field, allowed_extensions):
+    """ملف حقل النموذج: رفع مجزأ مكتمل (<field>_upload) أو ملف مرفوع عادياً
+
+    يعيد StoredFile أو None إذا لم يُرسل شيء، ويرفع ValueError عند الخطأ.
+    """
+    upload_id = request.form.get(f'{field}_upload')
+    if upload_id:
+        return claim_upload(upload_id, allowed_extensions)
+    return store_upload(request.files.get(field), allowed_extensions)
+
+def expire_uploads(max_age):
+    """حذف الرفع المجزأ الأقدم من max_age (غير المكتمل أو غير المستخدم)
+
+    يعيد عدد عمليات الرفع المحذوفة. الملفات المكتملة تصبح بلا مراجع
+    فيحذفها جمع المهملات لاحقاً.
+    """
+    store = get_store()
+    cutoff = datetime.utcnow() - max_age
+    expired = Upload.query.filter(Upload.created_at < cutoff).all()
+    for upload in expired:
+        shutil.rmtree(store.upload_dir(upload.id), ignore_errors=True)
+        db.session.delete(upload)
+    db.session.commit()
+
+    # مجلدات أجزاء بلا سجل (ألغيت معاملتها)
+    if os.path.isdir(store.uploads):
+        known = {upload_id for (upload_id,) in db.session.query(Upload.id)}
+        cutoff_ts = time.time() - max_age.total_seconds()
+        for name in os.listdir(store.uploads):
+            path = os.path.join(store.uploads, name)
+            if name not in known and os.path.getmtime(path) < cutoff_ts:
+                shutil.rmtree(path, ignore_errors=True)
+    return len(expired)
@@ -1,24 +1,15 @@
-import os
-import uuid
 from datetime import datetime
-from werkzeug.utils import secure_filename
-from flask import current_app
-from database.db import db
-from database.models import ActivityLog
+from flask import current_app, has_request_context, request
 
 def log_activity(user_id, action, details=None, ip_address=None):
-    """تسجيل نشاط المستخدم"""
-    try:
-        activity = ActivityLog(
-            user_id=user_id,
-            action=action,
-            details=details,
-            ip_address=ip_address
-        )
-        db.session.add(activity)
-        db.session.commit()
-    except Exception as e:
-        print(f"Error logging activity: {e}")
+    """تسجيل نشاط المستخدم
+    
+    يُضاف السجل إلى طابور مسجل النشاطات ويُكتب مع غيره على دفعات
+    (انظر activity.ActivityLogger). عنوان IP يؤخذ من الطلب الحالي إن لم يُمرر.
+    """
+    if ip_address is None and has_request_context():
+        ip_address = request.remote_addr
+    current_app.extensions['activity_logger'].log(user_id, action, details, ip_address)
 
 def allowed_file(filename, allowed_extensions):
     """التحقق من نوع الملف"""
@@ -27,53 +18,17 @@ def allowed_file(filename, allowed_extensions):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
-def save_uploaded_file(file, folder, allowed_extensions):
-    """حفظ الملف المرفوع"""
-    if file and file.filename:
-        filename = secure_filename(file.filename)
-        
-        # التحقق من امتداد الملف
-        if not allowed_file(filename, allowed_extensions):
-            raise ValueError(f'نوع الملف غير مسموح به. المسموح: {", ".join(allowed_extensions)}')
-        
-        # إنشاء اسم فريد للملف
-        unique_filename = f"{uuid.uuid4().hex}_{filename}"
-        
-        # إنشاء المسار الكامل
-        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', folder)
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        file_path = os.path.join(upload_folder, unique_filename)
-        
-        # حفظ الملف
-        file.save(file_path)
-        return unique_filename
-    return None
-
 def generate_access_number(letter_type):
-    """إنشاء رقم وصول فريد"""
-    from database.models import Letter
-    from datetime import datetime
+    """إنشاء رقم وصول فريد
+    
+    يُحجز الرقم ذرياً من جدول التسلسلات داخل معاملة الجلسة الحالية، لذا
+    يجب استدعاؤها مباشرة قبل إدراج المراسلة ثم commit.
+    """
+    from database.sequences import allocate
     
     year = datetime.now().year
     prefix = "IN" if letter_type == 'incoming' else "OUT"
-    
-    # البحث عن آخر رقم لهذا العام
-    try:
-        last_letter = Letter.query.filter(
-            Letter.access_number.like(f"{prefix}-{year}-%")
-        ).order_by(Letter.id.desc()).first()
-        
-        if last_letter:
-            try:
-                last_number = int(last_letter.access_number.split('-')[-1])
-                new_number = last_number + 1
-            except:
-                new_number = 1
-        else:
-            new_number = 1
-    except:
-        new_number = 1
+    new_number = allocate(prefix, year)
     
     return f"{prefix}-{year}-{new_number:04d}"
 
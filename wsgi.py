@@ -0,0 +1,7 @@
+# نقطة دخول خوادم WSGI للإنتاج (gunicorn wsgi:app، انظر gunicorn.conf.py)
+#
+# create_app لا يلمس قاعدة البيانات ولا نظام الملفات: التهيئة مرة واحدة
+# قبل التشغيل بالأمرين `flask db upgrade` ثم `flask init`.
+from app import create_app
+
+app = create_app()